@@ -2,17 +2,107 @@
 
 
 import os
-import json
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 
-def load_data(json_file: str) -> pd.DataFrame:
-    """Load interaction data from JSON file into a DataFrame."""
-    with open(json_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return pd.DataFrame(data)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from lib.AnalyticsStore import AnalyticsStore, AnalyticsQuery, NUMERIC_COLUMNS, STRING_COLUMNS, to_columns
+from lib.AnalyticsRollups import RollupStore
+from lib.SegmentLog import SegmentLog, iter_json_array
 
-print("DataManipulator.py loaded successfully.")
-data = load_data("data/analytics.json")
-#This does nothing for now but i want to create this file for data manipulation later
+ANALYTICS_JSON = "data/analytics.json"
+ANALYTICS_SEGMENTS = "data/analytics"
+COLUMNAR_DIR = "data/analytics_columnar"
+ROLLUPS_JSON = "data/analytics_rollups.json"
 
+
+def iter_interactions(start: str = None, end: str = None):
+    """Stream raw interactions from the segment log (or the legacy analytics.json if it hasn't been migrated)."""
+    if os.path.exists(ANALYTICS_JSON):
+        # One JSON array, so it's all read either way; only the requested range is kept
+        end_key = end + "\uffff" if end else None  # so "2025-10-07" includes the whole day
+        return (
+            row for row in iter_json_array(ANALYTICS_JSON)
+            if (not start or (row.get("timestamp") or "") >= start)
+            and (not end_key or (row.get("timestamp") or "") <= end_key)
+        )
+    return SegmentLog(ANALYTICS_SEGMENTS).iter_records(start=start, end=end)
+
+
+def compact(store_dir: str = COLUMNAR_DIR, force: bool = False) -> dict:
+    """Convert the raw interaction log into the per-day columnar store (only new days unless force)."""
+    store = AnalyticsStore(store_dir)
+    # Segments that end before the oldest unfinished day aren't even opened
+    start = None if force else store.resume_from()
+    return store.compact(iter_interactions(start=start), force=force)
+
+
+def query(store_dir: str = COLUMNAR_DIR) -> AnalyticsQuery:
+    """Vectorized query API over the columnar store."""
+    return AnalyticsQuery(AnalyticsStore(store_dir))
+
+
+def rollups(granularity: str = "hour", start: str = None, end: str = None, model: str = "*", path: str = ROLLUPS_JSON) -> pd.DataFrame:
+    """Pre-aggregated per-minute/hour/day stats kept by DataCollector (no raw scan needed)."""
+    return pd.DataFrame(RollupStore(path).query(granularity, start=start, end=end, model=model))
+
+
+def _frame(columns: dict) -> pd.DataFrame:
+    frame = {}
+    for name, col in columns.items():
+        if isinstance(col, tuple):
+            codes, values = col
+            # Categorical keeps the dictionary encoding instead of materializing every string
+            frame[name] = pd.Categorical.from_codes(codes, categories=values)
+        else:
+            frame[name] = col
+    return pd.DataFrame(frame)
+
+
+def load_data(columns: list = None, start: str = None, end: str = None) -> pd.DataFrame:
+    """
+    Load interaction data into a DataFrame.
+    Reads only the requested columns and days from the columnar store if it has
+    been compacted, otherwise falls back to streaming the raw segments. Days the
+    store doesn't have finished (today, and anything since the last compact)
+    are read from the raw log and converted to the same columns.
+    """
+    store = AnalyticsStore(COLUMNAR_DIR)
+    tail_from = store.resume_from()
+    if tail_from is None:
+        df = pd.DataFrame(list(iter_interactions(start, end)))
+        return df[columns] if columns else df
+
+    columns = columns or list(NUMERIC_COLUMNS) + STRING_COLUMNS
+    frames = [
+        _frame(store.read_partition(day, columns))
+        for day in store.days(start, end) if day < tail_from
+    ]
+    if end is None or end[:10] >= tail_from:
+        tail = [row for row in iter_interactions(max(start or "", tail_from), end) if row.get("timestamp")]
+        if tail:
+            converted = to_columns(tail)
+            frames.append(_frame({name: converted[name] for name in columns}))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+if __name__ == "__main__":
+    print("DataManipulator.py loaded successfully.")
+    command = sys.argv[1] if len(sys.argv) > 1 else "summary"
+
+    if command == "compact":
+        written = compact(force="--force" in sys.argv)
+        print(f"Compacted {sum(written.values())} interactions across {len(written)} day(s)")
+    elif command == "summary":
+        q = query()
+        print("Generation time percentiles:", q.latency_percentiles())
+        print("Volume by hour:", q.volume_by_hour())
+        print("Top questions:", q.top_questions(10))
+        print("Devices:", q.device_breakdown())
+    elif command == "rollups":
+        granularity = sys.argv[2] if len(sys.argv) > 2 else "day"
+        print(rollups(granularity).to_string(index=False))
+    else:
+        print("Usage: python DataManip.py [compact [--force] | summary | rollups [minute|hour|day]]")
@@ -0,0 +1,30 @@
+"""
+Multi-worker run mode for ArchieAI.
+
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py app:app
+
+Run from the repo root so every worker shares the same data/ directory.
+Storage is safe across workers (file locks + atomic writes, see lib/FileStore.py).
+In-flight generations, metrics and the backend pool are per worker, so put a
+sticky load balancer in front (e.g. nginx ip_hash) if you want stream resume
+and cancel to reach the worker that owns the generation.
+"""
+import os
+import multiprocessing
+
+pythonpath = "src"
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+# Threads so one worker can hold many open SSE streams
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+# Streams can stay open for minutes; gthread workers heartbeat independently of requests
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+
+
+def post_worker_init(worker):
+    # Start warming up (model preload, context) as soon as the worker exists, not on its first request
+    from app import startup
+    startup.start()
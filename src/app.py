@@ -1,32 +1,186 @@
+import time
+# Taken before the heavy imports so startup timings include them
+BOOT_TIME = time.time()
 import os
 import sys
 import uuid
+import functools
+import hmac
 import threading
 import asyncio
-import time
 import flask as fk
-import json
+from flask.json.provider import DefaultJSONProvider
 proj_root = os.path.dirname(__file__)         
 src_dir = os.path.join(proj_root, "src")
 sys.path.insert(0, src_dir)
 from lib import GemInterface
-from lib import qrCodeGen
 from lib.SessionManager import SessionManager
 from lib.DataCollector import DataCollector
+from lib.StreamFramer import SSEFramer, KEEPALIVE as SSE_KEEPALIVE
+from lib.GenerationBuffer import GenerationRegistry
+from lib.Metrics import metrics
+from lib import FastJson
+from lib.CpuExecutor import CpuBusyError, cpu_executor
+from lib.Startup import StartupPipeline
+from lib.Assets import AssetManifest, IMMUTABLE_CACHE, gzip_json_response
+from lib.QrService import QrService, MIMETYPES as QR_MIMETYPES, normalize_options as qr_options, cache_key as qr_cache_key
+from lib.RateLimiter import RateLimiter
+from lib.DataExport import FORMATS as EXPORT_FORMATS, SESSION_COLUMNS, INTERACTION_COLUMNS, export_stream, iter_session_rows, iter_interaction_rows
 from werkzeug.security import generate_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+# CPU pool workers (forkserver/spawn) re-run this script as __mp_main__ before their first task.
+# Their tasks all live in lib.*, so they skip the services below (model clients, storage,
+# the interaction log's migration and atexit flush, rate limits...); only request handlers use them.
+if __name__ != "__mp_main__":
+    gemini = GemInterface.AiInterface()
+
+    session_manager = SessionManager(data_dir="data")
+    data_collector = DataCollector(data_dir="data")
+    generations = GenerationRegistry.from_env()
+    # Rendered QR codes, cached by content; misses render in the CPU pool
+    qr_service = QrService.from_env(runner=cpu_executor.run)
+    # Token buckets per user / IP / session for generations, logins and session lists
+    rate_limiter = RateLimiter.from_env()
+
+    # Warm-up runs in the background; /readyz says ready once the model is loaded
+    startup = StartupPipeline(
+        [
+            ("context", lambda: gemini.context_snapshot.stats()),
+            ("cpu_pool", cpu_executor.warm),
+            ("models", gemini.warm_models),
+        ],
+        boot_time=BOOT_TIME,
+    )
 
-gemini = GemInterface.AiInterface()
+# How often the generation loop checks whether its readers went away
+CANCEL_POLL_SECONDS = 0.25
+
+
+class FastJsonProvider(DefaultJSONProvider):
+    """jsonify() and request.get_json() through lib/FastJson (orjson when installed)."""
+
+    def dumps(self, obj, **kwargs):
+        return FastJson.dumps(obj, sort_keys=self.sort_keys, default=self.default)
+
+    def loads(self, s, **kwargs):
+        return FastJson.loads(s)
 
-session_manager = SessionManager(data_dir="data")
-data_collector = DataCollector(data_dir="data")
 
 app = fk.Flask(__name__)
+app.json = FastJsonProvider(app)
+
+# Behind ngrok/nginx every request comes from the proxy; trust that many X-Forwarded-For hops
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+
+# Templates call asset_url('styles/style.css'); built by helpers/build_assets.py
+assets = AssetManifest(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+app.jinja_env.globals["asset_url"] = assets.url
+JSON_GZIP_MIN_BYTES = int(os.getenv("JSON_GZIP_MIN_BYTES", "1024"))
+
+
+@app.before_request
+def _ensure_startup():
+    # Covers servers that never run __main__ (e.g. gunicorn without the post_worker_init hook)
+    startup.start()
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: the process is up and serving."""
+    return fk.jsonify({"status": "ok", "uptime_seconds": round(time.time() - BOOT_TIME, 3)})
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness: 200 once the warm-up finished (model loaded, context built), 503 before that."""
+    status = startup.status()
+    return fk.jsonify(status), (200 if status["ready"] else 503)
+
+
+@app.after_request
+def _compress_json(response):
+    return gzip_json_response(response, fk.request.headers.get("Accept-Encoding"), min_bytes=JSON_GZIP_MIN_BYTES)
+
+
+@app.route("/static/dist/<path:filename>", methods=["GET"])
+def static_dist(filename):
+    """Fingerprinted build output, precompressed (.br/.gz) when the client accepts it."""
+    asset = assets.resolve(filename, fk.request.headers.get("Accept-Encoding"))
+    if asset is None:
+        fk.abort(404)
+    response = fk.send_file(asset["path"], mimetype=asset["mimetype"], conditional=True, max_age=31536000)
+    if asset["encoding"]:
+        response.headers["Content-Encoding"] = asset["encoding"]
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE
+    return response
+
 
-def Archie(query: str, conversation_history: list = None) -> str:
+def _rate_limit_keys(user: str = None) -> dict:
+    """The caller's rate limit keys; user defaults to the user_email cookie."""
+    return {
+        "user": user or fk.request.cookies.get("user_email"),
+        "ip": rate_limiter.ip_key(fk.request.remote_addr),
+        "session": fk.request.cookies.get("session_id"),
+        "site": "all",
+    }
+
+
+def _rate_limit_wait(budget: str, user: str = None, cost: float = 1.0) -> float:
+    """Seconds the caller must wait for `cost` from `budget` (0 = go ahead)."""
+    return rate_limiter.check(budget, cost=cost, **_rate_limit_keys(user))
+
+
+def _too_many_requests(wait: float, response=None):
+    """429 with Retry-After; a JSON error unless a response is given."""
+    retry_after = RateLimiter.retry_after(wait)
+    if response is None:
+        response = fk.jsonify({"error": "Too many requests, please slow down", "retry_after": retry_after})
+    response = fk.make_response(response)
+    response.status_code = 429
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def rate_limited(budget: str):
+    """Decorator: answer 429 once the caller's user, IP or session bucket for `budget` is empty."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            wait = _rate_limit_wait(budget)
+            if wait:
+                return _too_many_requests(wait)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def Archie(query: str, conversation_history: list = None, session_key: str = None) -> dict:
+    """
+    Synchronous wrapper to run the async gemini.answer in a new event loop.
+    Returns {"answer", "route", "model", "tools", "seconds"}.
+    """
+    return asyncio.run(gemini.answer(query, conversation_history=conversation_history, session_key=session_key))
+
+
+def iterate_async(async_gen):
     """
-    Synchronous wrapper to run the async gemini.Archie in a new event loop.
+    Drive an async generator from sync code (e.g. a streamed Flask response) on its own event loop.
+    If the consumer stops early, the generator is closed so its pending work is cancelled.
     """
-    return asyncio.run(gemini.Archie(query, conversation_history=conversation_history))
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(async_gen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(async_gen.aclose())
+        loop.close()
 
 
 
@@ -52,6 +206,7 @@ def index():
     return fk.render_template("index.html")
 
 @app.route("/api/archie", methods=["POST"])
+@rate_limited("generate")
 def api_archie():
     start_time = time.time()
     
@@ -65,15 +220,16 @@ def api_archie():
     if session_id:
         conversation_history = session_manager.get_conversation_history(session_id)
     
-    answer = Archie(question, conversation_history=conversation_history)
+    result = Archie(question, conversation_history=conversation_history, session_key=session_id)
+    answer = result["answer"]
     
     # Calculate generation time
     generation_time = time.time() - start_time
     
     # Save to session if session_id exists
     if session_id:
-        session_manager.add_message(session_id, "user", question)
-        session_manager.add_message(session_id, "assistant", answer)
+        session_manager.add_message(session_id, "user", question, user_email=user_email)
+        session_manager.add_message(session_id, "assistant", answer, user_email=user_email)
     
     # Collect analytics data
     data_collector.log_interaction(
@@ -83,132 +239,507 @@ def api_archie():
         device_info=fk.request.user_agent.string,
         question=question,
         answer=answer,
-        generation_time_seconds=generation_time
+        generation_time_seconds=generation_time,
+        model=result["model"]
     )
     
     print(f"Question: {question}\nAnswer: {answer}\n")
     return fk.jsonify({"answer": answer})
+
+@app.route("/api/archie/batch", methods=["POST"])
+def api_archie_batch():
+    """
+    Answer many questions in one request: {"questions": ["...", {"id": "faq-1", "question": "..."}], "concurrency": 8}.
+    Streams one NDJSON line per question as soon as it's answered (not in input order).
+    Callers need an admin login or, when ARCHIE_BATCH_TOKEN is set, "Authorization: Bearer <token>".
+    Each question costs one token from the caller's "generate" budget.
+    """
+    token = os.getenv("ARCHIE_BATCH_TOKEN")
+    # compare_digest so the check doesn't leak how much of the token matched
+    supplied = fk.request.headers.get("Authorization", "")
+    if not _is_admin() and not (token and hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode())):
+        return fk.jsonify({"error": "Unauthorized"}), 403
+    
+    data = fk.request.get_json(silent=True) or {}
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        return fk.jsonify({"error": "questions must be a non-empty list"}), 400
+    max_questions = int(os.getenv("ARCHIE_BATCH_MAX_QUESTIONS", "500"))
+    if len(questions) > max_questions:
+        return fk.jsonify({"error": f"at most {max_questions} questions per batch"}), 400
+    for item in questions:
+        text = item.get("question") if isinstance(item, dict) else item
+        if not isinstance(text, str) or not text.strip():
+            return fk.jsonify({"error": "every question must be a non-empty string"}), 400
+    # A batch larger than the caller's burst could never be let through; say so instead of 429 forever
+    burst = rate_limiter.capacity("generate", **_rate_limit_keys())
+    if burst is not None and len(questions) > burst:
+        return fk.jsonify({"error": f"at most {int(burst)} questions per batch under the generate rate limit"}), 400
+    wait = _rate_limit_wait("generate", cost=len(questions))
+    if wait:
+        return _too_many_requests(wait)
+    try:
+        # Callers can ask for less parallelism than the server allows, never more
+        concurrency = min(int(data.get("concurrency") or gemini.batch_concurrency), gemini.batch_concurrency)
+    except (TypeError, ValueError):
+        return fk.jsonify({"error": "concurrency must be an integer"}), 400
+    
+    user_email = fk.request.cookies.get("user_email")
+    ip_address = fk.request.remote_addr
+    device_info = fk.request.user_agent.string
+    metrics.incr("batch_requests")
+    
+    def generate():
+        for result in iterate_async(gemini.answer_batch(questions, concurrency=concurrency)):
+            if "error" not in result:
+                data_collector.log_interaction(
+                    session_id="batch",
+                    user_email=user_email,
+                    ip_address=ip_address,
+                    device_info=device_info,
+                    question=result["question"],
+                    answer=result["answer"],
+                    generation_time_seconds=result["seconds"],
+                    model=result["model"]
+                )
+            yield FastJson.dumpb(result) + b"\n"
+    
+    return fk.Response(
+        fk.stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 import datetime
+def run_generation(generation, question, session_id, user_email, ip_address, device_info, start_time):
+    """
+    Drive one answer to completion, writing framed events into the generation's
+    ring buffer. Runs on its own thread so it doesn't depend on any one HTTP
+    connection staying open.
+    """
+    full_response = ""
+    loop = None
+    async_gen = None
+    next_chunk = None
+    cancelled = False
+    model_used = None
+    metrics.incr("generations_started")
+    try:
+        # Get conversation history if session exists
+        conversation_history = []
+        if session_id:
+            conversation_history = session_manager.get_conversation_history(session_id)
+
+        # Create a new event loop for this generation
+        loop = asyncio.new_event_loop()
+
+        async_gen = gemini.Archie_streaming(question, conversation_history=conversation_history, session_key=session_id)
+        framer = SSEFramer.from_env()
+        while True:
+            # Nobody is reading any more (tab closed, no reconnect): stop the model.
+            if generation.should_cancel():
+                cancelled = True
+                break
+
+            # Keep one pending __anext__ around so we can wake up to flush
+            # buffered tokens (and notice disconnects) even when the model pauses.
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(async_gen.__anext__(), loop=loop)
+            timeout = framer.time_until_flush()
+            timeout = CANCEL_POLL_SECONDS if timeout is None else min(timeout, CANCEL_POLL_SECONDS)
+            done, _ = loop.run_until_complete(asyncio.wait({next_chunk}, timeout=timeout))
+            if not done:
+                payload = framer.flush()
+                if payload:
+                    generation.append(payload)
+                continue
+
+            try:
+                # Get the next item from the async generator
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                # The generator is done.
+                break
+            finally:
+                next_chunk = None
+
+            if isinstance(chunk, str):
+                # Append it to the full response; the framer decides when it goes out.
+                full_response += chunk
+                payload = framer.push_token(chunk)
+                if payload:
+                    generation.append(payload)
+
+            elif isinstance(chunk, dict):
+                # Make it JSON-safe before streaming. because trial and error is the only way to figure this out apparently
+
+                if chunk.get('tool_name'):
+                    # Create a NEW, safe dictionary for the client
+                    json_safe_payload = {
+                        'tool_name': chunk.get('tool_name'),
+                        'tool_result_preview': str(chunk.get('tool_result'))[:500]
+                    }
+                    for payload in framer.event({'tool_call': json_safe_payload}):
+                        generation.append(payload)
+
+                elif chunk.get('route'):
+                    # Which model the router picked; kept for analytics
+                    model_used = chunk.get('model')
+
+                elif chunk.get('final'):
+                    # This is just a signal, ignore it.
+                    pass
+
+            else:
+                # Safely log it and send a debug message.
+
+                chunk_type = type(chunk).__name__
+                print(f"Warning: Received unexpected chunk type: {chunk_type}")
+
+                # Optionally send a safe representation to the client
+                for payload in framer.event({'debug_info': f'Received object: {chunk_type}'}):
+                    generation.append(payload)
+
+        if cancelled:
+            # Cancel the pending step; the CancelledError unwinds the whole
+            # generator chain, closing the model stream and any tool wait.
+            cancel_generation_chain(loop, async_gen, next_chunk)
+            next_chunk = None
+
+        # Anything still buffered goes out before we do the bookkeeping
+        payload = framer.flush()
+        if payload:
+            generation.append(payload)
+
+        # Calculate generation time
+        generation_time = time.time() - start_time
+
+        # Save to session if session_id exists (partial answers are flagged as cancelled)
+        if session_id:
+
+            session_manager.add_message(session_id, "user", question, user_email=user_email)
+            session_manager.add_message(session_id, "assistant", full_response, cancelled=cancelled, user_email=user_email)
+
+        # Collect analytics data I LOVE DATA COLLECTION
+        data_collector.log_interaction(
+            session_id=session_id if session_id else "no_session",
+            user_email=user_email,
+            ip_address=ip_address,
+            device_info=device_info,
+            question=question,
+            answer=full_response,
+            generation_time_seconds=generation_time,
+            cancelled=cancelled,
+            model=model_used
+        )
+
+
+        print(f"Question: {question}\nAnswer: {full_response}\n")
+
+        if cancelled:
+            print(f"Generation {generation.generation_id} cancelled, no client is reading it")
+            metrics.incr("generations_cancelled")
+            generation.append({'cancelled': True, 'done': True})
+        else:
+            metrics.incr("generations_completed")
+            # Send completion signal
+            generation.append({'done': True})
+    except Exception as e:
+        #print the traceback for debugging I may remove this but for now its useful
+        print(f"Error during streaming generation: {e}")
+        import traceback
+        traceback.print_exc()
+        metrics.incr("generations_failed")
+        generation.append({'error': 'Generation failed'})
+    finally:
+        generation.finish(cancelled=cancelled)
+
+        # Clean up the event loop (and any async generators still open on it)
+        if loop is not None and not loop.is_closed():
+            if next_chunk is not None:
+                cancel_generation_chain(loop, async_gen, next_chunk)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+
+def cancel_generation_chain(loop, async_gen, pending):
+    """Cancel the in-flight step of a generation and close the generator."""
+    if pending is not None and not pending.done():
+        pending.cancel()
+        loop.run_until_complete(asyncio.wait({pending}))
+    if async_gen is not None:
+        try:
+            loop.run_until_complete(async_gen.aclose())
+        except Exception as e:
+            print(f"Warning: error while closing cancelled generation: {e}")
+
+
+def stream_generation(generation, last_event_id: int = 0):
+    """
+    Yield numbered SSE frames for a generation starting after last_event_id.
+    Sends a comment line as a keepalive while the model is quiet, which is
+    also how a closed connection gets noticed.
+    """
+    cursor = last_event_id
+    generation.attach()
+    try:
+        while True:
+            # Short waits so a closed socket shows up on the next keepalive write
+            events, done = generation.read(cursor, timeout=CANCEL_POLL_SECONDS * 4)
+            if not events and not done:
+                yield SSE_KEEPALIVE
+                continue
+            for seq, payload in events:
+                cursor = seq
+                yield SSEFramer.encode(payload, event_id=seq)
+            if done and cursor >= generation.last_event_id:
+                break
+    finally:
+        # Runs when the stream ends *or* the server closes it after a disconnect
+        generation.detach()
+
+
+def _last_event_id() -> int:
+    """Read the resume cursor from the Last-Event-ID header (or ?last_event_id=)."""
+    raw = fk.request.headers.get("Last-Event-ID") or fk.request.args.get("last_event_id") or "0"
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return 0
+
+
+def _sse_response(stream, generation):
+    # Tell proxies (nginx etc.) not to buffer; the framer already batches tokens for us.
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'X-Generation-ID': generation.generation_id,
+    }
+    return fk.Response(stream, mimetype='text/event-stream', headers=headers)
+
+
 @app.route("/api/archie/stream", methods=["POST"])
+@rate_limited("generate")
 def api_archie_stream():
     """
     Streaming endpoint that returns AI responses token by token.
     This provides a better user experience by showing the AI "thinking" in real-time.
+
+    The answer is produced on a background thread into a resumable buffer; the
+    first event carries the generation_id needed to reconnect.
     """
     start_time = time.time()
-    
+
     data = fk.request.get_json()
     question = data.get("question", "")
     session_id = fk.request.cookies.get("session_id")
     user_email = fk.request.cookies.get("user_email")
-    
+
     # Capture request info for data collection
     ip_address = fk.request.remote_addr
     device_info = fk.request.user_agent.string
-    
-    def generate():
-        full_response = ""
-        loop = None
-        try:
-            # Get conversation history if session exists
-            conversation_history = []
-            if session_id:
-                conversation_history = session_manager.get_conversation_history(session_id)
-            
-            # Create a new event loop for this request 
-            loop = asyncio.new_event_loop()
-            
-            async_gen = gemini.Archie_streaming(question, conversation_history=conversation_history)
-            while True:
-                try:
-                    # Get the next item from the async generator
-                    chunk = loop.run_until_complete(async_gen.__anext__())
-                    
-                    
-                    if isinstance(chunk, str):
-                        # Append it to the full response and stream it.
-                        full_response += chunk
-                        yield f"data: {json.dumps({'token': chunk})}\n\n"
-                    
-                    elif isinstance(chunk, dict):
-                        # Make it JSON-safe before streaming. because trial and error is the only way to figure this out apparently
-                        
-                        if chunk.get('tool_name'):
-                            # Create a NEW, safe dictionary for the client
-                            json_safe_payload = {
-                                'tool_name': chunk.get('tool_name'),
-                                'tool_result_preview': str(chunk.get('tool_result'))[:500]
-                            }
-                            yield f"data: {json.dumps({'tool_call': json_safe_payload})}\n\n"
-                            
-                        elif chunk.get('final'):
-                            # This is just a signal, ignore it.
-                            pass
-                        
-                    
-                    else:
-                        # Safely log it and send a debug message.
-                        
-                        chunk_type = type(chunk).__name__
-                        print(f"Warning: Received unexpected chunk type: {chunk_type}")
-                        
-                        # Optionally send a safe representation to the client
-                        yield f"data: {json.dumps({'debug_info': f'Received object: {chunk_type}'})}\n\n"
-                except StopAsyncIteration:
-                    # The generator is done.
-                    break
-            
-            # Calculate generation time 
-            generation_time = time.time() - start_time
-            
-            # Save to session if session_id exists
-            if session_id:
-
-                session_manager.add_message(session_id, "user", question)
-                session_manager.add_message(session_id, "assistant", full_response)
-            
-            # Collect analytics data I LOVE DATA COLLECTION
-            data_collector.log_interaction(
-                session_id=session_id if session_id else "no_session",
-                user_email=user_email,
-                ip_address=ip_address,
-                device_info=device_info,
-                question=question,
-                answer=full_response,
-                generation_time_seconds=generation_time
-            )
-            
-            
-            print(f"Question: {question}\nAnswer: {full_response}\n")
-            
-            # Send completion signal
-            yield f"data: {json.dumps({'done': True})}\n\n"
-        except Exception as e:
-            #print the traceback for debugging I may remove this but for now its useful
-            print(f"Error during streaming generation: {e}")
-            import traceback
-            traceback.print_exc()
-        finally:
-            
-            # Clean up the event loop
-            if loop is not None and not loop.is_closed():
-                loop.close()
-    
-    return fk.Response(generate(), mimetype='text/event-stream')
+
+    # Re-asking the same question while the first answer is still running just
+    # reattaches to it instead of starting a second generation.
+    generation = generations.find_active(session_id, question)
+    if generation is None:
+        generation = generations.create(session_id, question)
+        generation.append({'generation_id': generation.generation_id})
+        threading.Thread(
+            target=run_generation,
+            args=(generation, question, session_id, user_email, ip_address, device_info, start_time),
+            daemon=True,
+        ).start()
+
+    return _sse_response(stream_generation(generation, 0), generation)
+
+
+@app.route("/api/archie/stream/<generation_id>", methods=["GET"])
+def api_archie_stream_resume(generation_id):
+    """Reconnect to a generation and replay everything after Last-Event-ID."""
+    generation = generations.get(generation_id)
+    if generation is None:
+        return fk.jsonify({"error": "Generation not found or expired"}), 404
+
+    if generation.session_id and generation.session_id != fk.request.cookies.get("session_id"):
+        return fk.jsonify({"error": "Unauthorized"}), 403
+
+    return _sse_response(stream_generation(generation, _last_event_id()), generation)
+
+
+@app.route("/api/archie/stream/<generation_id>/cancel", methods=["POST"])
+def api_archie_stream_cancel(generation_id):
+    """Explicitly stop a generation (sent by the page when it is closed)."""
+    generation = generations.get(generation_id)
+    if generation is None:
+        return fk.jsonify({"error": "Generation not found or expired"}), 404
+
+    if generation.session_id and generation.session_id != fk.request.cookies.get("session_id"):
+        return fk.jsonify({"error": "Unauthorized"}), 403
+
+    generation.cancel()
+    return fk.jsonify({"message": "Cancellation requested"})
+
+
+def _is_admin() -> bool:
+    """Admins are the logged-in emails listed in ADMIN_EMAILS (comma separated)."""
+    user_email = fk.request.cookies.get("user_email")
+    admins = {e.strip() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+    return bool(user_email) and user_email in admins
+
+
+@app.route("/api/admin/metrics", methods=["GET"])
+def admin_metrics():
+    """Process metrics as JSON (admins only)."""
+    if not _is_admin():
+        return fk.jsonify({"error": "Unauthorized"}), 403
+
+    snapshot = metrics.snapshot()
+    snapshot["generation_cancellation_rate"] = metrics.ratio("generations_cancelled", "generations_started")
+    snapshot["backends"] = gemini.backends.stats()
+    snapshot["session_sweeper"] = session_manager.sweeper.report()
+    snapshot["session_archive"] = session_manager.archive.stats()
+    snapshot["qr_cache"] = qr_service.stats()
+    snapshot["rate_limits"] = rate_limiter.stats()
+    snapshot["campus_index"] = gemini.campus.stats()
+    snapshot["context_snapshot"] = gemini.context_snapshot.stats()
+    return fk.jsonify(snapshot)
+
+
+@app.route("/api/admin/analytics/rollups", methods=["GET"])
+def admin_analytics_rollups():
+    """Pre-aggregated analytics buckets (admins only). ?granularity=minute|hour|day&start=&end=&model="""
+    if not _is_admin():
+        return fk.jsonify({"error": "Unauthorized"}), 403
+
+    granularity = fk.request.args.get("granularity", "hour")
+    try:
+        rows = data_collector.get_rollups(
+            granularity,
+            start=fk.request.args.get("start"),
+            end=fk.request.args.get("end"),
+            model=fk.request.args.get("model", "*"),
+        )
+    except ValueError as e:
+        return fk.jsonify({"error": str(e)}), 400
+    return fk.jsonify({"granularity": granularity, "buckets": rows, "models": data_collector.rollups.models()})
+
+def _export_filters() -> dict:
+    """start/end (ISO dates or datetimes) and session_id from the query string; ValueError if malformed."""
+    filters = {}
+    for name in ("start", "end"):
+        value = fk.request.args.get(name) or None
+        if value is not None:
+            datetime.datetime.fromisoformat(value)
+        filters[name] = value
+    session_id = fk.request.args.get("session_id") or None
+    if session_id is not None and not session_manager._is_valid_session_id(session_id):
+        raise ValueError("invalid session_id")
+    filters["session_id"] = session_id
+    return filters
+
+
+def _export_response(rows, columns, name: str):
+    """
+    Stream rows as ?format=ndjson|csv, gzipped on the fly with ?gzip=1.
+    Nothing is read until the client starts pulling, so big exports use flat memory.
+    """
+    fmt = fk.request.args.get("format", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        return fk.jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    compress = fk.request.args.get("gzip", "").lower() in ("1", "true", "yes")
+    filename = f"{name}.{fmt}" + (".gz" if compress else "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+    }
+    mimetype = "application/gzip" if compress else EXPORT_FORMATS[fmt]
+    return fk.Response(export_stream(rows, fmt, columns, compress=compress), mimetype=mimetype, headers=headers)
+
+
+@app.route("/api/admin/export/sessions", methods=["GET"])
+def admin_export_sessions():
+    """Every chat message as NDJSON/CSV (admins only). ?user=&session_id=&start=&end=&format=&gzip="""
+    if not _is_admin():
+        return fk.jsonify({"error": "Unauthorized"}), 403
+    try:
+        filters = _export_filters()
+    except ValueError as e:
+        return fk.jsonify({"error": str(e)}), 400
+    rows = iter_session_rows(session_manager, user=fk.request.args.get("user") or None, **filters)
+    return _export_response(rows, SESSION_COLUMNS, "archie-sessions")
+
+
+@app.route("/api/admin/export/analytics", methods=["GET"])
+def admin_export_analytics():
+    """Raw logged interactions as NDJSON/CSV (admins only). ?user=&session_id=&start=&end=&format=&gzip="""
+    if not _is_admin():
+        return fk.jsonify({"error": "Unauthorized"}), 403
+    try:
+        filters = _export_filters()
+    except ValueError as e:
+        return fk.jsonify({"error": str(e)}), 400
+    rows = iter_interaction_rows(data_collector, user=fk.request.args.get("user") or None, **filters)
+    return _export_response(rows, INTERACTION_COLUMNS, "archie-analytics")
+
+
+def _query_int(name: str):
+    """Optional non-negative integer query parameter (ValueError if malformed)."""
+    value = fk.request.args.get(name)
+    if value is None or value == "":
+        return None
+    number = int(value)
+    if number < 0:
+        raise ValueError(f"{name} must be >= 0")
+    return number
+
+
+def _session_response(payload, etag: str):
+    """JSON the browser may keep, but must revalidate with If-None-Match each time."""
+    resp = fk.make_response(payload)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+def _not_modified(etag: str):
+    return _session_response(("", 304), etag)
+
 
 #Gets conversation history for current session
 @app.route("/api/sessions/history", methods=["GET"])
 def get_session_history():
-    """Get conversation history for current session."""
+    """
+    Get conversation history for current session.
+    ?since=N returns only messages after the first N, ?limit=K only the last K
+    (?before=N pages further back). Answers 304 when If-None-Match still matches.
+    """
     session_id = fk.request.cookies.get("session_id")
     if not session_id:
         return fk.jsonify({"error": "No session found"}), 401
     
-    history = session_manager.get_conversation_history(session_id)
-    return fk.jsonify({"history": history})
+    meta = session_manager.get_session_meta(session_id)
+    if meta is None:
+        return fk.jsonify({"history": [], "start": 0, "cursor": 0, "total": 0})
+    if fk.request.if_none_match.contains(meta["etag"]):
+        return _not_modified(meta["etag"])
+    
+    try:
+        since, limit, before = _query_int("since"), _query_int("limit"), _query_int("before")
+    except ValueError as e:
+        return fk.jsonify({"error": str(e)}), 400
+    
+    result = session_manager.get_history(session_id, since=since, limit=limit, before=before)
+    if result is None:
+        return fk.jsonify({"history": [], "start": 0, "cursor": 0, "total": 0})
+    etag = result.pop("etag")
+    result["history"] = result.pop("messages")
+    result["session_id"] = session_id
+    return _session_response(fk.jsonify(result), etag)
 
 #List all sessions for current user
 @app.route("/api/sessions/list", methods=["GET"])
+@rate_limited("sessions")
 def list_user_sessions():
     """List all sessions for logged-in user."""
     user_email = fk.request.cookies.get("user_email")
@@ -218,22 +749,57 @@ def list_user_sessions():
     sessions = session_manager.get_all_user_sessions_with_preview(user_email)
     return fk.jsonify({"sessions": sessions})
 
+@app.route("/api/sessions/export", methods=["GET"])
+@rate_limited("sessions")
+def export_user_sessions():
+    """
+    Download your own chat history as NDJSON/CSV. Logged-in users get all their
+    sessions (or ?session_id= one of them); guests get their current session.
+    """
+    user_email = fk.request.cookies.get("user_email")
+    current_session_id = fk.request.cookies.get("session_id")
+    try:
+        filters = _export_filters()
+    except ValueError as e:
+        return fk.jsonify({"error": str(e)}), 400
+
+    if not user_email:
+        if not current_session_id or filters["session_id"] not in (None, current_session_id):
+            return fk.jsonify({"error": "Not logged in"}), 401
+        filters["session_id"] = current_session_id
+    elif filters["session_id"] and filters["session_id"] != current_session_id:
+        meta = session_manager.get_session_meta(filters["session_id"])
+        if meta is None:
+            return fk.jsonify({"error": "Session not found"}), 404
+        if meta["user_email"] != user_email:
+            return fk.jsonify({"error": "Unauthorized"}), 403
+
+    owner = None if filters["session_id"] else user_email
+    rows = iter_session_rows(session_manager, user=owner, **filters)
+    return _export_response(rows, SESSION_COLUMNS, "archie-chats")
+
 #get details for a specific session
 @app.route("/api/sessions/<session_id>", methods=["GET"])
 def get_session_details(session_id):
     """Get details of a specific session."""
     user_email = fk.request.cookies.get("user_email")
     
-    session_data = session_manager.get_session(session_id)
-    if not session_data:
+    meta = session_manager.get_session_meta(session_id)
+    if meta is None:
         return fk.jsonify({"error": "Session not found"}), 404
     
     # Check if user owns this session (or it's their current session)
     current_session_id = fk.request.cookies.get("session_id")
-    if session_data.get("user_email") != user_email and session_id != current_session_id:
+    if meta["user_email"] != user_email and session_id != current_session_id:
         return fk.jsonify({"error": "Unauthorized"}), 403
     
-    return fk.jsonify(session_data)
+    if fk.request.if_none_match.contains(meta["etag"]):
+        return _not_modified(meta["etag"])
+    
+    session_data = session_manager.get_session(session_id)
+    if not session_data:
+        return fk.jsonify({"error": "Session not found"}), 404
+    return _session_response(fk.jsonify(session_data), session_manager.session_etag(session_data))
 
 #Delete a specific session
 @app.route("/api/sessions/<session_id>", methods=["DELETE"])
@@ -258,6 +824,7 @@ def delete_session(session_id):
 
 #Create a new session
 @app.route("/api/sessions/new", methods=["POST"])
+@rate_limited("sessions")
 def create_new_session():
     """Create a new chat session for the current user."""
     user_email = fk.request.cookies.get("user_email")
@@ -286,6 +853,47 @@ def switch_session(session_id):
     resp.set_cookie("session_id", session_id, httponly=True, samesite="Lax")
     return resp
 
+#QR codes for posters and booths
+@app.route("/api/qr", methods=["GET"])
+def api_qr():
+    """
+    PNG or SVG QR code for ?text=. Optional: format=png|svg, box_size, border,
+    fill, back (colors) and mode (1|L|RGB|RGBA; PNGs stay 1-bit by default).
+    """
+    args = fk.request.args
+    try:
+        options = qr_options(
+            args.get("text", ""),
+            fmt=args.get("format", "png"),
+            box_size=args.get("box_size", 10),
+            border=args.get("border", 4),
+            fill_color=args.get("fill", "black"),
+            back_color=args.get("back", "white"),
+            mode=args.get("mode"),
+        )
+    except ValueError as e:
+        return fk.jsonify({"error": str(e)}), 400
+    
+    # Same options, same image: the key is a strong ETag and the URL can be cached for a long time
+    key = qr_cache_key(options)
+    if fk.request.if_none_match.contains(key):
+        resp = fk.make_response("", 304)
+    else:
+        # Cached codes are cheap; only renders spend the budget
+        if not qr_service.is_cached(key, options["fmt"]):
+            wait = _rate_limit_wait("qr")
+            if wait:
+                return _too_many_requests(wait)
+        try:
+            key, data = qr_service.get_normalized(options)
+        except CpuBusyError:
+            return fk.jsonify({"error": "Busy, try again shortly"}), 503
+        resp = fk.make_response(data)
+        resp.mimetype = QR_MIMETYPES[options["fmt"]]
+    resp.set_etag(key)
+    resp.headers["Cache-Control"] = "public, max-age=86400"
+    return resp
+
 #This is not used and guests are no longer supported. I am keeping it for potential future use.
 @app.route("/gchats", methods=["GET", "POST"])
 def gchats():
@@ -308,13 +916,24 @@ def chats():
         # Basic email validation
         if not email or "@" not in email or len(email) > 255:
             return fk.render_template("home.html", error="Please provide a valid email address")
+
+        # Per attempted account and per IP, so password guessing can't tie up the hashing pool
+        wait = _rate_limit_wait("login", user=email.lower())
+        if wait:
+            return _too_many_requests(wait, fk.render_template(
+                "home.html", error=f"Too many sign-in attempts, please try again in {RateLimiter.retry_after(wait)} seconds"))
         
         if not password:
             return fk.render_template("home.html", error="Password is required")
 
         if email and password:
             # Try to authenticate user
-            if session_manager.authenticate_user(email, password):
+            try:
+                authenticated = session_manager.authenticate_user(email, password)
+            except CpuBusyError:
+                # Login storm; the hashing pool is full, don't queue forever
+                return fk.render_template("home.html", error="Lots of people are signing in right now, please try again in a moment"), 503
+            if authenticated:
                 # Create new session for logged-in user
                 session_id = session_manager.create_session(user_email=email)
                 
@@ -326,7 +945,11 @@ def chats():
                 return resp
             else:
                 # User doesn't exist, create new account
-                if session_manager.create_user(email, password, ip_address=fk.request.remote_addr, device_info=fk.request.user_agent.string):
+                try:
+                    created = session_manager.create_user(email, password, ip_address=fk.request.remote_addr, device_info=fk.request.user_agent.string)
+                except CpuBusyError:
+                    return fk.render_template("home.html", error="Lots of people are signing in right now, please try again in a moment"), 503
+                if created:
                     session_id = session_manager.create_session(user_email=email)
 
                     resp = fk.make_response(fk.redirect(fk.url_for("index")))
@@ -342,30 +965,31 @@ def chats():
 
 
 def background_checker():
-    urls = {
-        "website": "https://www.arcadia.edu/",
-        "events": "https://www.arcadia.edu/events/?mode=month",
-        "about": "https://www.arcadia.edu/about-arcadia/",
-        "weather": "https://weather.com/weather/today/l/b0f4fc1167769407f55347d55f492a46e194ccaed63281d2fa3db2e515020994",
-        "diningHours": "https://www.arcadia.edu/life-arcadia/living-commuting/dining/",
-        "ITresources": "https://www.arcadia.edu/life-arcadia/campus-life-resources/information-technology/",
-        "Academic Calendar": "https://www.arcadia.edu/academics/resources/academic-calendars/2025-26/",
-        }
-    
+    """
+    Re-scrape the university pages. helpers/scraper.py writes scrape_results.json and
+    campus_index.json and publishes them as the next context snapshot; this worker
+    switches to it right away and the others on their next snapshot check.
+    """
+    # bs4 is only imported when a scrape actually runs
+    from helpers.scraper import background_checker as scrape_and_publish
+    scrape_and_publish()
+    gemini.context_snapshot.refresh()
 
-    dictionary = {}
-    for name, url in urls.items():
-        result = gemini.scrape_website(url)
-        dictionary[name] = result
 
-    # ensure the data directory exists, then write the collected dictionary as JSON
-    os.makedirs(os.path.dirname("data/scrape_results.json"), exist_ok=True)
-    with open("data/scrape_results.json", "w", encoding="utf-8") as f:
-        json.dump(dictionary, f, ensure_ascii=False, indent=4)
+def make_site_qr():
+    """Write the site QR code (qrcode/PIL are only imported here, off the boot path)."""
+    from lib import qrCodeGen
+    qrCodeGen.make_qr(
+        os.getenv("QR_URL", "https://118ce87f29d4.ngrok-free.app"),
+        show=os.getenv("QR_SHOW", "0") == "1",
+        save_path="websiteqr.png",
+    )
 
-    
-if __name__ == "__main__":
 
+if __name__ == "__main__":
 
-    qrCodeGen.make_qr("https://118ce87f29d4.ngrok-free.app", show=True, save_path="websiteqr.png")
-    app.run(host="0.0.0.0", port=5000, debug=True, threaded=True)
\ No newline at end of file
+    startup.start()
+    threading.Thread(target=make_site_qr, daemon=True).start()
+    # The debug reloader imports everything twice; only use it when asked for
+    debug = os.getenv("FLASK_DEBUG", "0") == "1"
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")), debug=debug, threaded=True)
\ No newline at end of file
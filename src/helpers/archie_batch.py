@@ -0,0 +1,93 @@
+"""
+Answer a file of questions in bulk (e.g. the nightly FAQ refresh).
+
+Questions come one per line, or as JSON lines with "id" and "question".
+Results are written as NDJSON in the order they finish. By default the
+questions are answered in-process with AiInterface.answer_batch. With --url,
+they are sent to a running server's /api/archie/batch instead.
+
+Usage:
+    python src/helpers/archie_batch.py faq.txt --out answers.ndjson --concurrency 8
+    python src/helpers/archie_batch.py faq.jsonl --url http://localhost:5000 --token $ARCHIE_BATCH_TOKEN
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib import FastJson
+
+
+def load_questions(path: str) -> list:
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                questions.append(FastJson.loads(line))
+            else:
+                questions.append(line)
+    return questions
+
+
+def run_remote(url: str, token: str, questions: list, concurrency: int):
+    import requests
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    body = {"questions": questions}
+    if concurrency:
+        body["concurrency"] = concurrency
+    with requests.post(f"{url.rstrip('/')}/api/archie/batch", json=body, headers=headers, stream=True) as res:
+        res.raise_for_status()
+        for line in res.iter_lines(decode_unicode=True):
+            if line:
+                yield FastJson.loads(line)
+
+
+def run_local(questions: list, concurrency: int, emit):
+    from lib.GemInterface import AiInterface
+
+    async def consume():
+        async for result in AiInterface().answer_batch(questions, concurrency=concurrency or None):
+            emit(result)
+
+    asyncio.run(consume())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer many questions at once")
+    parser.add_argument("questions", help="text file (one question per line) or JSON lines with id/question")
+    parser.add_argument("--out", help="write NDJSON here instead of stdout")
+    parser.add_argument("--concurrency", type=int, default=0, help="questions in flight (default: ARCHIE_BATCH_CONCURRENCY)")
+    parser.add_argument("--url", help="use a running server instead of answering in-process")
+    parser.add_argument("--token", default=os.getenv("ARCHIE_BATCH_TOKEN"))
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    start = time.perf_counter()
+    failed = []
+
+    def emit(result):
+        if "error" in result:
+            failed.append(result["id"])
+        out.write(FastJson.dumps(result) + "\n")
+        out.flush()
+
+    try:
+        if args.url:
+            for result in run_remote(args.url, args.token, questions, args.concurrency):
+                emit(result)
+        else:
+            run_local(questions, args.concurrency, emit)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{len(questions)} questions, {len(failed)} failed in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
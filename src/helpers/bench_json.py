@@ -0,0 +1,114 @@
+"""
+JSON cost per chat turn, before and after lib/FastJson.
+
+One simulated turn does what the app does for one question and answer:
+  - read + write the session file twice (user message, then assistant message)
+  - encode every streamed SSE frame of the answer
+  - encode the analytics record
+  - encode the history response the chat page fetches afterwards
+
+and is timed three ways (CPU time, best of --repeat):
+  legacy   stdlib json, indent=4 session files, one json.dumps per SSE token frame
+  stdlib   the current code paths with FastJson forced onto the stdlib
+  fast     the current code paths with orjson (if installed)
+
+Usage:
+    python src/helpers/bench_json.py --turns 200 --history 40 --tokens 300
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib import FastJson
+from lib.StreamFramer import SSEFramer
+
+
+def make_session(history: int) -> dict:
+    messages = []
+    for i in range(history):
+        messages.append({
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": ("When does the spring semester start and where do I pick up my ID card? " * 6)[: 120 if i % 2 == 0 else 480],
+            "timestamp": datetime.now().isoformat(),
+        })
+    return {"session_id": "x" * 43, "user_email": "student@arcadia.edu", "created_at": datetime.now().isoformat(),
+            "version": history, "messages": messages}
+
+
+def make_tokens(count: int) -> list:
+    words = "Spring classes begin on January 20th; ID cards are picked up at the Public Safety office in Knight Hall.".split()
+    return [(" " if i else "") + words[i % len(words)] for i in range(count)]
+
+
+def legacy_turn(session_bytes: bytes, tokens: list, record: dict):
+    for role in ("user", "assistant"):
+        session = json.loads(session_bytes.decode("utf-8"))
+        session["messages"].append({"role": role, "content": "x" * 200, "timestamp": "2025-01-01T00:00:00"})
+        session_bytes = json.dumps(session, indent=4).encode("utf-8")
+    for seq, token in enumerate(tokens, 1):
+        f"id: {seq}\ndata: {json.dumps({'token': token})}\n\n".encode("utf-8")
+    (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+    json.dumps({"history": session["messages"]}).encode("utf-8")
+
+
+def current_turn(session_bytes: bytes, tokens: list, record: dict):
+    for role in ("user", "assistant"):
+        session = FastJson.loads(session_bytes)
+        session["messages"].append({"role": role, "content": "x" * 200, "timestamp": "2025-01-01T00:00:00"})
+        session_bytes = FastJson.dumpb(session)
+    for seq, token in enumerate(tokens, 1):
+        SSEFramer.encode({"token": token}, event_id=seq)
+    FastJson.dumpb(record) + b"\n"
+    FastJson.dumpb({"history": session["messages"]}, sort_keys=True)
+
+
+def cpu_per_turn(turn, session_bytes: bytes, tokens: list, record: dict, turns: int, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        for _ in range(turns):
+            turn(session_bytes, tokens, record)
+        elapsed = (time.process_time() - start) / turns
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU spent on JSON per chat turn")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--history", type=int, default=40, help="messages already in the session")
+    parser.add_argument("--tokens", type=int, default=300, help="SSE frames per answer (one per token, worst case)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    session = make_session(args.history)
+    tokens = make_tokens(args.tokens)
+    record = {"timestamp": datetime.now().isoformat(), "session_id": "x" * 43, "user_email": "student@arcadia.edu",
+              "ip_address": "10.0.0.1", "device_info": "Mozilla/5.0", "question": "When does spring start?",
+              "answer": "".join(tokens), "generation_time_seconds": 3.2, "cancelled": False, "model": "qwen3"}
+
+    legacy_session = json.dumps(session, indent=4).encode("utf-8")
+    compact_session = json.dumps(session, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    results = {"legacy": cpu_per_turn(legacy_turn, legacy_session, tokens, record, args.turns, args.repeat)}
+
+    orjson = FastJson.orjson
+    FastJson.orjson = None
+    results["stdlib"] = cpu_per_turn(current_turn, compact_session, tokens, record, args.turns, args.repeat)
+    FastJson.orjson = orjson
+    if orjson is not None:
+        results["fast"] = cpu_per_turn(current_turn, compact_session, tokens, record, args.turns, args.repeat)
+
+    print(f"session file: {len(legacy_session)} bytes indented, {len(compact_session)} bytes compact")
+    print(f"JSON backend: {'orjson' if orjson is not None else 'stdlib only (pip install orjson)'}")
+    base = results["legacy"]
+    for name, seconds in results.items():
+        saved = (1 - seconds / base) * 100
+        print(f"{name:>7}: {seconds * 1000:.3f} ms CPU per turn ({saved:.0f}% saved vs legacy)")
+
+
+if __name__ == "__main__":
+    main()
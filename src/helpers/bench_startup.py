@@ -0,0 +1,100 @@
+"""
+Startup-time benchmark for ArchieAI.
+
+Launches `python src/app.py` and measures, from process start:
+  serving      /healthz answers
+  ready        /readyz answers 200 (model loaded, context built)
+  first token  first streamed token for a question (with --question)
+
+Also times a bare `import app` so import regressions show up on their own.
+
+Usage (from the repo root, with Ollama running):
+    python src/helpers/bench_startup.py --runs 3 --question "When is fall break?"
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import requests
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import(runs: int) -> float:
+    """Best-of-N wall time for importing the app module in a fresh interpreter."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {SRC_DIR!r}); import app"],
+                       check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def wait_for(url: str, start: float, timeout: float, status: int = 200):
+    """Seconds from `start` until GET url returns `status`, or None on timeout."""
+    while time.perf_counter() - start < timeout:
+        try:
+            if requests.get(url, timeout=1).status_code == status:
+                return time.perf_counter() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def first_token(base: str, question: str, start: float, timeout: float):
+    """Seconds from `start` until the first token event of a streamed answer."""
+    with requests.post(f"{base}/api/archie/stream", json={"question": question}, stream=True, timeout=timeout) as res:
+        for line in res.iter_lines(decode_unicode=True):
+            if line and line.startswith("data: "):
+                payload = json.loads(line[6:])
+                if payload.get("token"):
+                    return time.perf_counter() - start
+    return None
+
+
+def run_once(port: int, question: str, timeout: float) -> dict:
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, PORT=str(port), FLASK_DEBUG="0")
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, "app.py")], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        result = {"serving": wait_for(f"{base}/healthz", start, timeout)}
+        result["ready"] = wait_for(f"{base}/readyz", start, timeout)
+        if question and result["ready"] is not None:
+            result["first_token"] = first_token(base, question, start, timeout)
+            try:
+                result["steps"] = requests.get(f"{base}/readyz", timeout=2).json()["steps"]
+            except requests.RequestException:
+                pass
+        return result
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ArchieAI cold start")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--question", default="", help="also time the first streamed token for this question")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    print(f"import app: {time_import(args.runs):.2f}s (best of {args.runs})")
+    for i in range(args.runs):
+        result = run_once(args.port, args.question, args.timeout)
+        parts = [f"{k}={v:.2f}s" if isinstance(v, float) else f"{k}={v}" for k, v in result.items() if k != "steps"]
+        print(f"run {i + 1}: " + " ".join(parts))
+        if "steps" in result:
+            print("  steps: " + ", ".join(f"{name}={s.get('seconds')}s" for name, s in result["steps"].items()))
+
+
+if __name__ == "__main__":
+    main()
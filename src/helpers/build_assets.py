@@ -0,0 +1,130 @@
+"""
+Build step for ArchieAI's static assets.
+
+For every file under src/static/ (except dist/):
+  - minify CSS, JS (rjsmin if installed) and SVG
+  - fingerprint the name with a content hash (style.css -> style.3fa2b1c9d0.css)
+  - precompress to .gz, and to .br when the brotli package is installed
+  - record it in static/dist/manifest.json, which asset_url() reads
+
+Fingerprinted files are served with immutable cache headers, so a repeat page
+load only transfers the HTML. Run after changing anything in static/:
+    python src/helpers/build_assets.py [--clean]
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.FileStore import atomic_write_json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".html", ".txt")
+# Not worth compressing below this; the headers would cost more than they save
+MIN_COMPRESS_BYTES = 256
+
+
+def minify_css(text: str) -> str:
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    # Only the space after a property's colon; "a :hover" is a different selector than "a:hover"
+    text = re.sub(r"([{;])([\w-]+):\s+", r"\1\2:", text)
+    return text.replace(";}", "}").strip()
+
+
+def minify_js(text: str) -> str:
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    # Without a real minifier only drop indentation and blank lines; gzip takes care of the rest
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip()) + "\n"
+
+
+def minify_svg(text: str) -> str:
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.S)
+    return re.sub(r">\s+<", "><", text).strip()
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js, ".svg": minify_svg}
+
+
+def build(static_dir: str = STATIC_DIR, clean: bool = False) -> dict:
+    dist_dir = os.path.join(static_dir, "dist")
+    if clean and os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir, exist_ok=True)
+
+    assets = {}
+    totals = {"source": 0, "built": 0, "gzip": 0, "br": 0}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_dir]
+        for name in sorted(files):
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, static_dir).replace(os.sep, "/")
+            stem, ext = os.path.splitext(rel)
+            with open(src, "rb") as f:
+                data = f.read()
+            totals["source"] += len(data)
+
+            if ext.lower() in MINIFIERS:
+                data = MINIFIERS[ext.lower()](data.decode("utf-8")).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()[:10]
+            out_rel = f"{stem}.{digest}{ext}"
+            out = os.path.join(dist_dir, out_rel)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            if not os.path.exists(out):
+                with open(out, "wb") as f:
+                    f.write(data)
+            entry = {"file": out_rel, "bytes": len(data)}
+            totals["built"] += len(data)
+
+            if ext.lower() in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES:
+                gz = gzip.compress(data, compresslevel=9, mtime=0)
+                with open(out + ".gz", "wb") as f:
+                    f.write(gz)
+                entry["gzip"] = len(gz)
+                totals["gzip"] += len(gz)
+                if brotli is not None:
+                    br = brotli.compress(data, quality=11)
+                    with open(out + ".br", "wb") as f:
+                        f.write(br)
+                    entry["br"] = len(br)
+                    totals["br"] += len(br)
+            assets[rel] = entry
+
+    atomic_write_json(os.path.join(dist_dir, "manifest.json"), {"assets": assets}, pretty=True)
+    return {"assets": assets, "totals": totals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minify, fingerprint and precompress static assets")
+    parser.add_argument("--static-dir", default=STATIC_DIR)
+    parser.add_argument("--clean", action="store_true", help="remove old builds first")
+    args = parser.parse_args()
+
+    result = build(args.static_dir, clean=args.clean)
+    for rel, entry in sorted(result["assets"].items()):
+        sizes = " ".join(f"{k}={entry[k]}" for k in ("bytes", "gzip", "br") if k in entry)
+        print(f"{rel} -> dist/{entry['file']} ({sizes})")
+    totals = result["totals"]
+    print(f"Total: {totals['source']} bytes source, {totals['built']} minified, {totals['gzip']} gzip"
+          + (f", {totals['br']} brotli" if brotli is not None else " (pip install brotli for .br)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Export chat sessions or logged analytics as NDJSON or CSV, streamed.
+
+Rows are read one session / one log line at a time and written as they're
+encoded, so a whole semester exports in flat memory. The same code serves
+/api/admin/export/* and /api/sessions/export.
+
+Usage:
+    python src/helpers/export_data.py analytics --start 2025-09-01 --end 2025-12-20 --format csv --gzip --out fall.csv.gz
+    python src/helpers/export_data.py sessions --user student@arcadia.edu --out student.ndjson
+    python src/helpers/export_data.py sessions --session <id> --format csv
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.DataExport import FORMATS, SESSION_COLUMNS, INTERACTION_COLUMNS, export_stream, iter_session_rows, iter_interaction_rows
+
+
+class _Counted:
+    """Counts rows as they pass through to the encoder."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream sessions or analytics out as NDJSON/CSV")
+    parser.add_argument("what", choices=["sessions", "analytics"])
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--user", help="only this user's email ('guest' for guests in analytics)")
+    parser.add_argument("--session", help="only this session id")
+    parser.add_argument("--start", help="ISO date/time, inclusive")
+    parser.add_argument("--end", help="ISO date/time, inclusive (a date covers the whole day)")
+    parser.add_argument("--format", choices=list(FORMATS), default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("--out", help="write here instead of stdout")
+    args = parser.parse_args()
+
+    if args.what == "sessions":
+        from lib.SessionManager import SessionManager
+        rows = iter_session_rows(SessionManager(data_dir=args.data_dir), user=args.user,
+                                 session_id=args.session, start=args.start, end=args.end)
+        columns = SESSION_COLUMNS
+    else:
+        from lib.DataCollector import DataCollector
+        rows = iter_interaction_rows(DataCollector(data_dir=args.data_dir), user=args.user,
+                                     session_id=args.session, start=args.start, end=args.end)
+        columns = INTERACTION_COLUMNS
+
+    rows = _Counted(rows)
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    start = time.perf_counter()
+    written = 0
+    try:
+        for chunk in export_stream(rows, args.format, columns, compress=args.gzip):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        else:
+            out.flush()
+    print(f"{rows.count} rows, {written} bytes in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
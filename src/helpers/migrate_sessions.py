@@ -0,0 +1,71 @@
+"""
+One-time migration of data/sessions/ into the sharded + packed layout.
+
+Moves every flat data/sessions/<id>.json into its hashed shard directory
+(rewriting it as compact JSON), then packs sessions idle for --archive-after-days
+into compressed pack files. Session IDs don't change, so existing links and
+users.json keep working. Safe to re-run.
+
+Usage:
+    python src/helpers/migrate_sessions.py --data-dir data --archive-after-days 30
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.SessionManager import SessionManager
+from lib import FastJson
+
+
+def disk_usage(path: str):
+    """(file count, bytes) under path."""
+    files = size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard and pack ArchieAI session files")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--archive-after-days", type=float, default=30,
+                        help="pack sessions not modified for this many days (0 = shard only)")
+    parser.add_argument("--repack", action="store_true", help="also rewrite packs that are mostly dead space")
+    args = parser.parse_args()
+
+    manager = SessionManager(data_dir=args.data_dir, archive_after_days=0)
+    files_before, bytes_before = disk_usage(manager.sessions_dir)
+
+    moved = 0
+    for session_id, path in list(manager.iter_hot_session_files()):
+        if os.path.dirname(path) != manager.sessions_dir:
+            continue  # already sharded
+        try:
+            # Same parser SessionManager reads sessions with
+            data = FastJson.load_file(path)
+        except FastJson.JSONDecodeError as e:
+            print(f"Skipping corrupted session {session_id}: {e}")
+            continue
+        mtime = os.stat(path).st_mtime
+        manager._write_session_file(session_id, data)
+        # Keep the old mtime so idle sessions are still recognised as idle
+        os.utime(manager._session_path(session_id), (mtime, mtime))
+        os.remove(path)
+        moved += 1
+    print(f"Sharded {moved} session files")
+
+    if args.archive_after_days:
+        stats = manager.archive_idle_sessions(idle_days=args.archive_after_days)
+        print(f"Packed {stats['archived']} idle sessions ({stats['bytes_before']} -> {stats['bytes_after']} bytes)")
+    if args.repack:
+        print(f"Repack reclaimed {manager.archive.repack()} bytes")
+
+    files_after, bytes_after = disk_usage(manager.sessions_dir)
+    print(f"data/sessions: {files_before} files / {bytes_before} bytes -> {files_after} files / {bytes_after} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Batch QR code renderer for posters and booth signs.
+
+Reads a CSV with a `text` (or `url`) column and an optional `name` column and
+writes one PNG/SVG per row into the output directory. Codes are rendered in a
+process pool and stored in the shared QR cache (see lib/QrService.py), and the
+output directory keeps a manifest of what each file contains, so re-running
+an unchanged set only stats files.
+
+Usage:
+    python src/helpers/qr_batch.py posters.csv --out qr_out --format png --box-size 12
+    python src/helpers/qr_batch.py posters.csv --out qr_out --mode RGB   # for tools that need RGB PNGs
+"""
+import os
+import re
+import sys
+import csv
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.QrService import QrService, normalize_options, cache_key, render
+from lib.FileStore import atomic_write_json
+from lib import FastJson
+
+MANIFEST = ".qr_manifest.json"
+
+_worker_service = None
+
+
+def _write_file(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _render_job(job):
+    """Runs in a pool process: render, store in the shared cache, write the outputs."""
+    global _worker_service
+    options, key, paths, cache_dir = job
+    if _worker_service is None or _worker_service.cache_dir != cache_dir:
+        _worker_service = QrService(cache_dir)
+    data = render(options)
+    _worker_service.write_disk(key, options["fmt"], data)
+    for path in paths:
+        _write_file(path, data)
+    return key, len(data)
+
+
+def _output_name(row: dict, key: str, fmt: str) -> str:
+    name = (row.get("name") or "").strip()
+    # Keep names filesystem-safe; fall back to the content key
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("._") or key[:16]
+    return f"{name}.{fmt}"
+
+
+def load_rows(csv_path: str):
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            text = (row.get("text") or row.get("url") or "").strip()
+            if text:
+                yield row, text
+
+
+def run_batch(csv_path: str, out_dir: str, cache_dir: str, workers: int, **render_options) -> dict:
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    try:
+        manifest = FastJson.load_file(manifest_path)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+
+    cache = QrService(cache_dir)
+    counts = {"rows": 0, "unchanged": 0, "cached": 0, "rendered": 0, "errors": 0}
+    pending = {}  # key -> (options, [output paths])
+    new_manifest = {}
+
+    for row, text in load_rows(csv_path):
+        counts["rows"] += 1
+        try:
+            options = normalize_options(text, **render_options)
+        except ValueError as e:
+            print(f"skipping {text[:60]!r}: {e}")
+            counts["errors"] += 1
+            continue
+        key = cache_key(options)
+        filename = _output_name(row, key, options["fmt"])
+        path = os.path.join(out_dir, filename)
+        new_manifest[filename] = key
+
+        if manifest.get(filename) == key and os.path.exists(path):
+            counts["unchanged"] += 1
+            continue
+        if key in pending:
+            pending[key][1].append(path)
+            continue
+        data = cache.read_disk(key, options["fmt"])
+        if data is not None:
+            _write_file(path, data)
+            counts["cached"] += 1
+            continue
+        pending[key] = (options, [path])
+
+    jobs = [(options, key, paths, cache_dir) for key, (options, paths) in pending.items()]
+    if jobs:
+        if workers > 0:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Small jobs; batch them so the pool isn't all IPC
+                chunksize = max(1, len(jobs) // (workers * 8))
+                results = list(pool.map(_render_job, jobs, chunksize=chunksize))
+        else:
+            results = [_render_job(job) for job in jobs]
+        counts["rendered"] = sum(len(pending[key][1]) for key, _ in results)
+
+    atomic_write_json(manifest_path, new_manifest, pretty=True)
+    counts["seconds"] = round(time.perf_counter() - start, 3)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render QR codes for every row of a CSV")
+    parser.add_argument("csv", help="CSV with a text (or url) column and an optional name column")
+    parser.add_argument("--out", default="qr_out", help="output directory")
+    parser.add_argument("--format", default="png", choices=["png", "svg"])
+    parser.add_argument("--box-size", type=int, default=10)
+    parser.add_argument("--border", type=int, default=4)
+    parser.add_argument("--fill", default="black")
+    parser.add_argument("--back", default="white")
+    parser.add_argument("--mode", default=None, choices=["1", "L", "RGB", "RGBA"],
+                        help="PNG image mode; by default black/white codes stay 1-bit (no RGB conversion)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="render processes (0 = inline)")
+    parser.add_argument("--cache-dir", default=os.getenv("QR_CACHE_DIR", os.path.join("data", "qr_cache")))
+    args = parser.parse_args()
+
+    counts = run_batch(
+        args.csv, args.out, args.cache_dir, args.workers,
+        fmt=args.format, box_size=args.box_size, border=args.border,
+        fill_color=args.fill, back_color=args.back, mode=args.mode,
+    )
+    print(f"{counts['rows']} rows: {counts['rendered']} rendered, {counts['cached']} from cache, "
+          f"{counts['unchanged']} unchanged, {counts['errors']} skipped in {counts['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 import os
-import json
+import sys
 import asyncio
 from dotenv import load_dotenv
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
-from typing import Optional
+from typing import Optional, Tuple, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.FileStore import atomic_write_json, file_signature
+from lib import FastJson
+from lib.CampusIndex import build_index
+from lib.ContextSnapshot import build_sections, publish
 """Scrapes websites and returns their text content.
 This code is unused And will remain used due to the switch to tool calling.
 The only reason i am keeping it is so i dont have to re-write GemInterface to not use this file and in case i need a web scraper in the future.
@@ -38,12 +44,10 @@ The only reason i am keeping it is so i dont have to re-write GemInterface to no
 This code is unused And will remain used due to the switch to tool calling.
 The only reason i am keeping it is so i dont have to re-write GemInterface to not use this file and in case i need a web scraper in the future.
 """
-def scrape_website(url: str, timeout: Optional[int] = None) -> str:
+def fetch_html(url: str, timeout: Optional[int] = None) -> Tuple[Optional[str], Optional[str]]:
     """
-    Improved synchronous web scraper that:
-    - creates a requests.Session with browser-like headers
-    - has a Retry strategy for transient status codes (429, 5xx)
-    - keeps the interface synchronous (requests + BeautifulSoup)
+    GET a page with browser-like headers and retries for transient statuses (429, 5xx).
+    Returns (html, None) on success, or (body or None, error message) when it fails.
     """
     # build a session with a retry strategy
     session = requests.Session()
@@ -75,20 +79,37 @@ def scrape_website(url: str, timeout: Optional[int] = None) -> str:
         except requests.HTTPError as http_err:
             # provide helpful debug string but still return any HTML body if present
             print(f"HTTP error for {url}: {http_err} (status {getattr(response, 'status_code', 'unknown')})")
-            if response.text:
-                soup = BeautifulSoup(response.text, "html.parser")
-                return soup.get_text()
-            return f"HTTP error when scraping {url}: {http_err}"
-
-        # successful response
-        soup = BeautifulSoup(response.text, "html.parser")
-        return soup.get_text()
+            return (response.text or None), f"HTTP error when scraping {url}: {http_err}"
+        return response.text, None
     except requests.RequestException as e:
         print(f"RequestException when scraping {url}: {e}")
-        return f"An error occurred while scraping the website: {e}"
+        return None, f"An error occurred while scraping the website: {e}"
     except Exception as e:
         print(f"Unexpected error when scraping {url}: {e}")
-        return f"An unexpected error occurred while scraping the website: {e}"
+        return None, f"An unexpected error occurred while scraping the website: {e}"
+
+
+def scrape_website(url: str, timeout: Optional[int] = None) -> str:
+    """
+    Improved synchronous web scraper that:
+    - creates a requests.Session with browser-like headers
+    - has a Retry strategy for transient status codes (429, 5xx)
+    - keeps the interface synchronous (requests + BeautifulSoup)
+    """
+    html, error = fetch_html(url, timeout)
+    if html:
+        return BeautifulSoup(html, "html.parser").get_text()
+    return error
+
+
+def page_lines(html: str) -> List[str]:
+    """Visible text of a page, one line per block (table cells, list items, headings)."""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript", "template"]):
+        tag.decompose()
+    lines = (" ".join(line.split()) for line in soup.get_text("\n").splitlines())
+    return [line for line in lines if line]
+
 
 def background_checker():
     urls = {
@@ -101,18 +122,37 @@ def background_checker():
         "Academic Calendar": "https://www.arcadia.edu/academics/resources/academic-calendars/2025-26/",
     }
 
+    # Pages also parsed into data/campus_index.json for the calendar/dining/events fast path
+    structured = {"Academic Calendar": "calendar", "diningHours": "dining", "events": "events"}
+
     dictionary = {}
+    pages = {}
     for name, url in urls.items():
+        html, error = fetch_html(url)
+        result = BeautifulSoup(html, "html.parser").get_text() if html else error
         #sanitize result by removing newlines and excessive whitespace
-        result = scrape_website(url=url)
         result = ' '.join(result.split())
         dictionary[name] = result
+        if name in structured and html and error is None:
+            pages[structured[name]] = page_lines(html)
+
+    # write the collected dictionary as JSON (atomically, the app may be reading it)
+    atomic_write_json("data/scrape_results.json", dictionary)
+
+    # Pages that failed this round keep their records from the last good scrape
+    try:
+        previous = FastJson.load_file("data/campus_index.json")
+    except (FileNotFoundError, FastJson.JSONDecodeError):
+        previous = None
+    index = build_index(pages, previous=previous)
+    atomic_write_json("data/campus_index.json", index)
+    print(f"Campus index: {len(index['calendar'])} calendar entries, {len(index['dining'])} dining hours, {len(index['events'])} events")
 
-    # ensure the data directory exists, then write the collected dictionary as JSON
-    os.makedirs(os.path.dirname("data/scrape_results.json"), exist_ok=True)
-    #sanitize the data i.e removing /n and \n and other chars like that
-    with open("data/scrape_results.json", "w", encoding="utf-8") as f:
-        json.dump(dictionary, f, ensure_ascii=False, indent=4)
+    # Publish both as the next version of the snapshot the app's workers mmap
+    snapshot_file = os.getenv("CONTEXT_SNAPSHOT_FILE", "data/context_snapshot.bin")
+    sources = {path: file_signature(path) for path in ("data/scrape_results.json", "data/campus_index.json")}
+    version = publish(snapshot_file, build_sections(dictionary, index, sources))
+    print(f"Context snapshot: version {version} published to {snapshot_file}")
 import time
 if __name__ == "__main__":
     while True:
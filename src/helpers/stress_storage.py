@@ -0,0 +1,127 @@
+"""
+Multi-process stress test for ArchieAI's storage layer.
+
+Starts N worker processes against one throwaway data directory. Every worker
+creates users and sessions, appends messages (some to a session shared by all
+workers), and logs interactions. At the end it checks that nothing was lost:
+every session and message is present, users.json lists every session, and the
+analytics log and rollups count every interaction.
+
+Usage:
+    python src/helpers/stress_storage.py --workers 8 --iterations 200
+Exits non-zero if anything went missing. A smaller run of the same worker is
+part of the test suite (tests/test_storage.py).
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+SHARED_SESSION = "shared-stress-session"
+
+
+def worker(data_dir: str, worker_id: int, iterations: int, queue):
+    # Imported here so each process builds its own managers, like separate gunicorn workers
+    from lib.SessionManager import SessionManager
+    from lib.DataCollector import DataCollector
+
+    sessions = SessionManager(data_dir=data_dir, archive_after_days=0)
+    sessions._start_maintenance = lambda: None  # keep the sweeper out of the count
+    collector = DataCollector(data_dir=data_dir)
+
+    email = f"worker{worker_id}@stress.test"
+    sessions.create_user(email, "pw", ip_address="127.0.0.1", device_info="stress")
+
+    created = []
+    for i in range(iterations):
+        session_id = sessions.create_session(user_email=email)
+        created.append(session_id)
+        sessions.add_message(session_id, "user", f"q{i}")
+        sessions.add_message(session_id, "assistant", f"a{i}")
+        sessions.add_message(SHARED_SESSION, "user", f"w{worker_id}-{i}")
+        collector.log_interaction(
+            session_id=session_id,
+            user_email=email,
+            ip_address="127.0.0.1",
+            device_info="stress",
+            question=f"q{i}",
+            answer=f"a{i}",
+            generation_time_seconds=0.01,
+            model="stress",
+        )
+    collector.rollups.flush()
+    queue.put((email, created))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hammer SessionManager/DataCollector from many processes")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="keep the temp data directory")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="archie-stress-")
+    # Small segments so rotation and background compression race with the appends too
+    os.environ["ANALYTICS_SEGMENT_MAX_BYTES"] = "65536"
+    # Hash inline; the workers are already separate processes
+    os.environ["CPU_WORKERS"] = "0"
+    queue = mp.Queue()
+    start = time.time()
+    procs = [mp.Process(target=worker, args=(data_dir, w, args.iterations, queue)) for w in range(args.workers)]
+    for p in procs:
+        p.start()
+    results = dict(queue.get() for _ in procs)
+    for p in procs:
+        p.join()
+    elapsed = time.time() - start
+
+    from lib.SessionManager import SessionManager
+    from lib.DataCollector import DataCollector
+    sessions = SessionManager(data_dir=data_dir, archive_after_days=0)
+    collector = DataCollector(data_dir=data_dir)
+
+    errors = []
+    for email, created in results.items():
+        listed = sessions.get_user_sessions(email)
+        if sorted(listed) != sorted(created):
+            errors.append(f"{email}: users.json lists {len(listed)} of {len(created)} sessions")
+        for session_id in created:
+            data = sessions.get_session(session_id)
+            if data is None or len(data["messages"]) != 2:
+                errors.append(f"session {session_id}: {0 if data is None else len(data['messages'])} of 2 messages")
+
+    expected = args.workers * args.iterations
+    shared = sessions.get_session(SHARED_SESSION)
+    if shared is None or len(shared["messages"]) != expected:
+        errors.append(f"shared session: {0 if shared is None else len(shared['messages'])} of {expected} messages")
+    logged = sum(1 for _ in collector.iter_interactions())
+    if logged != expected:
+        errors.append(f"analytics log: {logged} of {expected} interactions")
+    rolled = sum(row["count"] for row in collector.get_rollups("day", model="stress"))
+    if rolled != expected:
+        errors.append(f"rollups: {rolled} of {expected} interactions")
+
+    ops = expected * 5  # create + 3 messages + log per iteration
+    print(f"{args.workers} workers x {args.iterations} iterations: {ops} writes in {elapsed:.1f}s ({ops / elapsed:.0f}/s)")
+    print(f"Segments: {len(collector.log.segments())}")
+    if args.keep:
+        print(f"Data kept in {data_dir}")
+    else:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if errors:
+        print(f"FAILED: {len(errors)} problem(s)")
+        for error in errors[:20]:
+            print("  " + error)
+        sys.exit(1)
+    print("OK: nothing lost")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Incrementally maintained analytics rollups for ArchieAI.
+DataCollector updates these as it logs, so dashboard questions like
+"requests per hour" or "p95 generation time per day" cost O(buckets)
+instead of a rescan of every raw interaction.
+"""
+import math
+import time
+import atexit
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List
+from lib.FileStore import file_lock, atomic_write_json
+from lib import FastJson
+
+
+# Bucket key formats per granularity (lexicographic order == time order)
+GRANULARITIES = {
+    "minute": "%Y-%m-%dT%H:%M",
+    "hour": "%Y-%m-%dT%H",
+    "day": "%Y-%m-%d",
+}
+
+# Key used for "all models" in every bucket
+ALL_MODELS = "*"
+
+
+class LatencySketch:
+    """
+    Mergeable latency histogram with logarithmic buckets (DDSketch-style).
+    Quantiles are accurate to about `relative_accuracy` and two sketches
+    combine by adding bucket counts, so minute buckets roll up losslessly.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.02, buckets: Optional[Dict[int, int]] = None):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = buckets or {}
+
+    def add(self, value: float, count: int = 1):
+        # Anything under a millisecond lands in one bucket; it doesn't matter for dashboards
+        index = math.ceil(math.log(max(value, 0.001)) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other: "LatencySketch"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = sum(self.buckets.values())
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Midpoint of the bucket in log space
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return None
+
+    def to_json(self) -> Dict[str, int]:
+        return {str(k): v for k, v in self.buckets.items()}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, int]) -> "LatencySketch":
+        return cls(buckets={int(k): v for k, v in (data or {}).items()})
+
+
+def _empty_stats() -> Dict:
+    return {"count": 0, "cancelled": 0, "gen_sum": 0.0, "gen_max": 0.0, "q_len_sum": 0, "a_len_sum": 0, "sketch": {}}
+
+
+def _merge_stats(into: Dict, other: Dict):
+    """Add `other` bucket stats into `into` (both in their JSON form)."""
+    into["count"] += other["count"]
+    into["cancelled"] += other["cancelled"]
+    into["gen_sum"] += other["gen_sum"]
+    into["gen_max"] = max(into["gen_max"], other["gen_max"])
+    into["q_len_sum"] += other["q_len_sum"]
+    into["a_len_sum"] += other["a_len_sum"]
+    for index, count in other["sketch"].items():
+        into["sketch"][index] = into["sketch"].get(index, 0) + count
+
+
+class RollupStore:
+    """
+    Per-minute/hour/day and per-model counters, sums and latency sketches.
+
+    Updates accumulate in memory as a delta and are merged into the JSON file
+    every `flush_interval` seconds (and at exit). Because everything is
+    mergeable, the same file can be fed by several processes.
+
+    Usage:
+      rollups = RollupStore("data/analytics_rollups.json")
+      rollups.record(datetime.now(), "qwen3", generation_time=2.4, question_length=30, answer_length=400)
+      rollups.query("hour", start="2025-10-19", model="*")
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 10.0,
+        retention: Optional[Dict[str, timedelta]] = None,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        # Fine-grained buckets are only kept for a while; days are kept forever
+        self.retention = retention or {"minute": timedelta(hours=48), "hour": timedelta(days=90)}
+        self._pending: Dict[str, Dict[str, Dict[str, Dict]]] = {g: {} for g in GRANULARITIES}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def record(
+        self,
+        timestamp: datetime,
+        model: Optional[str],
+        generation_time: float,
+        question_length: int,
+        answer_length: int,
+        cancelled: bool = False,
+    ):
+        """Fold one interaction into every granularity, for its model and for all models."""
+        sketch = LatencySketch()
+        sketch.add(generation_time)
+        sample = {
+            "count": 1,
+            "cancelled": int(cancelled),
+            "gen_sum": generation_time,
+            "gen_max": generation_time,
+            "q_len_sum": question_length,
+            "a_len_sum": answer_length,
+            "sketch": sketch.to_json(),
+        }
+        with self._lock:
+            for granularity, fmt in GRANULARITIES.items():
+                bucket = self._pending[granularity].setdefault(timestamp.strftime(fmt), {})
+                for key in {ALL_MODELS, model or "unknown"}:
+                    _merge_stats(bucket.setdefault(key, _empty_stats()), sample)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def _load(self) -> Dict:
+        try:
+            data = FastJson.load_file(self.path)
+        except (FileNotFoundError, FastJson.JSONDecodeError):
+            data = {}
+        for granularity in GRANULARITIES:
+            data.setdefault(granularity, {})
+        return data
+
+    def _prune(self, data: Dict):
+        """Drop buckets older than their granularity's retention."""
+        now = datetime.now()
+        for granularity, keep in self.retention.items():
+            cutoff = (now - keep).strftime(GRANULARITIES[granularity])
+            for key in [k for k in data[granularity] if k < cutoff]:
+                del data[granularity][key]
+
+    @staticmethod
+    def _merge_tree(into: Dict, delta: Dict):
+        for granularity, buckets in delta.items():
+            target = into.setdefault(granularity, {})
+            for key, models in buckets.items():
+                bucket = target.setdefault(key, {})
+                for model, stats in models.items():
+                    _merge_stats(bucket.setdefault(model, _empty_stats()), stats)
+
+    def flush(self):
+        """Merge pending updates into the rollup file."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {g: {} for g in GRANULARITIES}
+            self._last_flush = time.monotonic()
+        if not any(pending.values()):
+            return
+
+        # Every worker merges its own delta into the same file, one at a time
+        with file_lock(self.path + ".lock"):
+            data = self._load()
+            self._merge_tree(data, pending)
+            self._prune(data)
+            # Compact on purpose; this file is read by code, not people
+            atomic_write_json(self.path, data)
+
+    def query(
+        self,
+        granularity: str = "hour",
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        model: str = ALL_MODELS,
+        percentiles=(50, 95, 99),
+    ) -> List[Dict]:
+        """
+        Summaries for each bucket in [start, end] (ISO prefixes, inclusive),
+        including updates that haven't been flushed yet.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {list(GRANULARITIES)}")
+
+        data = self._load()
+        with self._lock:
+            pending = {granularity: FastJson.loads(FastJson.dumpb(self._pending[granularity]))}
+        self._merge_tree(data, pending)
+
+        rows = []
+        for key in sorted(data[granularity]):
+            if start and key < start[:len(key)]:
+                continue
+            if end and key[:len(end)] > end:
+                continue
+            stats = data[granularity][key].get(model)
+            if not stats or not stats["count"]:
+                continue
+            sketch = LatencySketch.from_json(stats["sketch"])
+            row = {
+                "bucket": key,
+                "count": stats["count"],
+                "cancelled": stats["cancelled"],
+                "avg_generation_time": round(stats["gen_sum"] / stats["count"], 3),
+                "max_generation_time": round(stats["gen_max"], 3),
+                "avg_question_length": round(stats["q_len_sum"] / stats["count"], 1),
+                "avg_answer_length": round(stats["a_len_sum"] / stats["count"], 1),
+            }
+            for p in percentiles:
+                row[f"p{p}_generation_time"] = round(sketch.quantile(p / 100), 3)
+            rows.append(row)
+        return rows
+
+    def models(self) -> List[str]:
+        """Every model that appears in the day rollups."""
+        names = set()
+        for models in self._load()["day"].values():
+            names.update(models)
+        names.discard(ALL_MODELS)
+        return sorted(names)
@@ -0,0 +1,361 @@
+"""
+Columnar analytics store for ArchieAI.
+Compacts logged interactions into typed, per-day column files and answers
+the usual data-science questions (latency percentiles, volume by hour, top
+questions, device breakdown) with vectorized NumPy operations that only read
+the columns and days they need.
+
+Layout:
+    data/analytics_columnar/
+        _manifest.json
+        day=2025-10-19/
+            generation_time_seconds.npy
+            question.codes.npy + question.values.json   (dictionary-encoded strings)
+            ...                                         (or part.parquet with pyarrow)
+
+Dependencies:
+    pip install numpy          (required)
+    pip install pyarrow        (optional, stores partitions as Parquet)
+"""
+import os
+import re
+import shutil
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, List, Iterable, Tuple, Union
+
+import numpy as np
+
+from lib.FileStore import atomic_write_json
+from lib import FastJson
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet is optional; plain .npy columns work everywhere
+    pa = None
+    pq = None
+
+
+# Numeric columns and their on-disk dtypes
+NUMERIC_COLUMNS = {
+    "timestamp": "datetime64[us]",
+    "hour": "int8",
+    "question_length": "int32",
+    "answer_length": "int32",
+    "generation_time_seconds": "float32",
+    "cancelled": "bool",
+}
+
+# String columns, stored dictionary-encoded (int32 codes + distinct values)
+STRING_COLUMNS = [
+    "session_id",
+    "user_email",
+    "ip_address",
+    "device_info",
+    "device_type",
+    "question",
+    "answer",
+    "model",
+]
+
+DEVICE_PATTERNS = [
+    ("bot", re.compile(r"bot|crawl|spider|curl|python-requests|wget", re.IGNORECASE)),
+    ("tablet", re.compile(r"ipad|tablet", re.IGNORECASE)),
+    ("mobile", re.compile(r"mobi|iphone|android", re.IGNORECASE)),
+]
+
+
+def device_type(user_agent: Optional[str]) -> str:
+    """Coarse device bucket from a user agent string."""
+    if not user_agent:
+        return "unknown"
+    for name, pattern in DEVICE_PATTERNS:
+        if pattern.search(user_agent):
+            return name
+    return "desktop"
+
+
+def to_columns(rows: List[Dict]) -> Dict[str, Union[np.ndarray, Tuple[np.ndarray, List[str]]]]:
+    """Convert a day's interaction dicts into typed arrays."""
+    columns = {}
+    timestamps = np.array([r.get("timestamp") for r in rows], dtype="datetime64[us]")
+    columns["timestamp"] = timestamps
+    columns["hour"] = ((timestamps - timestamps.astype("datetime64[D]")) // np.timedelta64(1, "h")).astype("int8")
+    columns["question_length"] = np.array([r.get("question_length", 0) for r in rows], dtype="int32")
+    columns["answer_length"] = np.array([r.get("answer_length", 0) for r in rows], dtype="int32")
+    columns["generation_time_seconds"] = np.array(
+        [r.get("generation_time_seconds") or 0.0 for r in rows], dtype="float32"
+    )
+    columns["cancelled"] = np.array([bool(r.get("cancelled", False)) for r in rows], dtype="bool")
+
+    for name in STRING_COLUMNS:
+        if name == "device_type":
+            raw = [device_type(r.get("device_info")) for r in rows]
+        else:
+            raw = ["" if r.get(name) is None else str(r.get(name)) for r in rows]
+        values, codes = np.unique(np.array(raw, dtype=object), return_inverse=True)
+        columns[name] = (codes.astype("int32"), [str(v) for v in values])
+    return columns
+
+
+def _complete(day: str, info: Dict) -> bool:
+    """True if the partition was written after its day was over, so nothing more will land in it."""
+    return (info.get("compacted_at") or "")[:10] > day
+
+
+class AnalyticsStore:
+    """Reads and writes the per-day columnar partitions."""
+
+    def __init__(self, store_dir: str = "data/analytics_columnar", use_parquet: Optional[bool] = None):
+        self.store_dir = store_dir
+        self.manifest_file = os.path.join(store_dir, "_manifest.json")
+        # Parquet when pyarrow is installed, unless told otherwise
+        self.use_parquet = (pq is not None) if use_parquet is None else (use_parquet and pq is not None)
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    # ---- manifest -------------------------------------------------------
+
+    def _load_manifest(self) -> Dict:
+        try:
+            return FastJson.load_file(self.manifest_file)
+        except (FileNotFoundError, FastJson.JSONDecodeError):
+            return {"days": {}}
+
+    def _save_manifest(self, manifest: Dict):
+        atomic_write_json(self.manifest_file, manifest)
+
+    def days(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """Compacted days (YYYY-MM-DD) within [start, end], inclusive."""
+        days = sorted(self._load_manifest()["days"])
+        return [d for d in days if (start is None or d >= start[:10]) and (end is None or d <= end[:10])]
+
+    def _partition_dir(self, day: str) -> str:
+        return os.path.join(self.store_dir, f"day={day}")
+
+    # ---- writing --------------------------------------------------------
+
+    def write_partition(self, day: str, rows: List[Dict]):
+        """Replace one day's partition with `rows`."""
+        columns = to_columns(rows)
+        final_dir = self._partition_dir(day)
+        tmp_dir = final_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        if self.use_parquet:
+            arrays = {}
+            for name, col in columns.items():
+                if isinstance(col, tuple):
+                    codes, values = col
+                    arrays[name] = pa.DictionaryArray.from_arrays(pa.array(codes), pa.array(values, type=pa.string()))
+                else:
+                    arrays[name] = pa.array(col)
+            pq.write_table(pa.table(arrays), os.path.join(tmp_dir, "part.parquet"), compression="zstd")
+            fmt = "parquet"
+        else:
+            for name, col in columns.items():
+                if isinstance(col, tuple):
+                    codes, values = col
+                    np.save(os.path.join(tmp_dir, f"{name}.codes.npy"), codes)
+                    with open(os.path.join(tmp_dir, f"{name}.values.json"), "wb") as f:
+                        f.write(FastJson.dumpb(values))
+                else:
+                    np.save(os.path.join(tmp_dir, f"{name}.npy"), col)
+            fmt = "npy"
+
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(tmp_dir, final_dir)
+
+        manifest = self._load_manifest()
+        manifest["days"][day] = {
+            "rows": len(rows),
+            "format": fmt,
+            "last_timestamp": rows[-1].get("timestamp") if rows else None,
+            "compacted_at": datetime.now().isoformat(),
+        }
+        self._save_manifest(manifest)
+
+    def resume_from(self) -> Optional[str]:
+        """
+        Day the raw log needs to be read from for the next compact(): the oldest
+        day that wasn't finished when it was last compacted, else the day after
+        the newest one. None (read everything) if nothing is compacted yet.
+        """
+        days = self._load_manifest()["days"]
+        if not days:
+            return None
+        pending = [day for day, info in days.items() if not _complete(day, info)]
+        if pending:
+            return min(pending)
+        return (date.fromisoformat(max(days)) + timedelta(days=1)).isoformat()
+
+    def compact(self, interactions: Iterable[Dict], force: bool = False) -> Dict[str, int]:
+        """
+        Write interactions into day partitions, each day written once.
+        Days compacted after they ended are skipped unless `force`; a day that
+        was still running when it was compacted (like today) is rewritten.
+        Pass the log from resume_from() onwards to avoid rescanning old days.
+
+        The log is time-ordered, so only the current day's rows are held: a day
+        is written as soon as the stream moves past it. The odd late row for an
+        earlier day is kept aside and merged into that day at the end.
+        Returns {day: rows written}.
+        """
+        done = self._load_manifest()["days"]
+        written: Dict[str, int] = {}
+        late: Dict[str, List[Dict]] = {}
+        current, rows = None, []
+        for row in interactions:
+            day = (row.get("timestamp") or "")[:10]
+            if not day:
+                continue
+            if not force and day in done and _complete(day, done[day]):
+                continue
+            if day == current:
+                rows.append(row)
+            elif current is None or day > current:
+                if current is not None:
+                    written[current] = self._write_day(current, rows)
+                current, rows = day, [row]
+            else:
+                # Several workers, late appends: behind the stream
+                late.setdefault(day, []).append(row)
+        if current is not None:
+            written[current] = self._write_day(current, rows)
+
+        for day in sorted(late):
+            rows = late.pop(day)
+            if day in written:
+                rows = self._read_rows(day) + rows
+            written[day] = self._write_day(day, rows)
+        return written
+
+    def _write_day(self, day: str, rows: List[Dict]) -> int:
+        rows.sort(key=lambda r: r.get("timestamp") or "")
+        self.write_partition(day, rows)
+        return len(rows)
+
+    def _read_rows(self, day: str) -> List[Dict]:
+        """One day's partition back as interaction dicts (the stored columns only), for merging."""
+        names = [name for name in NUMERIC_COLUMNS if name != "hour"] + [name for name in STRING_COLUMNS if name != "device_type"]
+        part = self.read_partition(day, names)
+        columns = {}
+        for name, col in part.items():
+            if isinstance(col, tuple):
+                codes, values = col
+                columns[name] = [values[code] for code in codes.tolist()]
+            elif name == "timestamp":
+                columns[name] = np.datetime_as_string(col, unit="us").tolist()
+            else:
+                columns[name] = col.tolist()
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    # ---- reading --------------------------------------------------------
+
+    def read_partition(self, day: str, columns: List[str]) -> Dict[str, Union[np.ndarray, Tuple[np.ndarray, List[str]]]]:
+        """
+        Read only `columns` of one day. Numeric columns come back as arrays;
+        string columns as (codes, values) so callers can stay vectorized.
+        """
+        info = self._load_manifest()["days"].get(day, {})
+        part_dir = self._partition_dir(day)
+        result = {}
+
+        if info.get("format") == "parquet":
+            table = pq.read_table(os.path.join(part_dir, "part.parquet"), columns=columns)
+            for name in columns:
+                col = table.column(name).combine_chunks()
+                if name in STRING_COLUMNS:
+                    if not pa.types.is_dictionary(col.type):
+                        col = col.dictionary_encode()
+                    result[name] = (col.indices.to_numpy(zero_copy_only=False).astype("int32"), col.dictionary.to_pylist())
+                else:
+                    result[name] = col.to_numpy(zero_copy_only=False).astype(NUMERIC_COLUMNS[name])
+            return result
+
+        rows = info.get("rows", 0)
+        for name in columns:
+            if name in STRING_COLUMNS and not os.path.exists(os.path.join(part_dir, f"{name}.codes.npy")):
+                # Column added after this day was compacted
+                result[name] = (np.zeros(rows, dtype="int32"), [""])
+            elif name in STRING_COLUMNS:
+                codes = np.load(os.path.join(part_dir, f"{name}.codes.npy"), mmap_mode="r")
+                result[name] = (codes, FastJson.load_file(os.path.join(part_dir, f"{name}.values.json")))
+            else:
+                result[name] = np.load(os.path.join(part_dir, f"{name}.npy"), mmap_mode="r")
+        return result
+
+    def column(self, name: str, start: Optional[str] = None, end: Optional[str] = None) -> np.ndarray:
+        """A numeric column concatenated across the selected days."""
+        parts = [self.read_partition(day, [name])[name] for day in self.days(start, end)]
+        if not parts:
+            return np.array([], dtype=NUMERIC_COLUMNS[name])
+        return np.concatenate(parts)
+
+
+class AnalyticsQuery:
+    """
+    Vectorized analytics over an AnalyticsStore.
+
+    Usage:
+      q = AnalyticsQuery(AnalyticsStore("data/analytics_columnar"))
+      q.latency_percentiles(start="2025-10-01")
+      q.volume_by_hour()
+      q.top_questions(10)
+      q.device_breakdown()
+    """
+
+    def __init__(self, store: AnalyticsStore):
+        self.store = store
+
+    def latency_percentiles(self, percentiles=(50, 90, 95, 99), start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, float]:
+        """Generation time percentiles in seconds."""
+        times = self.store.column("generation_time_seconds", start, end)
+        if times.size == 0:
+            return {}
+        values = np.percentile(times, percentiles)
+        return {f"p{p}": round(float(v), 3) for p, v in zip(percentiles, values)}
+
+    def volume_by_hour(self, start: Optional[str] = None, end: Optional[str] = None) -> List[int]:
+        """Interaction counts for each hour of the day (index 0-23)."""
+        counts = np.zeros(24, dtype="int64")
+        for day in self.store.days(start, end):
+            hours = self.store.read_partition(day, ["hour"])["hour"]
+            counts += np.bincount(hours, minlength=24)
+        return counts.tolist()
+
+    def volume_by_day(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, int]:
+        """Interaction counts per day, straight from the manifest."""
+        manifest = self.store._load_manifest()["days"]
+        return {day: manifest[day]["rows"] for day in self.store.days(start, end)}
+
+    def top_questions(self, n: int = 10, start: Optional[str] = None, end: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Most frequently asked questions (case/whitespace-insensitive)."""
+        totals: Dict[str, int] = {}
+        for day in self.store.days(start, end):
+            codes, values = self.store.read_partition(day, ["question"])["question"]
+            counts = np.bincount(codes, minlength=len(values))
+            for idx in np.flatnonzero(counts):
+                key = " ".join(values[idx].lower().split())
+                if key:
+                    totals[key] = totals.get(key, 0) + int(counts[idx])
+        return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+    def device_breakdown(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Interaction count and median generation time per device type."""
+        per_device: Dict[str, List[np.ndarray]] = {}
+        for day in self.store.days(start, end):
+            part = self.store.read_partition(day, ["device_type", "generation_time_seconds"])
+            codes, values = part["device_type"]
+            times = part["generation_time_seconds"]
+            order = np.argsort(codes, kind="stable")
+            boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+            for group in np.split(order, boundaries):
+                if group.size:
+                    per_device.setdefault(values[codes[group[0]]], []).append(times[group])
+
+        result = {}
+        for name, chunks in per_device.items():
+            times = np.concatenate(chunks)
+            result[name] = {"count": int(times.size), "median_generation_time": round(float(np.median(times)), 3)}
+        return result
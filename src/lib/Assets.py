@@ -0,0 +1,94 @@
+"""
+Static asset helpers for ArchieAI.
+Templates ask for assets by their source path (asset_url('styles/style.css'))
+and get the fingerprinted, minified build from static/dist/ when
+helpers/build_assets.py has been run, or the plain file otherwise.
+"""
+import os
+import gzip
+import mimetypes
+from typing import Dict, Optional
+
+from lib.FileStore import file_signature
+from lib import FastJson
+
+
+# Built files never change under the same name, so browsers can keep them forever
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+
+class AssetManifest:
+    """
+    Maps source paths to fingerprinted build outputs, using
+    static/dist/manifest.json (re-read when a new build replaces it).
+    """
+
+    def __init__(self, static_dir: str, static_url: str = "/static"):
+        self.static_dir = static_dir
+        self.static_url = static_url.rstrip("/")
+        self.dist_dir = os.path.join(static_dir, "dist")
+        self.manifest_file = os.path.join(self.dist_dir, "manifest.json")
+        self._manifest: Dict[str, Dict] = {}
+        self._signature = None
+
+    def _load(self) -> Dict[str, Dict]:
+        signature = file_signature(self.manifest_file)
+        if signature != self._signature:
+            try:
+                self._manifest = FastJson.load_file(self.manifest_file)["assets"]
+            except (FileNotFoundError, FastJson.JSONDecodeError, KeyError):
+                self._manifest = {}
+            self._signature = signature
+        return self._manifest
+
+    def url(self, path: str) -> str:
+        """URL for a source asset path like 'js/index.js'."""
+        entry = self._load().get(path)
+        if entry:
+            return f"{self.static_url}/dist/{entry['file']}"
+        # Not built: plain file, with its mtime as a cache buster
+        try:
+            version = int(os.path.getmtime(os.path.join(self.static_dir, path)))
+        except OSError:
+            return f"{self.static_url}/{path}"
+        return f"{self.static_url}/{path}?v={version}"
+
+    def resolve(self, filename: str, accept_encoding: str) -> Optional[Dict[str, str]]:
+        """
+        Pick the best precompressed variant of a dist file for the client.
+        Returns {"path", "encoding", "mimetype"} or None if the file doesn't exist.
+        """
+        dist = os.path.abspath(self.dist_dir)
+        path = os.path.abspath(os.path.join(dist, filename))
+        if not path.startswith(dist + os.sep):
+            return None
+        if not os.path.isfile(path):
+            return None
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        accepted = {part.split(";")[0].strip() for part in (accept_encoding or "").lower().split(",")}
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding in accepted and os.path.isfile(path + suffix):
+                return {"path": path + suffix, "encoding": encoding, "mimetype": mimetype}
+        return {"path": path, "encoding": None, "mimetype": mimetype}
+
+
+def gzip_json_response(response, accept_encoding: str, min_bytes: int = 1024, level: int = 6):
+    """
+    Gzip a Flask JSON response in place when it's big enough and the client
+    accepts gzip. Streams (SSE, exports) and already-encoded bodies are left alone.
+    """
+    if response.direct_passthrough or response.is_streamed:
+        return response
+    if response.mimetype != "application/json" or response.headers.get("Content-Encoding"):
+        return response
+    if response.status_code < 200 or response.status_code >= 300:
+        return response
+    response.vary.add("Accept-Encoding")
+    if "gzip" not in (accept_encoding or "").lower():
+        return response
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=level))
+    response.headers["Content-Encoding"] = "gzip"
+    return response
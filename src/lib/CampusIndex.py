@@ -0,0 +1,729 @@
+"""
+Structured campus index for ArchieAI.
+The scraper parses the academic calendar, dining hours and events pages into
+records (date ranges, opening hours, events with times) and saves them to
+data/campus_index.json. CampusIndex reads them out of the shared context
+snapshot (split by kind and by day, see index_sections) so factual
+lookups like "when is fall break", "is the dining hall open now" or "what's
+on Friday" are answered straight from the index in well under a
+millisecond. Less certain matches hand the model a handful of exact records
+instead of whole pages.
+
+Parsing works on the text lines of a page (table cells and list items end up
+on their own lines), so it doesn't depend on the sites' exact markup.
+"""
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from lib import FastJson
+from lib.FileStore import file_signature
+
+INDEX_VERSION = 1
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+WEEKDAYS = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+_MONTH = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+_WEEKDAY = r"(?:(?:mon|tues?|wed(?:nes)?|thu(?:rs?)?|fri|sat(?:ur)?|sun)(?:day)?\.?,?\s+)"
+_DAY = r"\d{1,2}(?!\d)(?:st|nd|rd|th)?"
+_NOT_A_TIME = r"(?!\s*(?::\d|[ap]\.?\s*m\b))"
+
+# "Monday, October 13 – Tuesday, October 14, 2025", "Oct. 13-14", "November 26 through 30, 2025"
+DATE_RANGE = re.compile(
+    rf"\b{_WEEKDAY}?(?P<m1>{_MONTH})\s+(?P<d1>{_DAY}){_NOT_A_TIME}(?:,?\s+(?P<y1>20\d\d))?"
+    rf"(?:\s*(?:-|–|—|through|thru|to)\s*{_WEEKDAY}?(?:(?P<m2>{_MONTH})\s+)?(?P<d2>{_DAY}){_NOT_A_TIME})?"
+    rf"(?:,?\s+(?P<y2>20\d\d))?",
+    re.IGNORECASE,
+)
+NUMERIC_DATE = re.compile(r"\b(?P<m>1[0-2]|0?[1-9])/(?P<d>3[01]|[12]\d|0?[1-9])(?:/(?P<y>(?:20)?\d\d))?\b")
+
+_T1 = r"(?:(?P<h1>\d{1,2})(?::(?P<n1>\d{2}))?\s*(?:(?P<a1>[ap])\.?\s*m\b\.?)?|(?P<w1>noon|midnight))"
+_T2 = r"(?:(?P<h2>\d{1,2})(?::(?P<n2>\d{2}))?\s*(?P<a2>[ap])\.?\s*m\b\.?|(?P<w2>noon|midnight))"
+TIME_RANGE = re.compile(rf"(?<![\d:]){_T1}\s*(?:-|–|—|to|until|till)\s*{_T2}", re.IGNORECASE)
+TIME = re.compile(r"(?<![\d:])(?:(?P<h>\d{1,2})(?::(?P<n>\d{2}))?\s*(?P<a>[ap])\.?\s*m\b\.?|(?P<w>noon|midnight))", re.IGNORECASE)
+
+DAY_WORD = re.compile(r"\b(mon(?:day)?|tue(?:s|sday)?|wed(?:nesday)?|thu(?:r|rs|rsday)?|fri(?:day)?|sat(?:urday)?|sun(?:day)?)\b\.?", re.IGNORECASE)
+DAY_SPAN_SEPARATOR = re.compile(r"\s*(?:-|–|—|to|through|thru)\s*", re.IGNORECASE)
+MEAL = re.compile(r"\b(breakfast|brunch|lunch|dinner|late night)\b", re.IGNORECASE)
+ACADEMIC_YEAR = re.compile(r"\b(20\d\d)\s*[-–/]\s*(?:20)?(\d\d)\b")
+TERM = re.compile(r"\b(fall|spring|summer|winter)\s+(?:semester\s+|term\s+|session\s+)?(20\d\d)\b", re.IGNORECASE)
+JUNK_TITLE = re.compile(r"^(read more|view (event|details|all)|more info|learn more|register|details|all day|add to calendar)$", re.IGNORECASE)
+
+
+# ---- small parsers --------------------------------------------------------
+
+def _month(text: str) -> int:
+    return MONTHS[text[:3].lower()]
+
+
+def _weekday(text: str) -> int:
+    return WEEKDAYS[text[:3].lower()]
+
+
+def parse_dates(text: str, year_for: Callable[[int], int]) -> List[Tuple[date, date, Tuple[int, int]]]:
+    """(start, end, span) for every date or date range in `text`. year_for(month) fills in missing years."""
+    found = []
+    for m in DATE_RANGE.finditer(text):
+        m1 = _month(m.group("m1"))
+        m2 = _month(m.group("m2")) if m.group("m2") else m1
+        y2 = int(m.group("y2")) if m.group("y2") else None
+        y1 = int(m.group("y1")) if m.group("y1") else (y2 if y2 and m2 >= m1 else year_for(m1))
+        y2 = y2 or (y1 if m2 >= m1 else y1 + 1)
+        try:
+            start = date(y1, m1, int(re.match(r"\d+", m.group("d1")).group()))
+            end = date(y2, m2, int(re.match(r"\d+", m.group("d2")).group())) if m.group("d2") else start
+        except ValueError:
+            continue
+        if end < start:
+            end = start
+        found.append((start, end, m.span()))
+    return found
+
+
+def _to_minutes(hour: str, minute: Optional[str], ampm: Optional[str], word: Optional[str], closing: bool = False) -> int:
+    if word:
+        return 12 * 60 if word.lower() == "noon" else (24 * 60 if closing else 0)
+    h = int(hour) % 12
+    if ampm and ampm.lower() == "p":
+        h += 12
+    return h * 60 + int(minute or 0)
+
+
+def parse_time_ranges(text: str) -> List[Tuple[int, int, Tuple[int, int]]]:
+    """(open, close, span) in minutes after midnight; '7:30 - 9 p.m.' borrows the second half's p.m."""
+    found = []
+    for m in TIME_RANGE.finditer(text):
+        close = _to_minutes(m.group("h2"), m.group("n2"), m.group("a2"), m.group("w2"), closing=True)
+        if m.group("w1") or m.group("a1"):
+            start = _to_minutes(m.group("h1"), m.group("n1"), m.group("a1"), m.group("w1"))
+        else:
+            start = _to_minutes(m.group("h1"), m.group("n1"), m.group("a2"), None)
+            if start > close:
+                start = _to_minutes(m.group("h1"), m.group("n1"), "a", None)
+        found.append((start, close, m.span()))
+    return found
+
+
+def parse_times(text: str) -> List[Tuple[int, Tuple[int, int]]]:
+    return [(_to_minutes(m.group("h"), m.group("n"), m.group("a"), m.group("w")), m.span()) for m in TIME.finditer(text)]
+
+
+def parse_days(text: str) -> Optional[List[int]]:
+    """Weekdays (0 = Monday) named in `text`: 'Mon - Fri', 'Saturday & Sunday', 'Weekends', 'Daily'. None if none."""
+    low = text.lower()
+    if re.search(r"\b(daily|every ?day|7 days|seven days)\b", low):
+        return list(range(7))
+    days = set()
+    if re.search(r"\bweekdays\b", low):
+        days.update(range(5))
+    if re.search(r"\bweekends?\b", low):
+        days.update((5, 6))
+    words = list(DAY_WORD.finditer(text))
+    for i, m in enumerate(words):
+        day = _weekday(m.group(1))
+        if i and DAY_SPAN_SEPARATOR.fullmatch(text[words[i - 1].end():m.start()]):
+            prev = _weekday(words[i - 1].group(1))
+            while prev != day:
+                prev = (prev + 1) % 7
+                days.add(prev)
+        days.add(day)
+    return sorted(days) if days else None
+
+
+def _strip_spans(text: str, spans: List[Tuple[int, int]]) -> str:
+    for start, end in sorted(spans, reverse=True):
+        text = text[:start] + " " + text[end:]
+    text = DAY_WORD.sub(" ", text) if len(text) < 40 else text
+    return re.sub(r"\s+", " ", text).strip(" \t|:;,-–—•·()[]")
+
+
+def _meaningful(text: str) -> bool:
+    return len(re.findall(r"[A-Za-z]", text)) >= 3 and not JUNK_TITLE.match(text)
+
+
+def _heading(line: str) -> bool:
+    return 2 <= len(line) <= 60 and not re.search(r"\d", line) and len(line.split()) <= 8 and not line.endswith(".")
+
+
+def _hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _minutes(hhmm: str) -> int:
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+# ---- page parsers ---------------------------------------------------------
+
+def parse_calendar(lines: List[str], today: date) -> List[Dict]:
+    """Academic calendar lines -> [{"title", "start", "end", "term"}]."""
+    start_year = None
+    for line in lines:
+        m = ACADEMIC_YEAR.search(line)
+        if m and int(m.group(2)) == (int(m.group(1)) + 1) % 100:
+            start_year = int(m.group(1))
+            break
+    if start_year is None:
+        start_year = today.year if today.month >= 7 else today.year - 1
+
+    def year_for(month: int) -> int:
+        return start_year if month >= 7 else start_year + 1
+
+    # Classify every line first: a date-only row takes its title from a neighbour
+    rows = []
+    for line in lines:
+        if len(line) > 200:
+            rows.append(("prose", line, None))  # prose, not a calendar row
+            continue
+        term_match = TERM.search(line)
+        dates = parse_dates(line, year_for)
+        if term_match and not dates:
+            rows.append(("term", f"{term_match.group(1).title()} {term_match.group(2)}", None))
+        elif dates:
+            title = _strip_spans(line, [span for _, _, span in dates])
+            rows.append(("dated", title, dates) if _meaningful(title) else ("dates", None, dates))
+        elif _meaningful(line):
+            rows.append(("title", line, None))
+    records, term, used = [], None, set()
+
+    def add(title: str, dates):
+        for start, end, _ in dates:
+            records.append({"title": title, "start": start.isoformat(), "end": end.isoformat(), "term": term})
+
+    for i, (kind, text, dates) in enumerate(rows):
+        if kind == "term":
+            term = text
+        elif kind == "dated":
+            add(text, dates)
+        elif kind == "dates":
+            # "Fall Break" above its dates, or a table row whose title is the next cell
+            before = i > 0 and rows[i - 1][0] == "title" and i - 1 not in used and _heading(rows[i - 1][1])
+            after = i + 1 < len(rows) and rows[i + 1][0] == "title"
+            if after and not (before and _titles_precede(rows, i)):
+                add(rows[i + 1][1], dates)
+                used.add(i + 1)
+            elif before:
+                add(rows[i - 1][1], dates)
+                used.add(i - 1)
+    return _dedupe(records)
+
+
+def _titles_precede(rows: List[Tuple], i: int) -> bool:
+    """
+    Whether the dates/title rows alternating from rows[i] are title-first: a
+    run that ends on dates had its titles above them ("Fall Break", "Oct 13-14",
+    ...); one that ends on a title had them below.
+    """
+    last = None
+    for kind, _, _ in rows[i:]:
+        if kind != ("dates" if last in (None, "title") else "title"):
+            break
+        last = kind
+    return last == "dates"
+
+
+def parse_dining(lines: List[str]) -> List[Dict]:
+    """Dining hours lines -> [{"place", "meal", "days", "open", "close", "closed"}] (times as HH:MM)."""
+    # A days line ("Saturday & Sunday") covers the hours under it until the next days line or place
+    records, place, meal, section_days = [], None, None, None
+    for line in lines:
+        ranges = parse_time_ranges(line)
+        closed = re.search(r"\bclosed\b", line, re.IGNORECASE)
+        days = parse_days(line)
+        if ranges or (closed and (days or section_days)):
+            meal_match = MEAL.search(line)
+            line_meal = meal_match.group(1).title() if meal_match else meal
+            applies = days or section_days or list(range(7))
+            for start, close, _ in ranges:
+                records.append({"place": place or "Dining", "meal": line_meal, "days": applies,
+                                "open": _hhmm(start), "close": _hhmm(close), "closed": False})
+            if not ranges:
+                records.append({"place": place or "Dining", "meal": line_meal, "days": applies,
+                                "open": None, "close": None, "closed": True})
+        elif days and len(line) < 40:
+            section_days = days
+        elif _heading(line) and "hours" not in line.lower():
+            if MEAL.search(line) and len(line) < 25:
+                meal = MEAL.search(line).group(1).title()
+            else:
+                place, meal, section_days = line, None, None
+    return _dedupe(records)
+
+
+def parse_events(lines: List[str], today: date) -> List[Dict]:
+    """Events calendar lines -> [{"title", "date", "start", "end"}] (times HH:MM or None)."""
+    def year_for(month: int) -> int:
+        # A month view: the closest year to today
+        if month < today.month - 6:
+            return today.year + 1
+        if month > today.month + 6:
+            return today.year - 1
+        return today.year
+
+    records, current, expecting_title, last = [], None, False, None
+    for line in lines:
+        if len(line) > 200:
+            continue
+        dates = parse_dates(line, year_for)
+        ranges = parse_time_ranges(line)
+        times = [] if ranges else parse_times(line)
+        spans = [span for _, _, span in dates] + [span for _, _, span in ranges] + [span for _, span in times]
+        title = _strip_spans(line, spans)
+        start = ranges[0][0] if ranges else (times[0][0] if times else None)
+        end = ranges[0][1] if ranges else None
+
+        if dates:
+            current = dates[0][0]
+        if current is None:
+            continue
+        if _meaningful(title) and (dates or ranges or times or expecting_title):
+            last = {"title": title, "date": current.isoformat(),
+                    "start": _hhmm(start) if start is not None else None,
+                    "end": _hhmm(end) if end is not None else None}
+            records.append(last)
+            expecting_title = False
+        elif (ranges or times) and last is not None and last["date"] == current.isoformat() and last["start"] is None:
+            last["start"] = _hhmm(start)
+            last["end"] = _hhmm(end) if end is not None else None
+        else:
+            expecting_title = bool(dates or ranges or times)
+    return _dedupe(records)
+
+
+def _dedupe(records: List[Dict]) -> List[Dict]:
+    seen, unique = set(), []
+    for record in records:
+        key = FastJson.dumps(record, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            unique.append(record)
+    return unique
+
+
+def build_index(pages: Dict[str, List[str]], now: Optional[datetime] = None, previous: Optional[Dict] = None) -> Dict:
+    """
+    The campus_index.json document from page lines keyed 'calendar', 'dining'
+    and 'events'. Sections whose page is missing are carried over from `previous`.
+    """
+    now = now or datetime.now()
+    previous = previous if previous and previous.get("version") == INDEX_VERSION else {}
+    if "events" not in pages:
+        events, coverage = previous.get("events", []), previous.get("events_coverage")
+    else:
+        events, coverage = parse_events(pages["events"], now.date()), None
+    if events and "events" in pages:
+        days = sorted(e["date"] for e in events)
+        first, last = date.fromisoformat(days[0]), date.fromisoformat(days[-1])
+        # A month view lists every day of its months, even the empty ones
+        month_end = (last.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        coverage = [first.replace(day=1).isoformat(), month_end.isoformat()]
+    return {
+        "version": INDEX_VERSION,
+        "built_at": now.isoformat(timespec="seconds"),
+        "calendar": parse_calendar(pages["calendar"], now.date()) if "calendar" in pages else previous.get("calendar", []),
+        "dining": parse_dining(pages["dining"]) if "dining" in pages else previous.get("dining", []),
+        "events": events,
+        "events_coverage": coverage,
+    }
+
+
+# ---- matching -------------------------------------------------------------
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "when", "what", "whats", "what's", "does", "do", "did", "of", "for",
+    "to", "on", "in", "at", "and", "or", "i", "we", "my", "our", "there", "it", "be", "will", "this", "that",
+    "arcadia", "university", "campus", "please", "tell", "me", "can", "you", "date", "dates", "day", "days",
+    "s", "by", "from", "with", "how", "which",
+}
+SYNONYMS = {
+    "start": "begin", "starts": "begin", "begins": "begin", "beginning": "begin", "first": "begin",
+    "ends": "end", "ending": "end", "over": "end", "finish": "end",
+    "final": "exam", "finals": "exam", "exams": "exam", "examination": "exam", "examinations": "exam",
+    "graduation": "commencement", "graduate": "commencement",
+    "holiday": "break", "holidays": "break", "recess": "break", "vacation": "break", "off": "break",
+    "classes": "class", "courses": "class",
+}
+# Words every other calendar entry has; they count for little when matching
+GENERIC = {"class", "semester", "term", "session", "academic", "day", "begin", "end"}
+SEASONS = {"fall", "spring", "summer", "winter"}
+
+DINING_WORDS = re.compile(r"\b(dining|cafeteria|caf|café|cafe|food|eat|eating|meals?|breakfast|brunch|lunch|dinner|late night|grab and go)\b", re.IGNORECASE)
+EVENT_WORDS = re.compile(r"\b(events?|happening|going on|what'?s on|what is on|activities|things to do|anything (on|to do))\b", re.IGNORECASE)
+CALENDAR_WORDS = re.compile(
+    r"\b(when|what day|what date|break|recess|holiday|finals?|exams?|commencement|graduation|registration|"
+    r"withdraw\w*|add/drop|drop|semester|term|classes|begins?|starts?|ends?|last day|first day|deadline|reading day)\b",
+    re.IGNORECASE,
+)
+NOW_WORDS = re.compile(r"\b(now|right now|currently|at the moment|still open)\b", re.IGNORECASE)
+# Words that make a dining question about opening hours (and not menus, prices or directions)
+HOURS_WORDS = re.compile(r"\b(open|opens|opening|close|closes|closed|closing|hours|what time|when|until|till)\b", re.IGNORECASE)
+TIME_WORDS = re.compile(r"\b(time|times|late|early|served|serving|start|starts|end|ends)\b", re.IGNORECASE)
+BREAK_WORDS = re.compile(r"\b(break|recess|holiday|closed|no classes|thanksgiving)\b", re.IGNORECASE)
+
+
+def _tokens(text: str) -> List[str]:
+    words = re.findall(r"[a-z][a-z'/]*", text.lower())
+    out = []
+    for word in words:
+        word = SYNONYMS.get(word, word)
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = SYNONYMS.get(word[:-1], word[:-1])
+        out.append(word)
+    return out
+
+
+def _fmt_date(d: date) -> str:
+    return f"{DAY_NAMES[d.weekday()]}, {d.strftime('%B')} {d.day}"
+
+
+def _fmt_time(minutes: int) -> str:
+    minutes %= 24 * 60
+    h, m = divmod(minutes, 60)
+    suffix = "AM" if h < 12 else "PM"
+    h = h % 12 or 12
+    return f"{h}:{m:02d} {suffix}"
+
+
+def _fmt_range(start: date, end: date) -> str:
+    if start == end:
+        return f"{_fmt_date(start)}, {start.year}"
+    return f"{_fmt_date(start)} – {_fmt_date(end)}, {end.year}"
+
+
+@dataclass
+class IndexMatch:
+    """What the index knows about a question and how sure it is (0-1)."""
+    kind: str  # "calendar", "dining" or "events"
+    confidence: float
+    answer: str
+    records: List[Dict] = field(default_factory=list)
+
+    def context(self) -> str:
+        """The matched records as compact JSON for the system prompt."""
+        return FastJson.dumps(self.records[:12])
+
+
+SECTION_PREFIX = "campus/"
+
+
+def index_sections(doc: Dict) -> Dict[str, bytes]:
+    """
+    campus_index.json split into the context snapshot sections CampusIndex
+    reads: "campus/summary", "campus/calendar" (with each title's match
+    tokens), "campus/dining" and one "campus/events/YYYY-MM-DD" per day.
+    A lookup decodes only the sections it needs, so workers keep no copy of
+    the index between questions.
+    """
+    calendar = [dict(record, _tokens=sorted(set(_tokens(record["title"]))),
+                     _term=(record.get("term") or "").split(" ")[0].lower())
+                for record in doc.get("calendar", [])]
+    dining = doc.get("dining", [])
+    events: Dict[str, List[Dict]] = {}
+    for record in doc.get("events", []):
+        events.setdefault(record["date"], []).append(record)
+    sections = {
+        SECTION_PREFIX + "summary": FastJson.dumpb({
+            "calendar": len(calendar),
+            "events": sum(len(v) for v in events.values()),
+            "dining_places": len({record["place"] for record in dining}),
+            "events_coverage": doc.get("events_coverage"),
+        }),
+        SECTION_PREFIX + "calendar": FastJson.dumpb(calendar),
+        SECTION_PREFIX + "dining": FastJson.dumpb(dining),
+    }
+    for day, day_events in sorted(events.items()):
+        day_events.sort(key=lambda e: e["start"] or "99")
+        sections[f"{SECTION_PREFIX}events/{day}"] = FastJson.dumpb(day_events)
+    return sections
+
+
+class _View:
+    """One lookup's records, decoded from the index sections as it needs them and dropped with it."""
+
+    def __init__(self, sections):
+        self._sections = sections
+        self.summary = self._load("summary") or {}
+        coverage = self.summary.get("events_coverage")
+        self.coverage = (date.fromisoformat(coverage[0]), date.fromisoformat(coverage[1])) if coverage else None
+        self._calendar: Optional[List[Dict]] = None
+        self._dining: Optional[Dict[str, List[Dict]]] = None
+
+    def _load(self, name: str):
+        blob = self._sections.get(SECTION_PREFIX + name)
+        return FastJson.loads(blob) if blob is not None else None
+
+    @property
+    def calendar(self) -> List[Dict]:
+        if self._calendar is None:
+            self._calendar = [dict(record, _start=date.fromisoformat(record["start"]), _end=date.fromisoformat(record["end"]),
+                                   _tokens=set(record["_tokens"]))
+                              for record in self._load("calendar") or []]
+        return self._calendar
+
+    @property
+    def dining(self) -> Dict[str, List[Dict]]:
+        if self._dining is None:
+            self._dining = {}
+            for record in self._load("dining") or []:
+                self._dining.setdefault(record["place"], []).append(record)
+        return self._dining
+
+    def events_on(self, day: date) -> List[Dict]:
+        return self._load(f"events/{day.isoformat()}") or []
+
+
+class CampusIndex:
+    """
+    Read side of data/campus_index.json, reloaded when the scraper replaces it.
+    Given a SnapshotReader, the records come from the shared context snapshot's
+    "campus/..." sections instead, read straight out of the mapping on each
+    lookup; nothing is kept per worker.
+
+    Usage:
+      index = CampusIndex("data/campus_index.json")
+      match = index.match("is the dining hall open now?")
+      if match and match.confidence >= 0.8:
+          print(match.answer)
+    """
+
+    def __init__(self, path: str = "data/campus_index.json", snapshots=None):
+        self.path = path
+        self.snapshots = snapshots
+        self._signature = None
+        self._lock = threading.Lock()
+        # Only without a snapshot: campus_index.json split the same way, in this process
+        self._file_sections: Dict[str, bytes] = {}
+
+    def _view(self) -> _View:
+        snap = self.snapshots.current() if self.snapshots is not None else None
+        if snap is not None:
+            return _View(snap)
+        signature = file_signature(self.path)
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    try:
+                        doc = FastJson.load_file(self.path) if signature else {}
+                    except (FileNotFoundError, FastJson.JSONDecodeError):
+                        doc = {}
+                    self._file_sections = index_sections(doc)
+                    self._signature = signature
+        return _View(self._file_sections)
+
+    def stats(self) -> Dict:
+        summary = self._view().summary
+        return {key: summary.get(key, 0) for key in ("calendar", "events", "dining_places")}
+
+    # ---- question parsing -------------------------------------------------
+
+    def _days_asked(self, query: str, today: date) -> List[date]:
+        """Days a question refers to ('today', 'tomorrow', 'Friday', 'this weekend', 'Oct 24', '10/24')."""
+        low = query.lower()
+        days = []
+        if re.search(r"\b(today|tonight|now|right now)\b", low):
+            days.append(today)
+        if re.search(r"\btomorrow\b", low):
+            days.append(today + timedelta(days=1))
+        if re.search(r"\bweekend\b", low):
+            saturday = today + timedelta(days=(5 - today.weekday()) % 7)
+            if today.weekday() == 6:
+                saturday = today - timedelta(days=1)
+            days.extend(d for d in (saturday, saturday + timedelta(days=1)) if d >= today)
+        for m in DAY_WORD.finditer(query):
+            if m.group(1).lower() in ("sun", "sat", "wed"):
+                continue  # words too ("sat in", "the sun")
+            days.append(today + timedelta(days=(_weekday(m.group(1)) - today.weekday()) % 7))
+
+        def year_for(month: int) -> int:
+            return today.year + (1 if month < today.month - 6 else 0)
+
+        for start, end, _ in parse_dates(query, year_for):
+            days.extend(start + timedelta(days=i) for i in range((end - start).days + 1))
+        for m in NUMERIC_DATE.finditer(query):
+            year = int(m.group("y")) if m.group("y") else year_for(int(m.group("m")))
+            try:
+                days.append(date(year if year > 99 else 2000 + year, int(m.group("m")), int(m.group("d"))))
+            except ValueError:
+                pass
+        return sorted(set(days))
+
+    # ---- matchers ---------------------------------------------------------
+
+    def match(self, query: str, now: Optional[datetime] = None) -> Optional[IndexMatch]:
+        """Best answer the index can give for `query`, or None if it isn't a lookup it knows about."""
+        view = self._view()
+        now = now or datetime.now()
+        candidates = []
+        if view.summary.get("dining_places") and DINING_WORDS.search(query):
+            candidates.append(self._match_dining(view, query, now))
+        if view.coverage and EVENT_WORDS.search(query):
+            candidates.append(self._match_events(view, query, now))
+        if view.summary.get("calendar") and CALENDAR_WORDS.search(query):
+            candidates.append(self._match_calendar(view, query, now.date()))
+        candidates = [c for c in candidates if c is not None]
+        return max(candidates, key=lambda c: c.confidence) if candidates else None
+
+    def _calendar_on(self, view: _View, day: date) -> List[Dict]:
+        return [r for r in view.calendar if r["_start"] <= day <= r["_end"]]
+
+    def _public(self, records: List[Dict]) -> List[Dict]:
+        return [{k: v for k, v in r.items() if not k.startswith("_")} for r in records]
+
+    def _match_calendar(self, view: _View, query: str, today: date) -> Optional[IndexMatch]:
+        asked = set(_tokens(query))
+        # Words that have to show up in the entry (or its term) for it to be the one meant
+        specific = {t for t in asked if t not in GENERIC}
+        scored = []
+        for record in view.calendar:
+            title = record["_tokens"] - SEASONS
+            if not title:
+                continue
+            weight = {t: (0.25 if t in GENERIC else 1.0) for t in title}
+            covered = sum(w for t, w in weight.items() if t in asked) / sum(weight.values())
+            # The term stands in for a season only when the title names nothing else: "fall" explains
+            # "Final Exams" under Fall 2025, not "Thanksgiving Recess" or "Winter Break"
+            known = record["_tokens"]
+            if not {t for t in known if t not in GENERIC} - asked:
+                known = known | {record["_term"]}
+            explained = len(specific & known) / len(specific) if specific else 1.0
+            if explained and covered:
+                scored.append((explained, covered, record))
+        if not scored:
+            return None
+        scored.sort(key=lambda x: (x[0], x[1]), reverse=True)
+        related = [r for _, _, r in scored[:6]]
+        best_explained, best_covered = scored[0][0], scored[0][1]
+        if best_explained < 1.0:
+            if best_explained < 0.5:
+                return None
+            return IndexMatch("calendar", 0.5, "", self._public(related))
+
+        # The same entry repeats each term; the next upcoming one is what people mean
+        best = [r for e, c, r in scored if e == best_explained and c == best_covered]
+        upcoming = sorted((r for r in best if r["_end"] >= today), key=lambda r: r["_start"])
+        chosen = upcoming[0] if upcoming else max(best, key=lambda r: r["_start"])
+        runner_up = max((c for e, c, r in scored if e == 1.0 and r["title"].lower() != chosen["title"].lower()), default=0.0)
+        confidence = 0.9 if best_covered >= 0.5 and best_covered - runner_up >= 0.3 else 0.6
+        if specific and not specific & chosen["_tokens"]:
+            confidence = 0.6  # matched on the term alone, e.g. "spring" for "Classes Begin"
+
+        term = f" ({chosen['term']})" if chosen.get("term") else ""
+        answer = f"{chosen['title']}{term}: {_fmt_range(chosen['_start'], chosen['_end'])}, per the Arcadia academic calendar."
+        return IndexMatch("calendar", confidence, answer, self._public([chosen] + [r for r in related if r is not chosen]))
+
+    def _match_events(self, view: _View, query: str, now: datetime) -> Optional[IndexMatch]:
+        days = self._days_asked(query, now.date()) or [now.date()]
+        by_day = {d: view.events_on(d) for d in days}
+        records = [e for d in days for e in by_day[d]]
+        covered = all(view.coverage[0] <= d <= view.coverage[1] for d in days)
+        if not covered:
+            # Outside what the scrape saw; the model can still look it up
+            return IndexMatch("events", 0.5, "", records) if records else None
+
+        when = _fmt_date(days[0]) if len(days) == 1 else f"{_fmt_date(days[0])} – {_fmt_date(days[-1])}"
+        if not records:
+            return IndexMatch("events", 0.85, f"There's nothing listed on the Arcadia events calendar for {when}.", [])
+        lines = []
+        for d in days:
+            for e in by_day[d]:
+                at = ""
+                if e["start"]:
+                    at = f" at {_fmt_time(_minutes(e['start']))}" + (f" – {_fmt_time(_minutes(e['end']))}" if e["end"] else "")
+                prefix = f"{DAY_NAMES[d.weekday()]}: " if len(days) > 1 else ""
+                lines.append(f"- {prefix}{e['title']}{at}")
+        answer = f"On the Arcadia events calendar for {when}:\n" + "\n".join(lines)
+        return IndexMatch("events", 0.9, answer, records)
+
+    def _dining_places(self, view: _View, query: str) -> List[str]:
+        asked = set(_tokens(query))
+        named = [
+            place for place in view.dining
+            if {t for t in _tokens(place) if t not in ("dining", "hall", "cafe", "café", "commons", "center")} & asked
+        ]
+        return named or list(view.dining)
+
+    def _hours_on(self, view: _View, place: str, day: date, meal: Optional[str]) -> List[Dict]:
+        rows = [r for r in view.dining[place] if day.weekday() in r["days"]]
+        if meal:
+            rows = [r for r in rows if (r.get("meal") or "").lower() == meal] or rows
+        if any(r["closed"] for r in rows) and not any(not r["closed"] for r in rows):
+            return [r for r in rows if r["closed"]]
+        return sorted((r for r in rows if not r["closed"]), key=lambda r: r["open"])
+
+    def _match_dining(self, view: _View, query: str, now: datetime) -> Optional[IndexMatch]:
+        places = self._dining_places(view, query)
+        meal_match = MEAL.search(query)
+        meal = meal_match.group(1).lower() if meal_match else None
+        named_days = self._days_asked(query, now.date())
+        days = named_days or [now.date()]
+        records = [r for p in places for r in view.dining[p]]
+        asks_hours = (HOURS_WORDS.search(query) or NOW_WORDS.search(query)
+                      or ((named_days or meal) and (TIME_WORDS.search(query) or TIME.search(query))))
+        if not asks_hours:
+            # About dining but not its hours (prices, menus, directions): the records are only context
+            return IndexMatch("dining", 0.5, "", records)
+        asking_now = bool(NOW_WORDS.search(query)) or (days == [now.date()] and re.search(r"\bopen\b", query, re.IGNORECASE))
+        lines = []
+
+        if asking_now and days == [now.date()]:
+            minute = now.hour * 60 + now.minute
+            for place in places:
+                # Past midnight, last night's late hours may still be running
+                spill = next((r for r in self._hours_on(view, place, now.date() - timedelta(days=1), meal) if not r["closed"] and
+                              _minutes(r["close"]) <= _minutes(r["open"]) and minute < _minutes(r["close"])), None)
+                if spill:
+                    lines.append(f"{place} is open now until {_fmt_time(_minutes(spill['close']))}.")
+                    continue
+                today_rows = self._hours_on(view, place, now.date(), meal)
+                open_row = next((r for r in today_rows if not r["closed"] and
+                                 _minutes(r["open"]) <= minute < (_minutes(r["close"]) if _minutes(r["close"]) > _minutes(r["open"]) else _minutes(r["close"]) + 1440)), None)
+                if open_row:
+                    lines.append(f"{place} is open now until {_fmt_time(_minutes(open_row['close']))}.")
+                    continue
+                later = next((r for r in today_rows if not r["closed"] and _minutes(r["open"]) > minute), None)
+                if later:
+                    lines.append(f"{place} is closed right now. It opens today at {_fmt_time(_minutes(later['open']))}.")
+                    continue
+                nxt = None
+                for ahead in range(1, 8):
+                    day = now.date() + timedelta(days=ahead)
+                    rows = [r for r in self._hours_on(view, place, day, meal) if not r["closed"]]
+                    if rows:
+                        nxt = (day, rows[0])
+                        break
+                when = f"{'tomorrow' if nxt and nxt[0] == now.date() + timedelta(days=1) else DAY_NAMES[nxt[0].weekday()]} at {_fmt_time(_minutes(nxt[1]['open']))}" if nxt else "later"
+                lines.append(f"{place} is closed right now. It next opens {when}.")
+        else:
+            for day in days:
+                for place in places:
+                    rows = self._hours_on(view, place, day, meal)
+                    if not rows:
+                        continue
+                    if rows[0]["closed"]:
+                        lines.append(f"{place} on {DAY_NAMES[day.weekday()]}: closed.")
+                        continue
+                    spans = ", ".join(
+                        f"{_fmt_time(_minutes(r['open']))} – {_fmt_time(_minutes(r['close']))}" + (f" ({r['meal'].lower()})" if r.get("meal") else "")
+                        for r in rows
+                    )
+                    lines.append(f"{place} on {DAY_NAMES[day.weekday()]}: {spans}.")
+        if not lines:
+            return IndexMatch("dining", 0.5, "", records)
+
+        confidence = 0.9 if len(places) <= 3 else 0.7
+        # Breaks and holidays change the hours; let the model weigh the calendar too
+        breaks = [r for d in days for r in self._calendar_on(view, d) if BREAK_WORDS.search(r["title"])]
+        if breaks:
+            confidence = 0.6
+            records = records + self._public(breaks)
+        return IndexMatch("dining", confidence, " ".join(lines) + " (Regular hours from the Arcadia dining page.)", records)
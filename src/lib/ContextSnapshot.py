@@ -0,0 +1,270 @@
+"""
+Shared, read-only context snapshot for ArchieAI.
+The scraped university context and the indexes derived from it are packed
+into one versioned binary file (data/context_snapshot.bin) that every worker
+process mmaps. The OS keeps a single copy of those pages in its cache no
+matter how many workers map them, so adding workers no longer multiplies the
+memory spent on read-mostly data. Section lookups return memoryviews straight
+into the mapping (no copy until a caller decodes them).
+
+A new version is written to a temp file and renamed over the old one. Readers
+switch to it on their next check; anyone still holding the old Snapshot (or a
+memoryview from it) keeps the old mapping alive until they let go of it.
+
+File layout (little-endian, sections 8-byte aligned):
+  header   magic "ARCHCTX\\0", format, section count, version
+  entries  name (32 bytes, NUL padded), offset, length   x section count
+  data     the sections' bytes
+
+Usage:
+  publish("data/context_snapshot.bin", build_sections(scrape_results, campus_index))
+  reader = SnapshotReader("data/context_snapshot.bin")
+  snap = reader.current()
+  prompt_json = snap.blob("context")
+"""
+import os
+import mmap
+import time
+import struct
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+from lib import FastJson
+from lib.CampusIndex import index_sections
+from lib.FileStore import file_lock, file_signature
+
+MAGIC = b"ARCHCTX\0"
+FORMAT = 2
+HEADER = struct.Struct("<8sIIQ")
+ENTRY = struct.Struct("<32sQQ")
+
+
+class SnapshotError(Exception):
+    """The snapshot file is missing a section or isn't one of ours."""
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def read_version(path: str) -> int:
+    """Version in the file's header, 0 if there's no (valid) file."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+    except FileNotFoundError:
+        return 0
+    if len(header) < HEADER.size or header[:8] != MAGIC:
+        return 0
+    return HEADER.unpack(header)[3]
+
+
+def publish(path: str, sections: Dict[str, bytes]) -> int:
+    """
+    Write `sections` as the next version of the snapshot and atomically
+    replace the old file. Returns the new version number.
+    """
+    for name in sections:
+        if len(name.encode("utf-8")) > ENTRY.size - 16:
+            raise ValueError(f"section name too long: {name!r}")
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    with file_lock(path + ".lock"):
+        version = read_version(path) + 1
+        offset = _align(HEADER.size + ENTRY.size * len(sections))
+        entries, layout = [], []
+        for name, data in sections.items():
+            entries.append(ENTRY.pack(name.encode("utf-8"), offset, len(data)))
+            layout.append((offset, data))
+            offset = _align(offset + len(data))
+
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(HEADER.pack(MAGIC, FORMAT, len(sections), version))
+                f.write(b"".join(entries))
+                for start, data in layout:
+                    f.seek(start)
+                    f.write(data)
+                f.truncate(offset)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    return version
+
+
+class Snapshot:
+    """
+    One mapped version of the snapshot file. Stays valid after a newer
+    version replaces the file; the mapping is released once nothing
+    (including memoryviews from blob()) refers to it.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            # Same shape as file_signature(), but of the file we actually opened
+            self.signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise SnapshotError(f"{path} is truncated")
+        magic, fmt, count, self.version = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or fmt != FORMAT:
+            raise SnapshotError(f"{path} is not a format {FORMAT} context snapshot")
+        self.path = path
+        self._view = memoryview(self._map)
+        self._sections: Dict[str, Tuple[int, int]] = {}
+        for i in range(count):
+            raw, offset, length = ENTRY.unpack_from(self._map, HEADER.size + i * ENTRY.size)
+            if offset + length > len(self._map):
+                raise SnapshotError(f"{path} is truncated")
+            self._sections[raw.rstrip(b"\0").decode("utf-8")] = (offset, length)
+        self._meta = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sections
+
+    def sections(self) -> Iterator[str]:
+        return iter(self._sections)
+
+    def blob(self, name: str) -> memoryview:
+        """Read-only view of a section, straight into the mapping."""
+        try:
+            offset, length = self._sections[name]
+        except KeyError:
+            raise SnapshotError(f"no section {name!r} in {self.path}")
+        return self._view[offset:offset + length]
+
+    def get(self, name: str, default=None) -> Optional[memoryview]:
+        """blob(name), or `default` if there's no such section (like dict.get)."""
+        return self.blob(name) if name in self._sections else default
+
+    def text(self, name: str) -> str:
+        """A section decoded as UTF-8 (this one is a copy, owned by the caller)."""
+        return str(self.blob(name), "utf-8")
+
+    def json(self, name: str):
+        return FastJson.loads(self.blob(name))
+
+    def meta(self) -> Dict:
+        if self._meta is None:
+            self._meta = self.json("meta") if "meta" in self else {}
+        return self._meta
+
+    def size(self) -> int:
+        return len(self._map)
+
+
+def build_sections(scrape_results: Dict, campus_index: Optional[Dict] = None,
+                   sources: Optional[Dict[str, Optional[Tuple]]] = None) -> Dict[str, bytes]:
+    """
+    The standard sections: the compact scrape JSON used in the system prompt,
+    the campus index split the way CampusIndex looks it up, and where they
+    came from.
+    """
+    return {
+        "context": FastJson.dumpb(scrape_results),
+        **index_sections(campus_index or {}),
+        "meta": FastJson.dumpb({
+            "built_at": time.time(),
+            "sources": {path: list(sig) if sig else None for path, sig in (sources or {}).items()},
+        }),
+    }
+
+
+def _load_json(path: str) -> Dict:
+    try:
+        return FastJson.load_file(path)
+    except (FileNotFoundError, FastJson.JSONDecodeError):
+        return {}
+
+
+def rebuild(path: str, scrape_file: str, campus_file: Optional[str] = None) -> int:
+    """Publish a snapshot of the current JSON files. Returns the new version."""
+    sources = {p: file_signature(p) for p in (scrape_file, campus_file) if p}
+    campus = _load_json(campus_file) if campus_file else {}
+    return publish(path, build_sections(_load_json(scrape_file), campus, sources))
+
+
+class SnapshotReader:
+    """
+    Per-process handle on the shared snapshot: maps the current version and
+    swaps to a new one when the file is replaced (checked at most every
+    check_interval seconds).
+
+    With sources (scrape_results.json, campus_index.json) set, a snapshot
+    that's missing or older than those files is rebuilt from them first, so
+    edits and scrapes made without publishing still show up. Workers racing
+    to do that are serialized by the publish lock and only one rebuilds.
+    """
+
+    def __init__(self, path: str, scrape_file: Optional[str] = None, campus_file: Optional[str] = None,
+                 check_interval: float = 1.0):
+        self.path = path
+        self.scrape_file = scrape_file
+        self.campus_file = campus_file
+        self.check_interval = check_interval
+        self._snapshot: Optional[Snapshot] = None
+        self._checked: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _stale(self, snap: Optional[Snapshot]) -> bool:
+        if not self.scrape_file:
+            return False
+        wanted = {
+            self.scrape_file: file_signature(self.scrape_file),
+            self.campus_file: file_signature(self.campus_file) if self.campus_file else None,
+        }
+        if snap is None:
+            return wanted[self.scrape_file] is not None
+        have = snap.meta().get("sources", {})
+        return any((list(sig) if sig else None) != have.get(p) for p, sig in wanted.items() if p)
+
+    def _load(self) -> Optional[Snapshot]:
+        signature = file_signature(self.path)
+        snap = self._snapshot
+        if signature is None:
+            return None
+        if snap is not None and snap.signature == signature:
+            return snap
+        try:
+            return Snapshot(self.path)
+        except (FileNotFoundError, SnapshotError) as e:
+            print(f"[snapshot] can't map {self.path}: {e}")
+            return None
+
+    def refresh(self) -> Optional[Snapshot]:
+        """Check the file now; rebuild it from its sources if they've changed."""
+        with self._lock:
+            snap = self._load()
+            if self._stale(snap):
+                with file_lock(self.path + ".lock"):
+                    # Another worker may have rebuilt it while we waited
+                    snap = self._load()
+                    if self._stale(snap):
+                        rebuild(self.path, self.scrape_file, self.campus_file)
+                        snap = self._load()
+            self._snapshot = snap
+            self._checked = time.monotonic()
+            return snap
+
+    def current(self) -> Optional[Snapshot]:
+        """The mapped snapshot (None if there isn't one yet). Hold on to it for the whole request."""
+        if self._checked is None or time.monotonic() - self._checked >= self.check_interval:
+            return self.refresh()
+        return self._snapshot
+
+    def stats(self) -> Dict:
+        snap = self.current()
+        if snap is None:
+            return {"version": None}
+        return {
+            "version": snap.version,
+            "bytes": snap.size(),
+            "sections": {name: len(snap.blob(name)) for name in snap.sections()},
+            "built_at": snap.meta().get("built_at"),
+        }
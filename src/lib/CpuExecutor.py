@@ -0,0 +1,176 @@
+"""
+Process pool for CPU-heavy work in ArchieAI.
+Password hashing is slow on purpose and holds a core while it runs; doing it
+on request threads makes a burst of logins stall token streaming for everyone
+else. Work sent here runs in separate processes with a bounded queue and a
+timeout, and its counters show up in /api/admin/metrics.
+"""
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from lib.Metrics import metrics
+
+
+# Imported once in the fork server, so every worker forked from it already has them.
+# Never "__main__": tasks are top-level functions in lib.*, and the app script guards its
+# services against the __mp_main__ re-run each worker still does (see app.py)
+PRELOAD_MODULES = ["lib.CpuExecutor", "werkzeug.security", "lib.QrService", "lib.qrCodeGen"]
+
+
+class CpuBusyError(RuntimeError):
+    """The CPU pool's queue is full (or the task timed out); try again later."""
+
+
+# ---- tasks (top-level so they can be pickled into the worker processes) ----
+
+def hash_password(password: str) -> str:
+    from werkzeug.security import generate_password_hash
+    return generate_password_hash(password)
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    from werkzeug.security import check_password_hash
+    return check_password_hash(password_hash, password)
+
+
+def ping() -> int:
+    """Trivial task used to start the pool ahead of the first real one."""
+    return os.getpid()
+
+
+# ---- executor ---------------------------------------------------------------
+
+class CpuExecutor:
+    """
+    Bounded process pool.
+
+    At most `max_workers` tasks run and `max_queue` wait; anything beyond that
+    is rejected with CpuBusyError instead of piling up. A task's slot is only
+    freed when it actually finishes: a caller that timed out stops waiting,
+    but the task keeps its slot while it is still running in a worker. The
+    pool starts on the first task (or warm()), so importing this costs nothing.
+
+    Usage:
+      cpu_executor.run(hash_password, "hunter2")          # blocks the calling thread only
+      await cpu_executor.run_async(verify_password, password_hash, password)
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 32, timeout: float = 10.0, queue_wait: float = 0.5):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        # How long a caller waits for a queue slot before giving up
+        self.queue_wait = queue_wait
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.start_method = None
+        self._in_flight = 0
+        self._count_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CpuExecutor":
+        """Pool sized from CPU_WORKERS / CPU_QUEUE_SIZE / CPU_TASK_TIMEOUT_SECONDS (0 workers runs inline)."""
+        default_workers = max(1, min(4, (os.cpu_count() or 2) // 2))
+        return cls(
+            max_workers=int(os.getenv("CPU_WORKERS", str(default_workers))),
+            max_queue=int(os.getenv("CPU_QUEUE_SIZE", "32")),
+            timeout=float(os.getenv("CPU_TASK_TIMEOUT_SECONDS", "10")),
+        )
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # Not fork: the app has threads (request handlers, health checks, sweepers) and a
+                # forked child can inherit a lock one of them held. The fork server is a clean,
+                # single-threaded process with the task modules preloaded, so workers still start fast.
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self.start_method = context.get_start_method()
+                if self.start_method == "forkserver":
+                    context.set_forkserver_preload(PRELOAD_MODULES)
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._pool
+
+    def _reset_pool(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _track(self, delta: int):
+        with self._count_lock:
+            self._in_flight += delta
+            metrics.set_gauge("cpu_tasks_in_flight", self._in_flight)
+
+    def _finished(self, future=None):
+        self._track(-1)
+        self._slots.release()
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        try:
+            return self._get_pool().submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM kill etc.); start a fresh pool once
+            self._reset_pool()
+            return self._get_pool().submit(fn, *args)
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Run fn(*args) in the pool and wait for the result. Raises CpuBusyError if full or too slow."""
+        if not self.max_workers:
+            return fn(*args)
+
+        if not self._slots.acquire(timeout=self.queue_wait):
+            metrics.incr("cpu_tasks_rejected")
+            raise CpuBusyError("CPU pool queue is full")
+        self._track(1)
+        metrics.incr("cpu_tasks_submitted")
+        start = time.perf_counter()
+        try:
+            future = self._submit(fn, *args)
+        except BaseException:
+            self._finished()
+            raise
+        # The slot goes back when the task is really done, not when we stop waiting for it
+        future.add_done_callback(self._finished)
+        try:
+            result = future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            # Only works if it hasn't started; a running task holds its slot until it ends
+            future.cancel()
+            metrics.incr("cpu_tasks_timed_out")
+            raise CpuBusyError(f"CPU task {fn.__name__} timed out")
+        except BrokenProcessPool:
+            self._reset_pool()
+            metrics.incr("cpu_tasks_failed")
+            raise
+        except Exception:
+            metrics.incr("cpu_tasks_failed")
+            raise
+        metrics.incr("cpu_tasks_completed")
+        metrics.incr("cpu_task_seconds_total", time.perf_counter() - start)
+        return result
+
+    def warm(self) -> dict:
+        """Start the pool (and fork server) now so the first login doesn't pay for it."""
+        if not self.max_workers:
+            return {"workers": 0}
+        self.run(ping, timeout=max(self.timeout, 30.0))
+        return {"workers": self.max_workers, "start_method": self.start_method}
+
+    async def run_async(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """run() for async code, without blocking the event loop."""
+        import asyncio
+        return await asyncio.to_thread(self.run, fn, *args, timeout=timeout)
+
+    def shutdown(self):
+        self._reset_pool()
+
+
+# Shared pool for the whole process
+cpu_executor = CpuExecutor.from_env()
@@ -1,32 +1,60 @@
 """
 Data collection module for ArchieAI analytics.
-Collects interaction data and saves to JSON for later analysis.
+Collects interaction data into rolling JSON-lines segments for later analysis.
 """
 import os
-import json
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List, Dict, Iterator
+from lib.AnalyticsRollups import RollupStore, ALL_MODELS
+from lib.SegmentLog import SegmentLog, iter_json_array
+from lib.FileStore import file_lock
+from lib import FastJson
 "For the data science class I will probably remove this when the semester ends but for now it will help me collect data on how people are using ArchieAI "
 "and i will manipulate the data to find trends for my project"
 
 class DataCollector:
-    """Collects and logs interaction data to JSON file."""
+    """Collects and logs interaction data to rotating, compressed segment files."""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(
+        self,
+        data_dir: str = "data",
+        segment_max_bytes: Optional[int] = None,
+        retention_days: Optional[int] = None,
+        retention_action: Optional[str] = None
+    ):
         self.data_dir = data_dir
+        # Legacy single-file log; migrated into segments on startup
         self.json_file = os.path.join(data_dir, "analytics.json")
         
         # Ensure data directory exists
         os.makedirs(self.data_dir, exist_ok=True)
-        
-        # Initialize JSON file with empty array if it doesn't exist
-        if not os.path.exists(self.json_file):
-            self._create_json_file()
+
+        # Interactions go into data/analytics/ segments (rotated by size or day, gzipped once closed)
+        self.log = SegmentLog(
+            os.path.join(data_dir, "analytics"),
+            max_bytes=segment_max_bytes or int(os.getenv("ANALYTICS_SEGMENT_MAX_BYTES", str(16 * 1024 * 1024))),
+            retention_days=retention_days if retention_days is not None else int(os.getenv("ANALYTICS_RETENTION_DAYS", "0")),
+            retention_action=retention_action or os.getenv("ANALYTICS_RETENTION_ACTION", "archive"),
+        )
+
+        # Pre-aggregated counters/latency sketches, updated as we log
+        self.rollups = RollupStore(os.path.join(data_dir, "analytics_rollups.json"))
+
+        if os.path.exists(self.json_file):
+            # Only one worker does the migration; the others find the file already gone
+            with file_lock(self.json_file + ".lock"):
+                if os.path.exists(self.json_file):
+                    self._migrate_legacy_json()
     
-    def _create_json_file(self):
-        """Create JSON file with empty array."""
-        with open(self.json_file, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+    def _migrate_legacy_json(self):
+        """Move the old ever-growing analytics.json into segments (one time)."""
+        try:
+            count = self.log.import_records(iter_json_array(self.json_file))
+        except (ValueError, FastJson.JSONDecodeError) as e:
+            print(f"Warning: could not migrate {self.json_file}: {e}")
+            return
+        os.replace(self.json_file, self.json_file + ".migrated")
+        print(f"Migrated {count} interactions from analytics.json into {self.log.log_dir}")
     
     def log_interaction(
         self,
@@ -36,10 +64,12 @@ class DataCollector:
         device_info: str,
         question: str,
         answer: str,
-        generation_time_seconds: float
+        generation_time_seconds: float,
+        cancelled: bool = False,
+        model: Optional[str] = None
     ):
         """
-        Log a user interaction to the JSON file.
+        Log a user interaction to the active analytics segment.
         
         Args:
             session_id: Unique session identifier
@@ -49,8 +79,11 @@ class DataCollector:
             question: User's question
             answer: AI's answer
             generation_time_seconds: Time taken to generate the answer
+            cancelled: True if the client disconnected and the answer was cut short
+            model: Model that produced the answer (None if unknown)
         """
-        timestamp = datetime.now().isoformat()
+        now = datetime.now()
+        timestamp = now.isoformat()
         question_length = len(question)
         answer_length = len(answer)
         
@@ -64,20 +97,45 @@ class DataCollector:
             "question_length": question_length,
             "answer": answer,
             "answer_length": answer_length,
-            "generation_time_seconds": round(generation_time_seconds, 2)
+            "generation_time_seconds": round(generation_time_seconds, 2),
+            "cancelled": cancelled,
+            "model": model
         }
+
+        self.rollups.record(
+            now,
+            model,
+            generation_time=generation_time_seconds,
+            question_length=question_length,
+            answer_length=answer_length,
+            cancelled=cancelled,
+        )
         
-        # Read existing data
-        try:
-            with open(self.json_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            data = []
-        
-        # Append new interaction
-        data.append(interaction)
-        
-        # Write back to file
-        with open(self.json_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # One appended line instead of rewriting the whole history every time
+        self.log.append(interaction)
 
+    def iter_interactions(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Stream logged interactions in time order, optionally limited to
+        start <= timestamp <= end (ISO dates or datetimes). Only segments that
+        overlap the range are opened.
+        """
+        return self.log.iter_records(start=start, end=end)
+
+    def get_rollups(
+        self,
+        granularity: str = "hour",
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        model: str = ALL_MODELS
+    ) -> List[Dict]:
+        """
+        Pre-aggregated stats per minute/hour/day bucket.
+
+        Args:
+            granularity: "minute", "hour" or "day"
+            start: ISO date/time prefix of the first bucket (inclusive)
+            end: ISO date/time prefix of the last bucket (inclusive)
+            model: model name, or "*" for all models
+        """
+        return self.rollups.query(granularity, start=start, end=end, model=model)
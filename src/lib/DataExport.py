@@ -0,0 +1,206 @@
+"""
+Streaming exports of chat sessions and analytics for ArchieAI.
+Rows are produced by generators straight from the session store and the
+analytics segments, one session or one log line at a time, and encoded as
+NDJSON or CSV (optionally gzipped) as they go. Memory stays flat no matter
+how big the export is, and the first bytes go out before the whole set
+has even been read.
+
+Usage:
+  rows = iter_interaction_rows(data_collector, start="2025-09-01", end="2025-12-20")
+  for chunk in export_stream(rows, "csv", INTERACTION_COLUMNS, compress=True):
+      out.write(chunk)
+"""
+import io
+import os
+import csv
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lib import FastJson
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# One row per message
+SESSION_COLUMNS = [
+    "session_id",
+    "user_email",
+    "session_created_at",
+    "index",
+    "role",
+    "timestamp",
+    "cancelled",
+    "content",
+]
+
+# One row per logged question/answer (see DataCollector.log_interaction)
+INTERACTION_COLUMNS = [
+    "timestamp",
+    "session_id",
+    "user_email",
+    "ip_address",
+    "device_info",
+    "model",
+    "question",
+    "question_length",
+    "answer",
+    "answer_length",
+    "generation_time_seconds",
+    "cancelled",
+]
+
+# Rows are gathered into chunks about this big before they're written out
+CHUNK_BYTES = 64 * 1024
+# With compression on, force compressed bytes out at least this often
+GZIP_FLUSH_BYTES = 256 * 1024
+
+
+def _end_key(end: Optional[str]) -> Optional[str]:
+    # "2025-10-07" includes the whole day (same rule as SegmentLog.iter_records)
+    return end + "\uffff" if end else None
+
+
+def _in_range(ts: str, start: Optional[str], end_key: Optional[str]) -> bool:
+    return not ((start and ts < start) or (end_key and ts > end_key))
+
+
+# ---- sources ------------------------------------------------------------
+
+def iter_sessions(session_manager, user: Optional[str] = None, session_id: Optional[str] = None,
+                  start: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    (session_id, data) one at a time: a single session, a user's sessions, or
+    every hot and archived session. Archived sessions are read in place, not
+    promoted. Hot files last modified before `start` are skipped unopened.
+    """
+    if session_id:
+        data = session_manager.get_session(session_id, promote=False)
+        if data is not None:
+            yield session_id, data
+        return
+    if user:
+        for sid in session_manager.get_user_sessions(user):
+            data = session_manager.get_session(sid, promote=False)
+            if data is not None:
+                yield sid, data
+        return
+
+    cutoff = datetime.fromisoformat(start).timestamp() if start else None
+    for sid, path in session_manager.iter_hot_session_files():
+        try:
+            if cutoff and os.stat(path).st_mtime < cutoff:
+                continue  # nothing in it is new enough
+            yield sid, FastJson.load_file(path)
+        except FileNotFoundError:
+            continue  # swept or archived while we were walking
+        except FastJson.JSONDecodeError as e:
+            print(f"Warning: skipping corrupted session {sid}: {e}")
+    for sid in session_manager.archive.session_ids():
+        if os.path.exists(session_manager._session_path(sid)):
+            continue  # promoted back to a hot file
+        data = session_manager.archive.read(sid)
+        if data is not None:
+            yield sid, data
+
+
+def iter_session_rows(session_manager, user: Optional[str] = None, session_id: Optional[str] = None,
+                      start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+    """One row per message, filtered by owner, session and message timestamp."""
+    end_key = _end_key(end)
+    for sid, data in iter_sessions(session_manager, user=user, session_id=session_id, start=start):
+        if user and data.get("user_email") != user:
+            continue
+        for index, message in enumerate(data.get("messages", [])):
+            ts = message.get("timestamp") or ""
+            if not _in_range(ts, start, end_key):
+                continue
+            yield {
+                "session_id": sid,
+                "user_email": data.get("user_email"),
+                "session_created_at": data.get("created_at"),
+                "index": index,
+                "role": message.get("role"),
+                "timestamp": ts,
+                "cancelled": bool(message.get("cancelled", False)),
+                "content": message.get("content", ""),
+            }
+
+
+def iter_interaction_rows(data_collector, user: Optional[str] = None, session_id: Optional[str] = None,
+                          start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+    """Logged interactions in time order; only segments overlapping the range are opened."""
+    for record in data_collector.iter_interactions(start=start, end=end):
+        if user and record.get("user_email") != user:
+            continue
+        if session_id and record.get("session_id") != session_id:
+            continue
+        yield record
+
+
+# ---- encoding -----------------------------------------------------------
+
+def ndjson_chunks(rows: Iterable[Dict]) -> Iterator[bytes]:
+    for row in rows:
+        yield FastJson.dumpb(row) + b"\n"
+
+
+def csv_chunks(rows: Iterable[Dict], columns: List[str]) -> Iterator[bytes]:
+    """Header, then one encoded line per row (columns not listed are dropped)."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+
+    def take() -> bytes:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data.encode("utf-8")
+
+    writer.writeheader()
+    yield take()
+    for row in rows:
+        writer.writerow(row)
+        yield take()
+
+
+def batched(chunks: Iterable[bytes], size: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """Join small chunks into ~size-byte writes. The first one goes out on its own so clients see bytes at once."""
+    parts, pending, first = [], 0, True
+    for chunk in chunks:
+        if first:
+            first = False
+            yield chunk
+            continue
+        parts.append(chunk)
+        pending += len(chunk)
+        if pending >= size:
+            yield b"".join(parts)
+            parts, pending = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+def gzipped(chunks: Iterable[bytes], level: int = 6, flush_bytes: int = GZIP_FLUSH_BYTES) -> Iterator[bytes]:
+    """Gzip a byte stream on the fly, sync-flushing now and then so the client keeps receiving data."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    pending, first = 0, True
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        pending += len(chunk)
+        if first or pending >= flush_bytes:
+            out += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending, first = 0, False
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def export_stream(rows: Iterable[Dict], fmt: str, columns: List[str], compress: bool = False) -> Iterator[bytes]:
+    """Encoded export body. fmt is 'ndjson' (every field) or 'csv' (just `columns`)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    chunks = batched(csv_chunks(rows, columns) if fmt == "csv" else ndjson_chunks(rows))
+    return gzipped(chunks) if compress else chunks
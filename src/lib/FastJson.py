@@ -0,0 +1,69 @@
+"""
+JSON encoding for ArchieAI.
+Uses orjson when it's installed (several times faster than the standard
+library and produces UTF-8 bytes directly) and falls back to the stdlib json
+module otherwise. Output is compact unless pretty=True is asked for, so files
+on disk, SSE frames and responses don't carry indentation nobody reads.
+
+Set ARCHIE_JSON=stdlib to force the fallback (e.g. to compare in benchmarks).
+"""
+import os
+import json
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.getenv("ARCHIE_JSON", "").lower() == "stdlib":
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# orjson.JSONDecodeError subclasses this, so one except clause covers both backends
+JSONDecodeError = json.JSONDecodeError
+
+
+def dumpb(obj: Any, pretty: bool = False, sort_keys: bool = False, default: Optional[Callable] = None) -> bytes:
+    """Encode to UTF-8 JSON bytes. pretty=True indents by 2 spaces."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # Ints over 64 bits and the like; the stdlib handles those
+            pass
+    return _std_dumps(obj, pretty, sort_keys, default).encode("utf-8")
+
+
+def dumps(obj: Any, pretty: bool = False, sort_keys: bool = False, default: Optional[Callable] = None) -> str:
+    """dumpb() as a str."""
+    if orjson is None:
+        return _std_dumps(obj, pretty, sort_keys, default)
+    return dumpb(obj, pretty, sort_keys, default).decode("utf-8")
+
+
+def _std_dumps(obj: Any, pretty: bool, sort_keys: bool, default: Optional[Callable]) -> str:
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2, sort_keys=sort_keys, default=default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=default)
+
+
+def loads(data) -> Any:
+    """Decode JSON from bytes, str or a memoryview."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def load_file(path: str) -> Any:
+    """Parse a JSON file (read as bytes, no text decoding step)."""
+    with open(path, "rb") as f:
+        return loads(f.read())
@@ -0,0 +1,160 @@
+"""
+Multi-process-safe file helpers for ArchieAI's JSON storage.
+Advisory locks (fcntl.flock) serialize read-modify-write cycles across worker
+processes, writes go to a temp file that is renamed into place so readers
+never see half a file, and JsonFileCache reloads a file only when another
+process has replaced it.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Tuple
+
+from lib import FastJson
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no flock, fall back to in-process locking only (single worker)
+    fcntl = None
+
+
+# flock only excludes other open files, so threads of one process also need a lock
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path: str) -> threading.RLock:
+    with _thread_locks_guard:
+        lock = _thread_locks.get(path)
+        if lock is None:
+            lock = _thread_locks[path] = threading.RLock()
+        return lock
+
+
+# Lock paths the current thread already holds (for re-entrancy)
+_held = threading.local()
+
+
+@contextmanager
+def file_lock(lock_path: str, shared: bool = False):
+    """
+    Hold an advisory lock on `lock_path` (created if needed) across threads and
+    processes. shared=True takes a read lock that only excludes writers.
+    Re-entrant within a thread.
+    """
+    lock_path = os.path.abspath(lock_path)
+    local = _thread_lock(lock_path)
+    with local:
+        state = getattr(_held, "paths", None)
+        if state is None:
+            state = _held.paths = {}
+        if lock_path in state or fcntl is None:
+            # Already held by this thread (nested call) or nothing to flock with
+            state[lock_path] = state.get(lock_path, 0) + 1
+            try:
+                yield
+            finally:
+                state[lock_path] -= 1
+                if not state[lock_path]:
+                    del state[lock_path]
+            return
+
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            state[lock_path] = 1
+            try:
+                yield
+            finally:
+                del state[lock_path]
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+def try_exclusive_lock(lock_path: str) -> Optional[int]:
+    """
+    Non-blocking exclusive lock, held until the returned fd is closed (or the
+    process exits). None if another process holds it. Used to elect one worker
+    for background jobs.
+    """
+    if fcntl is None:
+        return -1
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def atomic_write_json(path: str, data: Any, pretty: bool = False):
+    """
+    Write JSON to a unique temp file, fsync it, and rename it over `path`.
+    Compact unless pretty=True (for files people actually open).
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(FastJson.dumpb(data, pretty=pretty))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """(inode, size, mtime_ns) of a file, None if it doesn't exist. Changes on every atomic replace."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class JsonFileCache:
+    """
+    Parsed copy of a JSON file that is reloaded only when the file's signature
+    changes, so other processes' writes are picked up without re-parsing on every read.
+    """
+
+    def __init__(self, path: str, default: Callable[[], Any] = dict):
+        self.path = path
+        self.default = default
+        self._signature = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """Current contents. Callers must not mutate the result; use load() for a private copy."""
+        signature = file_signature(self.path)
+        with self._lock:
+            if signature is None:
+                return self.default()
+            if signature != self._signature:
+                self._value = FastJson.load_file(self.path)
+                self._signature = signature
+            return self._value
+
+    def load(self) -> Any:
+        """Fresh copy of the file for a read-modify-write cycle (call under file_lock)."""
+        signature = file_signature(self.path)
+        if signature is None:
+            return self.default()
+        return FastJson.load_file(self.path)
+
+    def store(self, value: Any, pretty: bool = False):
+        """Atomically replace the file and remember what we wrote."""
+        atomic_write_json(self.path, value, pretty=pretty)
+        with self._lock:
+            self._value = value
+            self._signature = file_signature(self.path)
@@ -4,12 +4,178 @@ from dotenv import load_dotenv
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from typing import Any,  AsyncIterator
-import json
-import sys
-from ollama import AsyncClient, web_fetch, web_search
+from typing import Any,  AsyncIterator, Optional, Dict, List, Union
+import time
+import threading
+from collections import OrderedDict
+import httpx
+from ollama import AsyncClient, ResponseError, web_fetch, web_search
 import inspect
 import datetime
+from lib.QueryRouter import QueryRouter
+from lib.CampusIndex import CampusIndex, IndexMatch
+from lib.ContextSnapshot import SnapshotReader
+from lib.Metrics import metrics
+from lib import FastJson
+
+
+# Errors that mean "this backend is unreachable", as opposed to a bad request
+BACKEND_CONNECTION_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, ConnectionError)
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """True if `error` means the backend is down (fail over), not that the request was bad."""
+    server_error = isinstance(error, ResponseError) and error.status_code >= 500
+    return isinstance(error, BACKEND_CONNECTION_ERRORS) or server_error
+
+
+class OllamaBackend:
+    """One Ollama inference host and its live bookkeeping."""
+
+    def __init__(self, host: Optional[str]):
+        # None means "whatever the ollama client defaults to" (OLLAMA_HOST or localhost)
+        self.host = host
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_checked = None
+
+    @property
+    def name(self) -> str:
+        return self.host or "default"
+
+    @property
+    def base_url(self) -> str:
+        return (self.host or os.getenv("OLLAMA_HOST") or "http://127.0.0.1:11434").rstrip("/")
+
+
+class BackendPool:
+    """
+    Pool of Ollama hosts configured with OLLAMA_HOSTS (comma separated).
+
+    Each chat goes to the healthy backend with the fewest outstanding requests.
+    A session sticks to the backend it used last (so the server can reuse its
+    prompt prefix cache) unless that backend is unhealthy or noticeably busier
+    than the least loaded one. A background thread polls every backend and
+    brings failed ones back once they answer again.
+    """
+
+    def __init__(
+        self,
+        hosts: List[Optional[str]],
+        headers: Optional[Dict[str, str]] = None,
+        health_interval: float = 10.0,
+        health_timeout: float = 2.0,
+        sticky_slack: int = 2,
+        max_sticky_sessions: int = 10000,
+    ):
+        self.backends = [OllamaBackend(host) for host in (hosts or [None])]
+        self.headers = headers or {}
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.sticky_slack = sticky_slack
+        self.max_sticky_sessions = max_sticky_sessions
+        self._sticky: "OrderedDict[str, OllamaBackend]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._health_thread = None
+
+    @classmethod
+    def from_env(cls, headers: Optional[Dict[str, str]] = None) -> "BackendPool":
+        """Build a pool from OLLAMA_HOSTS, falling back to the single default host."""
+        hosts = [h.strip() for h in os.getenv("OLLAMA_HOSTS", "").split(",") if h.strip()]
+        return cls(
+            hosts or [None],
+            headers=headers,
+            health_interval=float(os.getenv("OLLAMA_HEALTH_INTERVAL_SECONDS", "10")),
+        )
+
+    def start_health_checks(self):
+        """Start the background health checker (idempotent)."""
+        with self._lock:
+            if self._health_thread is not None:
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
+
+    def _health_loop(self):
+        while True:
+            self.check_health()
+            time.sleep(self.health_interval)
+
+    def check_health(self):
+        """Ping every backend once and update its healthy flag."""
+        for backend in self.backends:
+            try:
+                response = requests.get(f"{backend.base_url}/api/version", headers=self.headers, timeout=self.health_timeout)
+                healthy = response.status_code < 500
+                error = None if healthy else f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                healthy, error = False, str(e)
+            with self._lock:
+                if healthy and not backend.healthy:
+                    print(f"Ollama backend {backend.name} is healthy again")
+                backend.healthy = healthy
+                backend.last_checked = time.time()
+                if error:
+                    backend.last_error = error
+
+    def pick(self, session_key: Optional[str] = None, exclude: tuple = ()) -> OllamaBackend:
+        """Choose a backend for a new chat request and count it as outstanding."""
+        self.start_health_checks()
+        with self._lock:
+            candidates = [b for b in self.backends if b not in exclude]
+            if not candidates:
+                raise RuntimeError("No Ollama backends left to try")
+            healthy = [b for b in candidates if b.healthy] or candidates
+            least = min(healthy, key=lambda b: b.outstanding)
+
+            chosen = least
+            sticky = self._sticky.get(session_key) if session_key else None
+            if sticky in healthy and sticky.outstanding <= least.outstanding + self.sticky_slack:
+                chosen = sticky
+
+            if session_key:
+                self._sticky[session_key] = chosen
+                self._sticky.move_to_end(session_key)
+                while len(self._sticky) > self.max_sticky_sessions:
+                    self._sticky.popitem(last=False)
+
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen
+
+    def release(self, backend: OllamaBackend):
+        """Mark a request on `backend` as finished."""
+        with self._lock:
+            backend.outstanding = max(0, backend.outstanding - 1)
+
+    def mark_failed(self, backend: OllamaBackend, error: Exception):
+        """Take a backend out of rotation until the health checker sees it again."""
+        with self._lock:
+            backend.healthy = False
+            backend.failures += 1
+            backend.last_error = str(error)
+        print(f"Ollama backend {backend.name} failed, failing over: {error}")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-backend metrics for the admin endpoint."""
+        with self._lock:
+            return [
+                {
+                    "host": b.name,
+                    "healthy": b.healthy,
+                    "outstanding": b.outstanding,
+                    "requests": b.requests,
+                    "failures": b.failures,
+                    "last_error": b.last_error,
+                    "last_checked": b.last_checked,
+                }
+                for b in self.backends
+            ]
+
+
 class AiInterface:
     """
     AI Interface using Ollama for local LLM inference with streaming support.
@@ -70,10 +236,94 @@ class AiInterface:
         self.session.mount("https://", adapter)
         self.session.mount("http://", adapter)
 
+        # Pool of inference hosts (OLLAMA_HOSTS); a single default host if not configured
+        self.backends = BackendPool.from_env(headers=self._auth_headers())
+
+        # Sends trivial questions to FAST_MODEL (no thinking, no tools) when configured
+        self.router = QueryRouter.from_env()
+
+        # How long the inference server keeps our models loaded after a request
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        self.warmup_timeout = float(os.getenv("OLLAMA_WARMUP_TIMEOUT_SECONDS", "300"))
+
+        # Questions answered at once by answer_batch (Ollama runs a few requests per model in parallel)
+        self.batch_concurrency = int(os.getenv("ARCHIE_BATCH_CONCURRENCY", str(4 * len(self.backends.backends))))
+
+        # scrape_results.json + campus index packed into one read-only file that every worker mmaps,
+        # so the context is held once by the OS page cache instead of once per worker
+        self.context_file = "data/scrape_results.json"
+        campus_file = os.getenv("CAMPUS_INDEX_FILE", os.path.join("data", "campus_index.json"))
+        self.context_snapshot = SnapshotReader(
+            os.getenv("CONTEXT_SNAPSHOT_FILE", os.path.join("data", "context_snapshot.bin")),
+            scrape_file=self.context_file,
+            campus_file=campus_file,
+            check_interval=float(os.getenv("CONTEXT_SNAPSHOT_CHECK_SECONDS", "1")),
+        )
+
+        # Calendar/dining/event records parsed from the scrape; confident lookups skip the model
+        self.campus = CampusIndex(campus_file, snapshots=self.context_snapshot)
+        self.campus_answer_confidence = float(os.getenv("CAMPUS_ANSWER_CONFIDENCE", "0.8"))
+        self.campus_context_confidence = float(os.getenv("CAMPUS_CONTEXT_CONFIDENCE", "0.5"))
+
     def _log(self, *args):
         if self.debug:
             print("[AiInterface DEBUG]", *args)
 
+    def _auth_headers(self) -> Dict[str, str]:
+        """Bearer auth header for Ollama, if an API key/token is configured."""
+        api_key = os.getenv('OLLAMA_API_KEY') or os.getenv('OLLAMA_TOKEN')
+        return {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+    async def _open_chat_stream(self, session_key: Optional[str], **chat_kwargs):
+        """
+        Start a streaming chat on a backend from the pool and wait for its first chunk.
+        Connection failures before the first token fail over to the next backend.
+        Returns (backend, stream, first_chunk); the caller must release the backend.
+        """
+        tried = []
+        while True:
+            backend = self.backends.pick(session_key, exclude=tuple(tried))
+            client = AsyncClient(host=backend.host, headers=self.backends.headers)
+            stream = None
+            try:
+                stream = await client.chat(**chat_kwargs)
+                try:
+                    first_chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    first_chunk = None
+                return backend, stream, first_chunk
+            except BaseException as e:
+                # Cancelled or detached before the first chunk too: give the slot back either way
+                self.backends.release(backend)
+                if stream is not None:
+                    await stream.aclose()
+                if not isinstance(e, Exception) or not is_backend_failure(e):
+                    raise
+                self.backends.mark_failed(backend, e)
+                tried.append(backend)
+                if len(tried) >= len(self.backends.backends):
+                    raise
+
+    async def _chat(self, session_key: Optional[str] = None, **chat_kwargs):
+        """
+        Non-streaming chat on a backend from the pool, failing over to the next
+        backend on connection errors like _open_chat_stream.
+        """
+        tried = []
+        while True:
+            backend = self.backends.pick(session_key, exclude=tuple(tried))
+            try:
+                client = AsyncClient(host=backend.host, headers=self.backends.headers)
+                return await client.chat(**chat_kwargs)
+            except Exception as e:
+                if not is_backend_failure(e):
+                    raise
+                self.backends.mark_failed(backend, e)
+                tried.append(backend)
+                if len(tried) >= len(self.backends.backends):
+                    raise
+            finally:
+                self.backends.release(backend)
 
 
     #I dont think this is used anywhere but im keeping it just in case
@@ -116,55 +366,248 @@ class AiInterface:
     
     #I dont think this is used anywhere but im keeping it just in case
     
-    async def Archie(self, query: str, conversation_history: list = None) -> str:
+    def warm_models(self) -> Dict[str, Dict[str, Any]]:
         """
-        Main async entry point for the Archie AI assistant.
-        Uses scraped data from JSON file to provide context for answering queries.
-        Uses Ollama tool calling to enable web search when needed.
+        Load every configured model on every backend and pin it with keep_alive,
+        so the first real question doesn't wait for the model to load.
+        Returns {backend: {model: seconds}}; raises if a model can't be loaded anywhere.
         """
-        with open("data/scrape_results.json", "r", encoding="utf-8") as f:
-            results = json.load(f)
-        
-        # Build messages list with system prompt and conversation history
-        messages = []
-        
-        system_content = f"""You are ArchieAI, an AI assistant for Arcadia University. You are here to help students, faculty, and staff with any questions they may have about the university.
+        models = [m for m in dict.fromkeys([
+            os.getenv("OLLAMA_MODEL"), self.router.fast_model, self.router.classifier_model,
+        ]) if m]
+        results: Dict[str, Dict[str, Any]] = {}
+        loaded = {m: False for m in models}
+        for backend in self.backends.backends:
+            results[backend.name] = {}
+            for model in models:
+                start = time.perf_counter()
+                try:
+                    # An empty prompt makes Ollama load the model without generating anything
+                    response = requests.post(
+                        f"{backend.base_url}/api/generate",
+                        json={"model": model, "prompt": "", "keep_alive": self.keep_alive},
+                        headers=self.backends.headers,
+                        timeout=self.warmup_timeout,
+                    )
+                    response.raise_for_status()
+                    results[backend.name][model] = round(time.perf_counter() - start, 3)
+                    loaded[model] = True
+                except requests.RequestException as e:
+                    results[backend.name][model] = f"error: {e}"
+        missing = [m for m, ok in loaded.items() if not ok]
+        if missing:
+            raise RuntimeError(f"could not load {', '.join(missing)} on any backend: {results}")
+        return results
+
+    def university_context(self) -> Union[memoryview, bytes]:
+        """
+        scrape_results.json as the compact JSON block for the system prompt: a view straight
+        into the shared snapshot, so no worker keeps its own decoded copy between prompts.
+        Compact: indentation only costs prompt tokens.
+        """
+        try:
+            snap = self.context_snapshot.current()
+        except OSError as e:
+            print(f"[snapshot] falling back to {self.context_file}: {e}")
+            snap = None
+        if snap is not None and "context" in snap:
+            return snap.blob("context")
+        try:
+            return FastJson.dumpb(FastJson.load_file(self.context_file))
+        except FileNotFoundError:
+            return b"{}"
+
+    def campus_lookup(self, query: str) -> Optional[IndexMatch]:
+        """The campus index's match for `query` if it's sure enough to answer or to add as context."""
+        try:
+            match = self.campus.match(query)
+        except Exception as e:
+            # A bad index must never cost an answer; the model path still works
+            print(f"[campus] lookup failed: {type(e).__name__}: {e}")
+            return None
+        if match is None or match.confidence < self.campus_context_confidence:
+            return None
+        return match
+
+    def _campus_prompt(self, match: Optional[IndexMatch]) -> str:
+        if match is None or not match.records:
+            return ""
+        return f"\n\nExact records from the university's {match.kind} page that match this question (prefer these):\n{match.context()}"
+
+    def shared_context(self) -> str:
+        """
+        System prompt for non-streaming answers: the instructions plus the university data.
+        Built once per batch, so every question starts with the same prefix and the
+        model server can reuse its prompt cache. The context is decoded here, into a
+        string that lives only as long as the prompt does.
+        """
+        return f"""You are ArchieAI, an AI assistant for Arcadia University. You are here to help students, faculty, and staff with any questions they may have about the university.
 
 You are made by students for a final project. You must be factual and accurate based on the information provided.
-
-Respond based on your knowledge up to 2025.
+Markdown IS NOT SUPPORTED OR RENDERED in the final output. DO NOT RESPOND WITH MARKDOWN FORMATTING OR HYPERLINKS, however you can provide full URLs.
+The Time is {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
 Use the following university data to answer questions:
-{json.dumps(results, indent=2)}
+{str(self.university_context(), "utf-8")}
 
 If the university data doesn't contain the information needed, or if the query requires current/real-time information, you can use the search_web tool to find additional information."""
-        
-        messages.append({
-            'role': 'system',
-            'content': system_content
-        })
-        
-        # Add conversation history
+
+    async def Archie(
+        self,
+        query: str,
+        conversation_history: list = None,
+        session_key: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+    ) -> str:
+        """
+        Main async entry point for the Archie AI assistant: the whole answer as one string.
+        Uses scraped data from JSON file to provide context for answering queries.
+        Uses Ollama tool calling to enable web search when needed.
+        """
+        result = await self.answer(query, conversation_history, session_key=session_key, system_prompt=system_prompt)
+        return result["answer"]
+
+    async def answer(
+        self,
+        query: str,
+        conversation_history: list = None,
+        session_key: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Answer one question without streaming. Goes through the router and the
+        tool loop like Archie_streaming does.
+        Returns {"answer", "route", "model", "tools", "seconds"}.
+        """
+        start = time.perf_counter()
+        campus = self.campus_lookup(query)
+        if campus is not None and campus.confidence >= self.campus_answer_confidence:
+            metrics.incr("router_index")
+            return {
+                "answer": campus.answer,
+                "route": "index",
+                "model": "campus-index",
+                "tools": [],
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+
+        system_prompt = system_prompt or self.shared_context()
         if conversation_history:
-            for msg in conversation_history[-5:]:  # Last 5 messages for context
-                messages.append({
-                    'role': msg.get('role', 'user'),
-                    'content': msg.get('content', '')
-                })
-        
-        # Add current query
-        messages.append({
-            'role': 'user',
-            'content': query
-        })
-        
-        # Call with tools - run in executor since it's synchronous
+            # After the shared part, so the common prefix stays the same
+            history = "\n".join(
+                f"{msg.get('role', 'user').upper()}: {msg.get('content', '')}" for msg in conversation_history[-5:]
+            )
+            system_prompt += f"\n\nConversation History:\n{history}"
+        system_prompt += self._campus_prompt(campus)
+
+        decision = await self.router.route(query, conversation_history, classify=self._classify_complexity)
+        metrics.incr(f"router_{decision.route}")
+
+        answer, tools = "", []
+        async for chunk in self.async_WebSearch(
+            query,
+            system_prompt=system_prompt,
+            session_key=session_key,
+            model=decision.model,
+            think=decision.think,
+            use_tools=decision.use_tools,
+        ):
+            if isinstance(chunk, str):
+                answer += chunk
+            elif isinstance(chunk, dict) and chunk.get('tool_name'):
+                tools.append(chunk['tool_name'])
+        return {
+            "answer": answer,
+            "route": decision.route,
+            "model": decision.model,
+            "tools": tools,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
 
-    async def async_WebSearch(self, prompt: str, system_prompt: str = "", available_tools = {'web_search': web_search, 'web_fetch': web_fetch}) -> AsyncIterator[Any]:
+    async def answer_batch(
+        self,
+        questions: List[Any],
+        concurrency: Optional[int] = None,
+        system_prompt: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer many questions, yielding each result as soon as it finishes (not in input order).
+        `questions` are strings or {"id": ..., "question": ...} dicts. The shared context
+        is built once for the whole batch and at most `concurrency` questions run at a time.
+        Each result is {"index", "id", "question", ...answer() fields} or has an "error".
+
+        Usage:
+            async for result in ai.answer_batch(["When is fall break?", "Where is the library?"]):
+                print(result["index"], result["answer"])
+        """
+        shared = system_prompt or self.shared_context()
+        semaphore = asyncio.Semaphore(max(1, concurrency or self.batch_concurrency))
+
+        async def one(index: int, item: Any) -> Dict[str, Any]:
+            if isinstance(item, dict):
+                result = {"index": index, "id": item.get("id", index), "question": item.get("question", "")}
+            else:
+                result = {"index": index, "id": index, "question": item}
+            async with semaphore:
+                try:
+                    result.update(await self.answer(result["question"], system_prompt=shared))
+                    metrics.incr("batch_questions_answered")
+                except Exception as e:
+                    result["error"] = f"{type(e).__name__}: {e}"
+                    metrics.incr("batch_questions_failed")
+            return result
+
+        tasks = [asyncio.ensure_future(one(i, q)) for i, q in enumerate(questions)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # Caller stopped reading (client went away): don't keep generating for nobody
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def ask_many(self, questions: List[Any], concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Blocking answer_batch for scripts; results come back in input order."""
+        async def collect():
+            return [result async for result in self.answer_batch(questions, concurrency)]
+        return sorted(asyncio.run(collect()), key=lambda result: result["index"])
+
+    async def _classify_complexity(self, model: str, query: str) -> str:
+        """Ask a tiny model whether a question is SIMPLE or COMPLEX (used by the router)."""
+        response = await self._chat(
+            model=model,
+            messages=[
+                {'role': 'system', 'content': (
+                    "Classify the user's question for a university help assistant. Reply with exactly one word: "
+                    "SIMPLE if it is small talk or a short factual lookup, COMPLEX if it needs reasoning, "
+                    "several steps, or current information from the web."
+                )},
+                {'role': 'user', 'content': query},
+            ],
+            think=False,
+            options={'num_predict': 3, 'temperature': 0},
+            keep_alive=self.keep_alive,
+        )
+        return response.message.content or ""
+
+    async def async_WebSearch(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        available_tools = {'web_search': web_search, 'web_fetch': web_fetch},
+        session_key: Optional[str] = None,
+        model: Optional[str] = None,
+        think: bool = True,
+        use_tools: bool = True,
+    ) -> AsyncIterator[Any]:
         
             
         """
         Async generator that yields streamed content chunks as they arrive.
+        Requests go through the backend pool; `session_key` keeps a conversation
+        on the same inference host when possible. `model`, `think` and
+        `use_tools` default to the full OLLAMA_MODEL reasoning + tools path.
         Yields:
         - str: incremental content chunks from the assistant
         - dict: tool call results in the form {'tool_name': ..., 'tool_result': ...}
@@ -172,23 +615,21 @@ If the university data doesn't contain the information needed, or if the query r
         """
         OLLAMA_API_KEY = os.getenv('OLLAMA_API_KEY') or os.getenv('OLLAMA_TOKEN')
         if not OLLAMA_API_KEY:
-            print("Error: OLLAMA_API_KEY (or OLLAMA_TOKEN) not found in environment; add it to your .env or export it before running.")
-            sys.exit(1)
-        MODEL = os.getenv('OLLAMA_MODEL')
+            # Raised, not sys.exit(): this runs in server threads, where SystemExit would escape every handler
+            raise RuntimeError("OLLAMA_API_KEY (or OLLAMA_TOKEN) not found in environment; add it to your .env or export it before running.")
+        MODEL = model or os.getenv('OLLAMA_MODEL')
 
-        # Normalize to OLLAMA_API_KEY for the Ollama client if the token was provided under OLLAMA_TOKEN.
+        # The pool builds the client for each backend with the bearer header from _auth_headers().
         # This took me way too long to figure out Headers are of the devil and there is no documentation on this.
-        custom_headers = {
-            "Authorization": f"Bearer {OLLAMA_API_KEY}"
-        }
-        client = AsyncClient(headers=custom_headers)
         messages = [{'role': 'user', 'content': prompt}, {'role': 'system', 'content': system_prompt}]
         while True:
-            response_stream = await client.chat(
+            backend, response_stream, response_chunk = await self._open_chat_stream(
+                session_key,
                 model=MODEL,
                 messages=messages,
-                tools=[client.web_search, client.web_fetch],
-                think=True,
+                tools=[web_search, web_fetch] if use_tools else None,
+                think=think,
+                keep_alive=self.keep_alive,
                 stream=True
             )
 
@@ -199,21 +640,32 @@ If the university data doesn't contain the information needed, or if the query r
                 'tool_calls': None
             }
 
-            # Iterate asynchronously through streamed chunks and yield content as it arrives
-            async for response_chunk in response_stream:
-                chunk_message = response_chunk.message
-
-                if chunk_message.thinking:
-                    if not final_response_message['thinking']:
-                        final_response_message['thinking'] = chunk_message.thinking
-
-                if chunk_message.content:
-                    final_response_message['content'] += chunk_message.content
-                    # yield incremental content chunk
-                    yield chunk_message.content
-
-                if chunk_message.tool_calls:
-                    final_response_message['tool_calls'] = chunk_message.tool_calls
+            # Iterate asynchronously through streamed chunks and yield content as it arrives.
+            # If the caller closes or cancels us mid-stream, the finally closes the HTTP
+            # stream so the model server stops generating for nobody.
+            try:
+                while response_chunk is not None:
+                    chunk_message = response_chunk.message
+
+                    if chunk_message.thinking:
+                        if not final_response_message['thinking']:
+                            final_response_message['thinking'] = chunk_message.thinking
+
+                    if chunk_message.content:
+                        final_response_message['content'] += chunk_message.content
+                        # yield incremental content chunk
+                        yield chunk_message.content
+
+                    if chunk_message.tool_calls:
+                        final_response_message['tool_calls'] = chunk_message.tool_calls
+
+                    try:
+                        response_chunk = await response_stream.__anext__()
+                    except StopAsyncIteration:
+                        response_chunk = None
+            finally:
+                await response_stream.aclose()
+                self.backends.release(backend)
 
             # Add the assistant's final streamed message into the conversation history
             messages.append(final_response_message)
@@ -232,7 +684,9 @@ If the university data doesn't contain the information needed, or if the query r
                         if inspect.iscoroutinefunction(function_to_call):
                             result = await function_to_call(**args)
                         else:
-                            maybe_result = function_to_call(**args)
+                            # Run blocking tools off the event loop so a cancelled
+                            # generation doesn't have to wait for them to finish.
+                            maybe_result = await asyncio.to_thread(function_to_call, **args)
                             if inspect.isawaitable(maybe_result):
                                 result = await maybe_result
                             else:
@@ -260,11 +714,14 @@ If the university data doesn't contain the information needed, or if the query r
                 yield {'final': True, 'message': final_response_message}
                 break
     
-    async def Archie_streaming(self, query: str, conversation_history: list = None) -> AsyncIterator[str]:
+    async def Archie_streaming(self, query: str, conversation_history: list = None, session_key: Optional[str] = None) -> AsyncIterator[str]:
         """
         Streaming version of Archie that yields tokens as they are generated.
         Note: Tool calling with streaming is complex, so this version uses the standard approach.
         For full tool calling support, use the non-streaming Archie() method.
+
+        The first item is a {'route': ..., 'model': ...} dict saying which path
+        the router picked; everything after that comes from async_WebSearch.
         
         Usage:
             async for token in ai.Archie_streaming("When is fall break?"):
@@ -290,6 +747,33 @@ History:
 The Time is {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 """     
 
-        async for token in self.async_WebSearch(query, system_prompt=system_prompt):
+        # Calendar, dining and event lookups come straight out of the scraped index
+        campus = self.campus_lookup(query)
+        if campus is not None and campus.confidence >= self.campus_answer_confidence:
+            print(f"[router] route=index kind={campus.kind} confidence={campus.confidence:.2f}")
+            metrics.incr("router_index")
+            yield {'route': 'index', 'model': 'campus-index'}
+            yield campus.answer
+            return
+        system_prompt += self._campus_prompt(campus)
+
+        # Cheap questions skip the reasoning model and the tool round trips entirely
+        decision = await self.router.route(query, conversation_history, classify=self._classify_complexity)
+        print(f"[router] route={decision.route} model={decision.model} score={decision.score:.2f} "
+              f"threshold={self.router.threshold} reasons={','.join(decision.reasons) or '-'}")
+        metrics.incr(f"router_{decision.route}")
+        if decision.route == "fast":
+            # No tools on the fast route, so it can only answer from what's in the prompt
+            system_prompt += f"\n\nUse the following university data to answer questions:\n{str(self.university_context(), 'utf-8')}"
+        yield {'route': decision.route, 'model': decision.model}
+
+        async for token in self.async_WebSearch(
+            query,
+            system_prompt=system_prompt,
+            session_key=session_key,
+            model=decision.model,
+            think=decision.think,
+            use_tools=decision.use_tools,
+        ):
             yield token
     
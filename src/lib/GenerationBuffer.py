@@ -0,0 +1,187 @@
+"""
+Resumable generations for ArchieAI.
+Each answer runs independently of the HTTP connection that asked for it and
+writes numbered SSE events into a bounded ring buffer, so a client that drops
+off (phone switching networks etc.) can reconnect with Last-Event-ID and pick
+up where it left off instead of starting a new generation.
+
+Generations also track how many HTTP readers are attached. Once the last one
+goes away and nobody reconnects within a grace period, the producer is told
+to cancel so the model stops working on an unread answer. The grace period
+has to outlast a few of the chat page's resume retries; a closed tab sends an
+explicit cancel instead of waiting it out.
+"""
+import os
+import time
+import secrets
+import threading
+from collections import deque
+from typing import Optional, Dict, Any, List, Tuple
+
+# Longer than the client's first resume retries (0.5s + 1s + 2s + 4s backoff), see static/js/index.js
+DETACH_GRACE_SECONDS = 10.0
+
+
+class Generation:
+    """A single in-flight (or recently finished) answer and its event ring."""
+
+    def __init__(
+        self,
+        generation_id: str,
+        session_id: Optional[str],
+        question: str,
+        max_events: int = 512,
+        detach_grace_seconds: float = DETACH_GRACE_SECONDS,
+    ):
+        self.generation_id = generation_id
+        self.session_id = session_id
+        self.question = question
+        self.created_at = time.time()
+        self.finished_at = None
+        self.done = False
+        self.cancelled = False
+        # Full answer text so far, used to resync readers that fell out of the ring
+        self.text = ""
+        self._events = deque(maxlen=max_events)
+        self._last_seq = 0
+        self._cond = threading.Condition()
+        # Reader bookkeeping for disconnect detection
+        self.detach_grace_seconds = detach_grace_seconds
+        self._readers = 0
+        self._detached_at = None
+        self._cancel_requested = threading.Event()
+
+    @property
+    def last_event_id(self) -> int:
+        return self._last_seq
+
+    def append(self, payload: Dict[str, Any]) -> int:
+        """Add an event payload to the ring and wake up any readers."""
+        with self._cond:
+            self._last_seq += 1
+            if payload.get('token'):
+                self.text += payload['token']
+            self._events.append((self._last_seq, payload))
+            self._cond.notify_all()
+            return self._last_seq
+
+    def attach(self):
+        """Register an HTTP reader streaming this generation."""
+        with self._cond:
+            self._readers += 1
+            self._detached_at = None
+
+    def detach(self):
+        """Unregister a reader; starts the grace timer when the last one leaves."""
+        with self._cond:
+            self._readers = max(0, self._readers - 1)
+            if self._readers == 0 and not self.done:
+                self._detached_at = time.monotonic()
+
+    def cancel(self):
+        """Ask the producer to stop as soon as possible."""
+        self._cancel_requested.set()
+
+    def should_cancel(self) -> bool:
+        """True if cancellation was requested or every reader left and none came back."""
+        if self._cancel_requested.is_set():
+            return True
+        with self._cond:
+            if self._readers or self._detached_at is None:
+                return False
+            return time.monotonic() - self._detached_at >= self.detach_grace_seconds
+
+    def finish(self, cancelled: bool = False):
+        """Mark the generation finished; readers drain the ring and stop."""
+        with self._cond:
+            self.done = True
+            self.cancelled = cancelled
+            self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def read(self, last_event_id: int, timeout: float = 15.0) -> Tuple[List[Tuple[int, Dict[str, Any]]], bool]:
+        """
+        Return (events after last_event_id, done), waiting up to `timeout`
+        seconds for something new.
+
+        If the reader is so far behind that the events it needs were already
+        evicted, a single synthetic {'snapshot': text} event is returned
+        carrying the whole answer so far, numbered with the current head.
+        """
+        with self._cond:
+            if last_event_id >= self._last_seq and not self.done:
+                self._cond.wait(timeout)
+
+            oldest = self._events[0][0] if self._events else self._last_seq + 1
+            if last_event_id + 1 < oldest:
+                snapshot = {'snapshot': self.text}
+                if self.done:
+                    # The done event may have been folded into the snapshot, so carry it along
+                    snapshot['done'] = True
+                return [(self._last_seq, snapshot)], self.done
+
+            events = [(seq, payload) for seq, payload in self._events if seq > last_event_id]
+            return events, self.done
+
+
+class GenerationRegistry:
+    """Keeps generations addressable by ID until their TTL runs out."""
+
+    def __init__(self, max_events: int = 512, ttl_seconds: float = 300.0, detach_grace_seconds: float = DETACH_GRACE_SECONDS):
+        self.max_events = max_events
+        self.ttl_seconds = ttl_seconds
+        self.detach_grace_seconds = detach_grace_seconds
+        self._generations: Dict[str, Generation] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "GenerationRegistry":
+        """Build a registry from GENERATION_BUFFER_EVENTS / GENERATION_TTL_SECONDS / GENERATION_DETACH_GRACE_SECONDS."""
+        return cls(
+            max_events=int(os.getenv("GENERATION_BUFFER_EVENTS", "512")),
+            ttl_seconds=float(os.getenv("GENERATION_TTL_SECONDS", "300")),
+            detach_grace_seconds=float(os.getenv("GENERATION_DETACH_GRACE_SECONDS", str(DETACH_GRACE_SECONDS))),
+        )
+
+    def _expire(self):
+        """Drop finished generations older than the TTL. Caller holds the lock."""
+        now = time.time()
+        expired = [
+            gid for gid, gen in self._generations.items()
+            if gen.done and now - gen.finished_at > self.ttl_seconds
+        ]
+        for gid in expired:
+            del self._generations[gid]
+
+    def create(self, session_id: Optional[str], question: str) -> Generation:
+        """Register a new generation with a fresh unguessable ID."""
+        with self._lock:
+            self._expire()
+            generation = Generation(
+                secrets.token_urlsafe(16),
+                session_id,
+                question,
+                max_events=self.max_events,
+                detach_grace_seconds=self.detach_grace_seconds,
+            )
+            self._generations[generation.generation_id] = generation
+            return generation
+
+    def get(self, generation_id: str) -> Optional[Generation]:
+        with self._lock:
+            self._expire()
+            return self._generations.get(generation_id)
+
+    def find_active(self, session_id: Optional[str], question: str) -> Optional[Generation]:
+        """
+        Find a still-running generation for the same session and question.
+        Lets a client that re-asks after a dropped connection reattach to the
+        answer that is already being produced instead of paying for it twice.
+        """
+        if not session_id:
+            return None
+        with self._lock:
+            for gen in self._generations.values():
+                if not gen.done and gen.session_id == session_id and gen.question == question:
+                    return gen
+        return None
@@ -0,0 +1,46 @@
+"""
+In-process metrics for ArchieAI.
+Simple thread-safe counters and gauges that the app exposes as JSON.
+"""
+import threading
+from typing import Dict, Optional
+
+
+class Metrics:
+    """Thread-safe counters and gauges keyed by name."""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: float = 1):
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float):
+        """Set a gauge to an absolute value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name: str) -> Optional[float]:
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name]
+            return self._gauges.get(name)
+
+    def ratio(self, numerator: str, denominator: str) -> float:
+        """Counter ratio, 0.0 when the denominator hasn't been incremented yet."""
+        with self._lock:
+            total = self._counters.get(denominator, 0)
+            return self._counters.get(numerator, 0) / total if total else 0.0
+
+    def snapshot(self) -> Dict:
+        """Copy of all counters and gauges, safe to serialize."""
+        with self._lock:
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+
+# Shared registry for the whole process
+metrics = Metrics()
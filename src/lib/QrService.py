@@ -0,0 +1,257 @@
+"""
+QR code rendering service for ArchieAI.
+Wraps qrCodeGen with a content-addressed cache: the same text and options
+always give the same key, so a rendered PNG/SVG is kept in memory (LRU by
+bytes) and on disk, and a poster set that didn't change is never re-rendered.
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from lib.Metrics import metrics
+
+# Bump when the rendering changes so old cache entries stop matching
+RENDER_VERSION = 1
+FORMATS = ("png", "svg")
+MIMETYPES = {"png": "image/png", "svg": "image/svg+xml"}
+# Byte-mode capacity of the largest QR version at error correction M
+MAX_TEXT_BYTES = 2331
+# Color names or #rgb / #rrggbb; these end up in SVG attributes
+_COLOR = re.compile(r"^(#[0-9a-fA-F]{3}|#[0-9a-fA-F]{6}|[a-zA-Z]{1,20})$")
+
+
+def normalize_options(
+    text: str,
+    fmt: str = "png",
+    box_size: int = 10,
+    border: int = 4,
+    fill_color: str = "black",
+    back_color: str = "white",
+    mode: Optional[str] = None,
+) -> Dict:
+    """Validated render options (ValueError on anything out of range)."""
+    if not isinstance(text, str) or text == "":
+        raise ValueError("text must be a non-empty string")
+    if len(text.encode("utf-8")) > MAX_TEXT_BYTES:
+        raise ValueError(f"text is longer than {MAX_TEXT_BYTES} bytes")
+    fmt = (fmt or "png").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    box_size, border = int(box_size), int(border)
+    if not 1 <= box_size <= 40:
+        raise ValueError("box_size must be between 1 and 40")
+    if not 0 <= border <= 20:
+        raise ValueError("border must be between 0 and 20")
+    for color in (fill_color, back_color):
+        if not _COLOR.match(color or ""):
+            raise ValueError(f"invalid color: {color!r}")
+    if mode not in (None, "", "1", "L", "RGB", "RGBA"):
+        raise ValueError("mode must be one of 1, L, RGB, RGBA")
+    if fmt == "svg":
+        # Not an image mode; keep it out of the key so it can't split the cache
+        mode = None
+    return {
+        "text": text,
+        "fmt": fmt,
+        "box_size": box_size,
+        "border": border,
+        "fill_color": fill_color.lower(),
+        "back_color": back_color.lower(),
+        "mode": mode or None,
+    }
+
+
+def cache_key(options: Dict) -> str:
+    """Content address for a set of normalized options."""
+    payload = json.dumps([RENDER_VERSION, options], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render(options: Dict) -> bytes:
+    """Render normalized options (top-level so it can run in a process pool)."""
+    from lib.qrCodeGen import render_qr_bytes
+    return render_qr_bytes(**options)
+
+
+class QrService:
+    """
+    Rendered QR codes, cached in memory and under `cache_dir/<key[:2]>/<key>.<fmt>`.
+
+    Disk entries are written with an atomic rename, so several processes (gunicorn
+    workers, the batch CLI's pool) can share one cache directory. When the disk
+    cache grows past `disk_max_bytes` the least recently used files are removed.
+
+    Usage:
+      qr = QrService.from_env()
+      png = qr.get("https://...", box_size=8)
+      svg = qr.get("https://...", fmt="svg")
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        memory_max_bytes: int = 32 * 1024 * 1024,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+        runner: Optional[Callable] = None,
+    ):
+        self.cache_dir = cache_dir
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        # How misses are rendered: runner(render, options); e.g. cpu_executor.run
+        self.runner = runner
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self._disk_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, runner: Optional[Callable] = None) -> "QrService":
+        return cls(
+            cache_dir=os.getenv("QR_CACHE_DIR", os.path.join("data", "qr_cache")),
+            memory_max_bytes=int(os.getenv("QR_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024))),
+            disk_max_bytes=int(os.getenv("QR_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024))),
+            runner=runner,
+        )
+
+    def disk_path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{fmt}")
+
+    def get(self, text: str, **options) -> bytes:
+        """Encoded QR code for `text` (see normalize_options for the options)."""
+        return self.get_normalized(normalize_options(text, **options))[1]
+
+    def get_normalized(self, options: Dict):
+        """(key, bytes) for already-normalized options."""
+        key = cache_key(options)
+        data = self._memory_get(key)
+        if data is not None:
+            metrics.incr("qr_cache_hits_memory")
+            return key, data
+
+        data = self.read_disk(key, options["fmt"])
+        if data is not None:
+            metrics.incr("qr_cache_hits_disk")
+        else:
+            metrics.incr("qr_renders")
+            data = self.runner(render, options) if self.runner else render(options)
+            self.write_disk(key, options["fmt"], data)
+        self._memory_put(key, data)
+        return key, data
+
+    def is_cached(self, key: str, fmt: str) -> bool:
+        """True if get_normalized() would answer without rendering."""
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self.disk_path(key, fmt))
+
+    # ---- memory tier ----
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            return data
+
+    def _memory_put(self, key: str, data: bytes):
+        if len(data) > self.memory_max_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.memory_max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    # ---- disk tier ----
+
+    def read_disk(self, key: str, fmt: str) -> Optional[bytes]:
+        path = self.disk_path(key, fmt)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # mtime doubles as "last used" for the LRU prune
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def write_disk(self, key: str, fmt: str, data: bytes):
+        path = self.disk_path(key, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += len(data)
+            over = self._disk_bytes > self.disk_max_bytes
+        if over:
+            self.prune_disk()
+
+    def _scan_disk_bytes(self) -> int:
+        total = 0
+        for entry in self._iter_disk():
+            total += entry[2]
+        return total
+
+    def _iter_disk(self):
+        """(mtime, path, size) for every cached file."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, entry.path, stat.st_size
+
+    def prune_disk(self, target_ratio: float = 0.8) -> int:
+        """Drop least recently used files until the cache is under target_ratio of its cap."""
+        with self._disk_lock:
+            entries = sorted(self._iter_disk())
+            total = sum(size for _, _, size in entries)
+            target = self.disk_max_bytes * target_ratio
+            removed = 0
+            for _, path, size in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._disk_bytes = total
+        metrics.incr("qr_cache_evictions", removed)
+        return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            memory = {"entries": len(self._memory), "bytes": self._memory_bytes}
+        return {
+            "memory": memory,
+            "disk_bytes": self._disk_bytes,
+            "hits_memory": metrics.get("qr_cache_hits_memory") or 0,
+            "hits_disk": metrics.get("qr_cache_hits_disk") or 0,
+            "renders": metrics.get("qr_renders") or 0,
+        }
@@ -0,0 +1,155 @@
+"""
+Complexity-based model routing for ArchieAI.
+Decides whether a question can be answered by a small fast model with no
+reasoning and no tools, or needs the full tool-calling reasoning path.
+"""
+import os
+import re
+import asyncio
+from dataclasses import dataclass, field
+from typing import Optional, List, Tuple, Callable, Awaitable
+
+
+# Messages that never need the big model
+SMALL_TALK = re.compile(
+    r"^\s*(hi|hey|hello|yo|sup|thanks|thank you|thx|ok|okay|cool|bye|goodbye|good (morning|afternoon|evening|night))"
+    r"[\s!.?,]*(archie)?[\s!.?]*$",
+    re.IGNORECASE,
+)
+
+# Questions about things that change (need web tools for a fresh answer)
+FRESHNESS_WORDS = re.compile(
+    r"\b(today|tonight|tomorrow|now|currently|current|latest|recent|news|weather|this (week|weekend|month)|"
+    r"open right now|score|search|look up|google)\b",
+    re.IGNORECASE,
+)
+
+# Questions that need multi-step reasoning
+REASONING_WORDS = re.compile(
+    r"\b(why|explain|compare|difference|versus|vs\.?|pros and cons|how (do|does|can|should) (i|we|you)|"
+    r"steps?|plan|schedule|calculate|estimate|recommend|should i|write|essay|summari[sz]e|code|debug)\b",
+    re.IGNORECASE,
+)
+
+URL_PATTERN = re.compile(r"https?://|www\.", re.IGNORECASE)
+
+
+@dataclass
+class RouteDecision:
+    """Which path a question takes and why."""
+    route: str  # "fast" or "full"
+    model: str
+    score: float
+    think: bool
+    use_tools: bool
+    reasons: List[str] = field(default_factory=list)
+
+
+class QueryRouter:
+    """
+    Scores a question's complexity with cheap heuristics (and optionally a tiny
+    classifier model for the ambiguous middle band) and picks a route.
+
+    Scores run from 0.0 (trivial) to 1.0 (hard). Anything below `threshold`
+    goes to `fast_model`; the rest takes the full reasoning + tools path.
+    Routing is off entirely when no fast model is configured.
+    """
+
+    def __init__(
+        self,
+        full_model: Optional[str],
+        fast_model: Optional[str] = None,
+        threshold: float = 0.5,
+        classifier_model: Optional[str] = None,
+        classifier_timeout: float = 1.0,
+        ambiguous_band: float = 0.15,
+    ):
+        self.full_model = full_model
+        self.fast_model = fast_model
+        self.threshold = threshold
+        self.classifier_model = classifier_model
+        self.classifier_timeout = classifier_timeout
+        self.ambiguous_band = ambiguous_band
+
+    @classmethod
+    def from_env(cls) -> "QueryRouter":
+        """Build a router from FAST_MODEL / ROUTER_* environment variables."""
+        return cls(
+            full_model=os.getenv("OLLAMA_MODEL"),
+            fast_model=os.getenv("FAST_MODEL") or None,
+            threshold=float(os.getenv("ROUTER_THRESHOLD", "0.5")),
+            classifier_model=os.getenv("ROUTER_CLASSIFIER_MODEL") or None,
+            classifier_timeout=float(os.getenv("ROUTER_CLASSIFIER_TIMEOUT_SECONDS", "1.0")),
+            ambiguous_band=float(os.getenv("ROUTER_AMBIGUOUS_BAND", "0.15")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.fast_model)
+
+    def score(self, query: str, conversation_history: list = None) -> Tuple[float, List[str]]:
+        """Heuristic complexity score and the reasons that contributed to it."""
+        text = query.strip()
+        if SMALL_TALK.match(text):
+            return 0.0, ["small_talk"]
+
+        score = 0.1
+        reasons = []
+        words = len(text.split())
+        if words > 25:
+            score += 0.3
+            reasons.append("long")
+        elif words > 12:
+            score += 0.15
+            reasons.append("medium_length")
+        if FRESHNESS_WORDS.search(text):
+            score += 0.5
+            reasons.append("needs_fresh_info")
+        if REASONING_WORDS.search(text):
+            score += 0.4
+            reasons.append("reasoning")
+        if URL_PATTERN.search(text):
+            score += 0.5
+            reasons.append("url")
+        if text.count("?") > 1:
+            score += 0.2
+            reasons.append("multiple_questions")
+        if conversation_history and words <= 6 and re.search(r"\b(it|that|this|those|them|more)\b", text, re.IGNORECASE):
+            # Short follow-ups lean on the conversation so far
+            score += 0.2
+            reasons.append("follow_up")
+        return min(score, 1.0), reasons
+
+    async def route(
+        self,
+        query: str,
+        conversation_history: list = None,
+        classify: Optional[Callable[[str, str], Awaitable[str]]] = None,
+    ) -> RouteDecision:
+        """
+        Pick a route for `query`. `classify(model, query)` is used for scores in
+        the ambiguous band when a classifier model is configured; it should
+        return the model's raw reply ("SIMPLE" or "COMPLEX").
+        """
+        if not self.enabled:
+            return RouteDecision("full", self.full_model, 1.0, True, True, ["router_disabled"])
+
+        score, reasons = self.score(query, conversation_history)
+
+        if classify and self.classifier_model and abs(score - self.threshold) <= self.ambiguous_band:
+            try:
+                verdict = await asyncio.wait_for(classify(self.classifier_model, query), timeout=self.classifier_timeout)
+                verdict = (verdict or "").strip().upper()
+                if verdict.startswith("SIMPLE"):
+                    score = min(score, self.threshold - 0.01)
+                    reasons.append("classifier_simple")
+                elif verdict.startswith("COMPLEX"):
+                    score = max(score, self.threshold)
+                    reasons.append("classifier_complex")
+            except Exception as e:
+                # A slow or broken classifier must never hold up the answer; keep the heuristic score
+                reasons.append(f"classifier_error:{type(e).__name__}")
+
+        if score < self.threshold:
+            return RouteDecision("fast", self.fast_model, score, False, False, reasons)
+        return RouteDecision("full", self.full_model, score, True, True, reasons)
@@ -0,0 +1,330 @@
+"""
+Token-bucket rate limiting for ArchieAI.
+Each budget (generations, logins, session lists, ...) has its own buckets per
+user email, IP and session. A request has to find a token in every bucket it
+maps to, so one noisy script can't eat the model or the password-hashing CPU
+that everyone else is waiting on.
+
+Checks are O(1): a dict lookup per key in memory, or a short probe of a
+fixed-size hash table in a shared mmap'd file when several worker processes
+should enforce one limit together.
+
+Budgets are written as "kind=requests/seconds" pairs, e.g.
+    RATE_LIMIT_GENERATE="user=20/60,session=20/60,ip=120/60"
+allows bursts of 20 per user that refill at 20 a minute. An empty budget
+disables it.
+
+IP buckets only make sense when the address is the client's. Behind ngrok or
+nginx without TRUSTED_PROXY_HOPS every request comes from the proxy, so
+requests from loopback and PROXY_ADDRESSES skip their IP bucket rather than
+sharing one bucket for the whole campus.
+"""
+import os
+import math
+import mmap
+import time
+import struct
+import hashlib
+import ipaddress
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from lib.Metrics import metrics
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no flock, the shared table is only safe with one worker
+    fcntl = None
+
+
+# (capacity, tokens refilled per second)
+Limit = Tuple[float, float]
+
+DEFAULT_BUDGETS = {
+    "generate": "user=20/60,session=20/60,ip=120/60",
+    "login": "user=10/300,ip=30/300",
+    "sessions": "user=60/60,ip=300/60",
+    # Only QR cache misses are charged; "site" caps renders for everyone together
+    "qr": "user=30/60,session=30/60,ip=30/60,site=600/60",
+}
+
+
+def parse_budget(spec: str) -> Dict[str, Limit]:
+    """'user=20/60,ip=120/60' -> {'user': (20.0, 0.333), 'ip': (120.0, 2.0)}"""
+    limits = {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            kind, rule = part.split("=", 1)
+            count, seconds = rule.split("/", 1)
+            count, seconds = float(count), float(seconds)
+        except ValueError:
+            raise ValueError(f"Bad rate limit {part!r}, expected kind=requests/seconds")
+        if count <= 0 or seconds <= 0:
+            raise ValueError(f"Bad rate limit {part!r}, requests and seconds must be positive")
+        limits[kind.strip()] = (count, count / seconds)
+    return limits
+
+
+def _refill(tokens: float, last: float, limit: Limit, now: float) -> float:
+    capacity, rate = limit
+    return min(capacity, tokens + max(0.0, now - last) * rate)
+
+
+class MemoryBuckets:
+    """
+    Buckets for one process, in an OrderedDict kept in last-use order.
+    A bucket that has refilled to capacity is indistinguishable from a new
+    one, so those are dropped from the old end as we go; max_keys caps the
+    rest (evicting a half-empty bucket only ever lets someone through early).
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> [tokens, last update, time it's full again]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, keys: List[str], limits: List[Limit], cost: float = 1.0) -> float:
+        """Take `cost` from every bucket, or from none. Returns 0 if allowed, else seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            for key, limit in zip(keys, limits):
+                entry = self._buckets.get(key)
+                levels.append(limit[0] if entry is None else _refill(entry[0], entry[1], limit, now))
+            wait = max((cost - level) / limit[1] for level, limit in zip(levels, limits))
+            if wait > 0:
+                return wait
+
+            for key, limit, level in zip(keys, limits, levels):
+                tokens = level - cost
+                self._buckets[key] = [tokens, now, now + (limit[0] - tokens) / limit[1]]
+                self._buckets.move_to_end(key)
+            self._evict(now)
+            return 0.0
+
+    def _evict(self, now: float):
+        """Caller holds the lock."""
+        buckets = self._buckets
+        while buckets:
+            key, entry = next(iter(buckets.items()))
+            if entry[2] > now and len(buckets) <= self.max_keys:
+                break
+            del buckets[key]
+            if entry[2] > now:
+                metrics.incr("rate_limit_evictions")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class SharedBuckets:
+    """
+    Buckets in a fixed-size open-addressing hash table inside an mmap'd file,
+    so every worker on the host sees the same counts. Updates happen under
+    flock. A key probes at most PROBE slots; if none is free it takes the one
+    that refills soonest, so the file never grows.
+
+    Slot layout: key hash (u64, 0 = empty), tokens, last update, full-again time.
+    """
+
+    backend = "shared"
+    MAGIC = b"ARLB"
+    HEADER = struct.Struct("<4sIQ")
+    SLOT = struct.Struct("<Qddd")
+    PROBE = 8
+
+    def __init__(self, path: str, slots: int = 65_536):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock = threading.Lock()
+        with self._locked():
+            header = os.pread(self._fd, self.HEADER.size, 0)
+            if len(header) == self.HEADER.size and header[:4] == self.MAGIC:
+                # Another worker created it; its slot count wins
+                slots = self.HEADER.unpack(header)[2]
+            else:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self.HEADER.size + slots * self.SLOT.size)
+                os.pwrite(self._fd, self.HEADER.pack(self.MAGIC, 1, slots), 0)
+        self.slots = slots
+        self._map = mmap.mmap(self._fd, self.HEADER.size + slots * self.SLOT.size)
+
+    def _locked(self):
+        return _FlockGuard(self._fd, self._lock)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+    def _offset(self, slot: int) -> int:
+        return self.HEADER.size + slot * self.SLOT.size
+
+    def _find(self, h: int, now: float, claimed) -> Tuple[int, Optional[Tuple]]:
+        """Slot holding `h`, or the best one to reuse (empty, refilled, else soonest full)."""
+        start = h % self.slots
+        spare, spare_full_at = None, None
+        for i in range(self.PROBE):
+            slot = (start + i) % self.slots
+            entry = self.SLOT.unpack_from(self._map, self._offset(slot))
+            if entry[0] == h:
+                return slot, entry
+            if slot in claimed:
+                continue  # another key of this same request is moving in
+            full_at = -1.0 if entry[0] == 0 else entry[3]
+            if spare is None or full_at < spare_full_at:
+                spare, spare_full_at = slot, full_at
+        if spare_full_at is not None and spare_full_at > now:
+            metrics.incr("rate_limit_evictions")
+        return spare, None
+
+    def take(self, keys: List[str], limits: List[Limit], cost: float = 1.0) -> float:
+        now = time.time()  # shared between processes, so wall clock
+        with self._locked():
+            found = []
+            for key, limit in zip(keys, limits):
+                slot, entry = self._find(self._hash(key), now, {s for s, _ in found})
+                level = limit[0] if entry is None else _refill(entry[1], entry[2], limit, now)
+                found.append((slot, level))
+            wait = max((cost - level) / limit[1] for (_, level), limit in zip(found, limits))
+            if wait > 0:
+                return wait
+
+            for key, limit, (slot, level) in zip(keys, limits, found):
+                tokens = level - cost
+                self.SLOT.pack_into(self._map, self._offset(slot), self._hash(key), tokens, now, now + (limit[0] - tokens) / limit[1])
+            return 0.0
+
+    def __len__(self):
+        with self._locked():
+            return sum(
+                1 for slot in range(self.slots)
+                if self.SLOT.unpack_from(self._map, self._offset(slot))[0]
+            )
+
+
+class _FlockGuard:
+    """Thread lock + exclusive flock on an already-open fd."""
+
+    def __init__(self, fd: int, lock: threading.Lock):
+        self.fd = fd
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
+
+
+class RateLimiter:
+    """
+    Named budgets over one bucket store.
+
+    Usage:
+      limiter = RateLimiter.from_env()
+      wait = limiter.check("generate", user=email, ip=ip, session=session_id)
+      if wait:
+          ...  # 429 with Retry-After: ceil(wait)
+    """
+
+    def __init__(self, budgets: Dict[str, Dict[str, Limit]], store=None, trusted_proxy_hops: int = 0, proxy_networks=()):
+        self.budgets = {name: limits for name, limits in budgets.items() if limits}
+        self.store = store if store is not None else MemoryBuckets()
+        self.trusted_proxy_hops = trusted_proxy_hops
+        self.proxy_networks = list(proxy_networks)
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """
+        Budgets from RATE_LIMIT_<NAME>; RATE_LIMIT_SHARED_FILE shares them between
+        workers. TRUSTED_PROXY_HOPS and PROXY_ADDRESSES decide which peer
+        addresses are real clients (see ip_key).
+        """
+        budgets = {
+            name: parse_budget(os.getenv(f"RATE_LIMIT_{name.upper()}", default))
+            for name, default in DEFAULT_BUDGETS.items()
+        }
+        shared_file = os.getenv("RATE_LIMIT_SHARED_FILE", "")
+        if shared_file:
+            store = SharedBuckets(shared_file, slots=int(os.getenv("RATE_LIMIT_SHARED_SLOTS", "65536")))
+        else:
+            store = MemoryBuckets(max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+        proxies = [ipaddress.ip_network(p.strip(), strict=False) for p in os.getenv("PROXY_ADDRESSES", "").split(",") if p.strip()]
+        limiter = cls(budgets, store, trusted_proxy_hops=int(os.getenv("TRUSTED_PROXY_HOPS", "0")), proxy_networks=proxies)
+        if not limiter.trusted_proxy_hops and any("ip" in limits for limits in limiter.budgets.values()):
+            print("Warning: TRUSTED_PROXY_HOPS is not set, so requests from loopback or PROXY_ADDRESSES "
+                  "skip the per-IP rate limits. Set it behind ngrok/nginx so each client gets its own IP bucket.")
+        return limiter
+
+    def ip_key(self, remote_addr: Optional[str]) -> Optional[str]:
+        """
+        The address to bucket a request by, or None when it's a proxy's (all
+        clients would share the bucket). With TRUSTED_PROXY_HOPS set,
+        remote_addr has already been replaced by the client's address.
+        """
+        if not remote_addr or self.trusted_proxy_hops:
+            return remote_addr
+        try:
+            address = ipaddress.ip_address(remote_addr)
+        except ValueError:
+            return remote_addr
+        if address.is_loopback or any(address in network for network in self.proxy_networks):
+            return None
+        return remote_addr
+
+    def check(self, budget: str, cost: float = 1.0, **keys: Optional[str]) -> float:
+        """
+        Spend `cost` from the budget's bucket for each given key (user=, ip=,
+        session=). Missing keys and kinds the budget doesn't limit are skipped.
+        Returns 0 when allowed, otherwise seconds until it would be.
+        """
+        limits = self.budgets.get(budget)
+        if not limits:
+            return 0.0
+        names, applied = [], []
+        for kind, value in keys.items():
+            if value and kind in limits:
+                names.append(f"{budget}:{kind}:{value}")
+                applied.append(limits[kind])
+        if not names:
+            return 0.0
+        wait = self.store.take(names, applied, cost)
+        if wait:
+            metrics.incr(f"rate_limited_{budget}")
+        return wait
+
+    def capacity(self, budget: str, **keys: Optional[str]) -> Optional[float]:
+        """The most check() could ever allow at once for these keys (the smallest burst); None if unlimited."""
+        limits = self.budgets.get(budget) or {}
+        bursts = [limits[kind][0] for kind, value in keys.items() if value and kind in limits]
+        return min(bursts) if bursts else None
+
+    @staticmethod
+    def retry_after(wait: float) -> int:
+        """Whole seconds for a Retry-After header."""
+        return max(1, math.ceil(wait))
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.store.backend,
+            "keys": len(self.store),
+            "budgets": {
+                name: {kind: {"burst": cap, "per_minute": round(rate * 60, 3)} for kind, (cap, rate) in limits.items()}
+                for name, limits in self.budgets.items()
+            },
+            "limited": {name: metrics.get(f"rate_limited_{name}") or 0 for name in self.budgets},
+        }
@@ -0,0 +1,358 @@
+"""
+Rolling, compressed segment log for ArchieAI analytics.
+Interactions are appended as JSON lines to an active segment that rotates by
+size or by day. Closed segments are gzipped in the background, and a small
+time index lets readers open only the segments that overlap a date range.
+Old segments are dropped or archived according to a retention policy.
+
+Layout:
+    data/analytics/
+        index.json
+        segment-20251019-081500-0001.jsonl       (active)
+        segment-20251018-000000-0007.jsonl.gz    (closed + compressed)
+        archive/                                 (retention_action="archive")
+"""
+import os
+import re
+import gzip
+import json
+import shutil
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Iterator
+from lib.FileStore import file_lock, atomic_write_json, file_signature
+from lib import FastJson
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 20) -> Iterator[Dict]:
+    """
+    Stream the objects of a top-level JSON array without loading the whole
+    file, so reading a semester of the legacy analytics.json doesn't need gigabytes.
+    """
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r"[\s,]*")
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(chunk_size)
+        pos = whitespace.match(buffer).end()
+        if pos >= len(buffer):
+            return
+        if buffer[pos] != "[":
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos += 1
+        eof = False
+        while True:
+            pos = whitespace.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError("need more data", buffer, pos)
+                obj, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    if pos >= len(buffer):
+                        return
+                    raise
+                # Object straddles the chunk boundary; drop what we've consumed and read more
+                data = f.read(chunk_size)
+                eof = not data
+                buffer = buffer[pos:] + data
+                pos = 0
+                continue
+            yield obj
+
+
+class SegmentLog:
+    """
+    Append-only JSON-lines log split into rotating segments.
+    Appends, rotation and index updates happen under a file lock, and the
+    index is re-read when another process changes it, so every worker can
+    log to the same directory.
+
+    Usage:
+      log = SegmentLog("data/analytics", max_bytes=16 * 1024 * 1024, retention_days=365)
+      log.append({"timestamp": datetime.now().isoformat(), ...})
+      for record in log.iter_records(start="2025-10-01", end="2025-10-07"):
+          ...
+    """
+
+    def __init__(
+        self,
+        log_dir: str,
+        max_bytes: int = 16 * 1024 * 1024,
+        retention_days: int = 0,
+        retention_action: str = "archive",
+        time_key: str = "timestamp",
+    ):
+        if retention_action not in ("archive", "delete"):
+            raise ValueError("retention_action must be 'archive' or 'delete'")
+        self.log_dir = log_dir
+        self.archive_dir = os.path.join(log_dir, "archive")
+        self.index_file = os.path.join(log_dir, "index.json")
+        self.lock_file = os.path.join(log_dir, "index.lock")
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days  # 0 keeps everything
+        self.retention_action = retention_action
+        self.time_key = time_key
+        self._lock = threading.Lock()
+        self._compressor = None
+        self._compress_lock = threading.Lock()
+        self._compress_again = False
+
+        self._index_signature = None
+        os.makedirs(self.log_dir, exist_ok=True)
+        with file_lock(self.lock_file):
+            self._index = self._load_index()
+            self._active = next((s for s in self._index["segments"] if s["state"] == "active"), None)
+            if self._active is not None:
+                self._refresh_active_stats()
+                self._save_index()
+
+    # ---- index ----------------------------------------------------------
+
+    def _load_index(self) -> Dict:
+        self._index_signature = file_signature(self.index_file)
+        try:
+            return FastJson.load_file(self.index_file)
+        except (FileNotFoundError, FastJson.JSONDecodeError):
+            return {"next_id": 1, "segments": []}
+
+    def _save_index(self):
+        atomic_write_json(self.index_file, self._index)
+        self._index_signature = file_signature(self.index_file)
+
+    def _reload_if_changed(self):
+        """Pick up rotations/compressions done by other processes. Caller holds self._lock."""
+        if file_signature(self.index_file) != self._index_signature:
+            self._index = self._load_index()
+            self._active = next((s for s in self._index["segments"] if s["state"] == "active"), None)
+
+    def _refresh_active_stats(self):
+        """The index only tracks the active segment loosely; recount it after a restart."""
+        path = self._path(self._active)
+        count, last_ts = 0, self._active["last_ts"]
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        count += 1
+                        ts = FastJson.loads(line).get(self.time_key)
+                        if ts and (last_ts is None or ts > last_ts):
+                            last_ts = ts
+        self._active.update(count=count, last_ts=last_ts, bytes=os.path.getsize(path) if os.path.exists(path) else 0)
+
+    def segments(self) -> List[Dict]:
+        """Copy of the segment index (oldest first)."""
+        with self._lock:
+            self._reload_if_changed()
+            return [dict(s) for s in self._index["segments"]]
+
+    def _path(self, segment: Dict) -> str:
+        base = self.archive_dir if segment["state"] == "archived" else self.log_dir
+        return os.path.join(base, segment["name"])
+
+    # ---- writing --------------------------------------------------------
+
+    def _open_segment(self, now: datetime) -> Dict:
+        # Never go back to an earlier day than the newest segment, so day segments don't interleave
+        day = max([now.strftime("%Y-%m-%d")] + [s["day"] for s in self._index["segments"]])
+        segment = {
+            "name": f"segment-{now.strftime('%Y%m%d-%H%M%S')}-{self._index['next_id']:04d}.jsonl",
+            "state": "active",
+            "day": day,
+            "first_ts": None,
+            "last_ts": None,
+            "count": 0,
+            "bytes": 0,
+        }
+        self._index["next_id"] += 1
+        self._index["segments"].append(segment)
+        self._save_index()
+        return segment
+
+    def append(self, record: Dict):
+        """
+        Append one record, rotating first if the active segment is full or a
+        later day has started. A record stamped with an earlier day (a writer
+        that waited for the lock across midnight) goes into the active segment.
+        Records without a timestamp get one (written into `record`).
+        """
+        rotated = False
+        with file_lock(self.lock_file), self._lock:
+            # Stamped (and encoded with the stamp) under the lock, so timestamps reach the log in order
+            if not record.get(self.time_key):
+                record[self.time_key] = datetime.now().isoformat()
+            ts = record[self.time_key]
+            line = FastJson.dumpb(record) + b"\n"
+            self._reload_if_changed()
+            active = self._active
+            if active is not None:
+                # The file size, not our own counter: other workers append here too
+                try:
+                    active["bytes"] = os.path.getsize(self._path(active))
+                except FileNotFoundError:
+                    active["bytes"] = 0
+            if active is not None and (active["bytes"] + len(line) > self.max_bytes or ts[:10] > active["day"]):
+                self._close_active()
+                active = None
+                rotated = True
+            if active is None:
+                active = self._active = self._open_segment(datetime.fromisoformat(ts))
+
+            with open(self._path(active), "ab") as f:
+                f.write(line)
+            active["bytes"] += len(line)
+            active["count"] += 1
+            if active["first_ts"] is None or ts < active["first_ts"]:
+                active["first_ts"] = ts
+                self._save_index()
+            active["last_ts"] = max(active["last_ts"] or ts, ts)
+
+        if rotated:
+            self._after_rotate()
+
+    def _close_active(self):
+        """Mark the active segment closed. Caller holds the lock."""
+        if self._active is not None:
+            # Other workers' appends aren't in our counters; count the file for real
+            self._refresh_active_stats()
+            self._active["state"] = "closed"
+            self._active = None
+            self._save_index()
+
+    def rotate(self):
+        """Close the active segment now (e.g. before a backup)."""
+        with file_lock(self.lock_file), self._lock:
+            self._reload_if_changed()
+            self._close_active()
+        self._after_rotate()
+
+    def _after_rotate(self):
+        self.apply_retention()
+        self.compress_closed(background=True)
+
+    def compress_closed(self, background: bool = False):
+        """
+        Gzip every closed segment. With background=True this runs on a daemon
+        thread; asking while that thread is busy makes it go round again, so a
+        segment closed mid-pass isn't left uncompressed.
+        """
+        if background:
+            with self._compress_lock:
+                self._compress_again = True
+                if self._compressor is None:
+                    self._compressor = threading.Thread(target=self._compress_in_background, daemon=True)
+                    self._compressor.start()
+            return
+
+        for segment in self.segments():
+            if segment["state"] != "closed":
+                continue
+            src = self._path(segment)
+            dst = src + ".gz"
+            tmp = f"{dst}.{os.getpid()}.tmp"
+            try:
+                with open(src, "rb") as f_in, gzip.open(tmp, "wb", compresslevel=6) as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+            except FileNotFoundError:
+                continue  # another worker got to it first
+            with file_lock(self.lock_file), self._lock:
+                self._reload_if_changed()
+                entry = next((e for e in self._index["segments"] if e["name"] == segment["name"] and e["state"] == "closed"), None)
+                if entry is None or not os.path.exists(src):
+                    os.remove(tmp)
+                    continue
+                os.replace(tmp, dst)
+                entry["name"] += ".gz"
+                entry["state"] = "compressed"
+                entry["bytes"] = os.path.getsize(dst)
+                self._save_index()
+                os.remove(src)
+
+    def _compress_in_background(self):
+        try:
+            while True:
+                with self._compress_lock:
+                    if not self._compress_again:
+                        self._compressor = None
+                        return
+                    self._compress_again = False
+                self.compress_closed()
+                # rotate() applied retention before these were compressed, when it had to skip them
+                self.apply_retention()
+        except BaseException:
+            with self._compress_lock:
+                self._compressor = None
+            raise
+
+    def apply_retention(self, now: Optional[datetime] = None) -> int:
+        """Drop or archive compressed segments older than retention_days. Returns how many."""
+        if not self.retention_days:
+            return 0
+        cutoff = ((now or datetime.now()) - timedelta(days=self.retention_days)).isoformat()
+        affected = 0
+        with file_lock(self.lock_file), self._lock:
+            self._reload_if_changed()
+            for segment in list(self._index["segments"]):
+                # Only compressed segments; closed ones are still being gzipped in the background
+                if segment["state"] != "compressed" or (segment["last_ts"] or "") >= cutoff:
+                    continue
+                path = self._path(segment)
+                if self.retention_action == "delete":
+                    if os.path.exists(path):
+                        os.remove(path)
+                    self._index["segments"].remove(segment)
+                else:
+                    os.makedirs(self.archive_dir, exist_ok=True)
+                    if os.path.exists(path):
+                        os.replace(path, os.path.join(self.archive_dir, segment["name"]))
+                    segment["state"] = "archived"
+                affected += 1
+            if affected:
+                self._save_index()
+        return affected
+
+    # ---- reading --------------------------------------------------------
+
+    def iter_records(self, start: Optional[str] = None, end: Optional[str] = None, include_archived: bool = False) -> Iterator[Dict]:
+        """
+        Yield records with start <= timestamp <= end (ISO strings/prefixes),
+        opening only segments whose time range overlaps.
+        """
+        end_key = end + "\uffff" if end else None  # so "2025-10-07" includes the whole day
+        for segment in self.segments():
+            if segment["state"] == "archived" and not include_archived:
+                continue
+            # The active segment's count/last_ts in the index may lag behind the file
+            still_open = segment["state"] == "active"
+            if not segment["count"] and not still_open:
+                continue
+            if start and not still_open and (segment["last_ts"] or "") < start:
+                continue
+            if end_key and (segment["first_ts"] or "") > end_key:
+                continue
+
+            path = self._path(segment)
+            if not os.path.exists(path) and os.path.exists(path + ".gz"):
+                # Got compressed between reading the index and opening it
+                path += ".gz"
+            if not os.path.exists(path):
+                continue
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = FastJson.loads(line)
+                    ts = record.get(self.time_key) or ""
+                    if (start and ts < start) or (end_key and ts > end_key):
+                        continue
+                    yield record
+
+    def import_records(self, records: Iterator[Dict]) -> int:
+        """Append records from an older store (e.g. the legacy analytics.json)."""
+        count = 0
+        for record in records:
+            self.append(record)
+            count += 1
+        return count
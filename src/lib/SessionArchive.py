@@ -0,0 +1,212 @@
+"""
+Cold-tier storage for idle ArchieAI chat sessions.
+Idle sessions are zlib-compressed and appended to a few large pack files
+instead of living as one file each. An offset index lets a single session
+be read back with one seek, so old chats still load instantly.
+
+Layout:
+    data/sessions/packs/
+        index.json          {"sessions": {id: [pack, offset, length]}, "packs": {...}}
+        pack-0001.pack
+        pack-0002.pack      (active, appended to until max_bytes)
+"""
+import os
+import zlib
+import threading
+from typing import Optional, Dict, List, Tuple
+from lib.FileStore import file_lock, atomic_write_json, file_signature
+from lib import FastJson
+
+
+class SessionArchive:
+    """
+    Append-only pack files of compressed sessions plus an offset index.
+    Changes are made under a file lock and the index is re-read whenever
+    another process has replaced it, so several workers can share one archive.
+
+    Usage:
+      archive = SessionArchive("data/sessions/packs")
+      archive.add_many([(session_id, session_data), ...])
+      archive.read(session_id)      # -> dict or None
+      archive.discard(session_id)   # after promoting it back to a hot file
+    """
+
+    def __init__(self, pack_dir: str, max_pack_bytes: int = 64 * 1024 * 1024):
+        self.pack_dir = pack_dir
+        self.index_file = os.path.join(pack_dir, "index.json")
+        self.lock_file = os.path.join(pack_dir, "index.lock")
+        self.max_pack_bytes = max_pack_bytes
+        # Guards the in-memory index; the file lock guards the files themselves
+        self._lock = threading.RLock()
+        self._index = None
+        self._index_signature = None
+
+    # ---- index ----------------------------------------------------------
+
+    def _empty_index(self) -> Dict:
+        return {"next_pack": 1, "active": None, "packs": {}, "sessions": {}}
+
+    def _load_index(self) -> Dict:
+        """Index is cached in memory and reloaded only when the file changes on disk."""
+        signature = file_signature(self.index_file)
+        if signature is None:
+            if self._index is None:
+                self._index = self._empty_index()
+            return self._index
+        if self._index is None or signature != self._index_signature:
+            try:
+                self._index = FastJson.load_file(self.index_file)
+            except FastJson.JSONDecodeError as e:
+                print(f"Warning: session pack index is corrupted: {e}")
+                self._index = self._empty_index()
+            self._index_signature = signature
+        return self._index
+
+    def _save_index(self):
+        atomic_write_json(self.index_file, self._index)
+        self._index_signature = file_signature(self.index_file)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._load_index()["sessions"]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load_index()["sessions"])
+
+    # ---- writing --------------------------------------------------------
+
+    def _active_pack(self, index: Dict) -> str:
+        name = index["active"]
+        if name is None or index["packs"][name]["bytes"] >= self.max_pack_bytes:
+            name = f"pack-{index['next_pack']:04d}.pack"
+            index["next_pack"] += 1
+            index["packs"][name] = {"bytes": 0, "live_bytes": 0}
+            index["active"] = name
+        return name
+
+    def add_many(self, sessions: List[Tuple[str, Dict]], moving_from: Optional[str] = None) -> int:
+        """
+        Compress and append sessions to the active pack, then publish them in
+        the index. Returns the number of bytes written. Callers remove the hot
+        files only after this returns, so a crash never loses a session.
+        With `moving_from` (repack), sessions no longer stored in that pack are skipped.
+        """
+        if not sessions:
+            return 0
+        os.makedirs(self.pack_dir, exist_ok=True)
+        written = 0
+        with file_lock(self.lock_file), self._lock:
+            index = self._load_index()
+            pending = list(sessions)
+            while pending:
+                name = self._active_pack(index)
+                pack = index["packs"][name]
+                with open(os.path.join(self.pack_dir, name), "ab") as f:
+                    offset = f.tell()
+                    while pending and pack["bytes"] < self.max_pack_bytes:
+                        session_id, data = pending.pop(0)
+                        if moving_from and index["sessions"].get(session_id, [None])[0] != moving_from:
+                            continue  # promoted or deleted while we were reading it
+                        blob = zlib.compress(FastJson.dumpb(data), 6)
+                        f.write(blob)
+                        self._forget(index, session_id)
+                        index["sessions"][session_id] = [name, offset, len(blob)]
+                        offset += len(blob)
+                        pack["bytes"] += len(blob)
+                        pack["live_bytes"] += len(blob)
+                        written += len(blob)
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._save_index()
+        return written
+
+    def _forget(self, index: Dict, session_id: str) -> bool:
+        """Drop a session from the index (its bytes become dead space in the pack)."""
+        entry = index["sessions"].pop(session_id, None)
+        if entry is None:
+            return False
+        pack = index["packs"].get(entry[0])
+        if pack:
+            pack["live_bytes"] -= entry[2]
+        return True
+
+    def discard(self, session_id: str) -> bool:
+        """Remove a session from the archive, e.g. after promoting it back to hot storage."""
+        with file_lock(self.lock_file), self._lock:
+            index = self._load_index()
+            if not self._forget(index, session_id):
+                return False
+            self._save_index()
+            return True
+
+    # ---- reading --------------------------------------------------------
+
+    def read(self, session_id: str) -> Optional[Dict]:
+        """Load one archived session with a single seek + read. None if it isn't archived."""
+        with self._lock:
+            entry = self._load_index()["sessions"].get(session_id)
+        if entry is None:
+            return None
+        name, offset, length = entry
+        try:
+            with open(os.path.join(self.pack_dir, name), "rb") as f:
+                f.seek(offset)
+                blob = f.read(length)
+            return FastJson.loads(zlib.decompress(blob))
+        except (OSError, zlib.error, FastJson.JSONDecodeError) as e:
+            print(f"Warning: archived session {session_id} could not be read from {name}: {e}")
+            return None
+
+    def session_ids(self) -> List[str]:
+        """IDs of every archived session (a snapshot of the index)."""
+        with self._lock:
+            return list(self._load_index()["sessions"])
+
+    def size(self, session_id: str) -> int:
+        """Compressed size of an archived session, 0 if it isn't archived."""
+        with self._lock:
+            entry = self._load_index()["sessions"].get(session_id)
+        return entry[2] if entry else 0
+
+    # ---- maintenance ----------------------------------------------------
+
+    def repack(self, min_dead_ratio: float = 0.5) -> int:
+        """
+        Rewrite closed packs where at least `min_dead_ratio` of the bytes belong
+        to promoted/deleted sessions. Returns the number of bytes reclaimed.
+        """
+        with self._lock:
+            index = self._load_index()
+            victims = [
+                name for name, pack in index["packs"].items()
+                if name != index["active"] and pack["bytes"]
+                and 1 - pack["live_bytes"] / pack["bytes"] >= min_dead_ratio
+            ]
+        reclaimed = 0
+        for name in victims:
+            with self._lock:
+                index = self._load_index()
+                live = [sid for sid, entry in index["sessions"].items() if entry[0] == name]
+            moved = [(sid, data) for sid, data in ((sid, self.read(sid)) for sid in live) if data is not None]
+            self.add_many(moved, moving_from=name)
+            with file_lock(self.lock_file), self._lock:
+                index = self._load_index()
+                if name not in index["packs"]:
+                    continue  # another worker repacked it first
+                for sid in [sid for sid, entry in index["sessions"].items() if entry[0] == name]:
+                    del index["sessions"][sid]  # unreadable; nothing left to point at
+                reclaimed += index["packs"].pop(name)["bytes"]
+                self._save_index()
+                os.remove(os.path.join(self.pack_dir, name))
+        return reclaimed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            index = self._load_index()
+            return {
+                "sessions": len(index["sessions"]),
+                "packs": len(index["packs"]),
+                "bytes": sum(p["bytes"] for p in index["packs"].values()),
+                "live_bytes": sum(p["live_bytes"] for p in index["packs"].values()),
+            }
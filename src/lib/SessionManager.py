@@ -3,89 +3,165 @@ Session and user management for ArchieAI.
 Handles user accounts, session storage, and chat history.
 """
 import os
-import json
+import time
+import hashlib
 import secrets
 import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Optional, Dict, List
-from werkzeug.security import generate_password_hash, check_password_hash
+from lib.SessionArchive import SessionArchive
+from lib.SessionSweeper import SessionSweeper
+from lib.FileStore import file_lock, atomic_write_json, JsonFileCache, try_exclusive_lock, file_signature
+from lib.CpuExecutor import cpu_executor, hash_password, verify_password
+from lib import FastJson
+
+# How many sessions' version info is remembered for cheap ETag checks
+SESSION_META_CACHE_SIZE = 4096
 
 
 class SessionManager:
-    """Manages user accounts and chat sessions with JSON file storage."""
+    """
+    Manages user accounts and chat sessions with JSON file storage.
+
+    Hot sessions live in hashed shard directories (data/sessions/3f/<id>.json).
+    Sessions idle for `archive_after_days` are moved into compressed pack files
+    (see SessionArchive) and promoted back to a hot file when they're opened.
+    Empty, guest and over-cap sessions are cleaned up by a SessionSweeper.
+
+    Safe to share between worker processes: users.json changes happen under a
+    file lock, each shard has its own lock for session read-modify-writes, and
+    every write is an atomic rename.
+
+    Every save bumps the session's "version"; together with created_at and the
+    message count it makes the ETag used for conditional history fetches.
+    """
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(
+        self,
+        data_dir: str = "data",
+        archive_after_days: Optional[float] = None,
+        archive_interval_seconds: Optional[float] = None,
+        pack_max_bytes: Optional[int] = None,
+        sweep_interval_seconds: Optional[float] = None
+    ):
         self.data_dir = data_dir
         self.users_file = os.path.join(data_dir, "users.json")
         self.sessions_dir = os.path.join(data_dir, "sessions")
+        self.locks_dir = os.path.join(self.sessions_dir, ".locks")
+        self._users = JsonFileCache(self.users_file)
+        self._users_lock = self.users_file + ".lock"
+        # Password hashing runs in a process pool so logins don't stall other requests
+        self.cpu = cpu_executor
+        self.archive = SessionArchive(
+            os.path.join(self.sessions_dir, "packs"),
+            max_pack_bytes=pack_max_bytes or int(os.getenv("SESSION_PACK_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+        # 0 turns archiving off
+        self.archive_after_days = archive_after_days if archive_after_days is not None else float(os.getenv("SESSION_ARCHIVE_AFTER_DAYS", "30"))
+        self.archive_interval_seconds = archive_interval_seconds or float(os.getenv("SESSION_ARCHIVE_INTERVAL_SECONDS", "3600"))
+        self.sweeper = SessionSweeper.from_env(self)
+        # Pause between shards; a full sweep pass takes about 257 of these
+        self.sweep_interval_seconds = sweep_interval_seconds or float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "2"))
+        self._maintenance = None
+        # session_id -> (file signature, meta); answers "has it changed?" with a stat
+        self._meta_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._meta_lock = threading.Lock()
         
         # Ensure directories exist
         os.makedirs(self.sessions_dir, exist_ok=True)
         
         # Initialize users file if it doesn't exist
-        if not os.path.exists(self.users_file):
-            with open(self.users_file, "w", encoding="utf-8") as f:
-                json.dump({}, f)
+        with file_lock(self._users_lock):
+            if not os.path.exists(self.users_file):
+                atomic_write_json(self.users_file, {})
     
     def _load_users(self) -> Dict:
-        """Load users from JSON file."""
+        """Load a private copy of users.json (hold self._users_lock if you're going to save it back)."""
         try:
-            with open(self.users_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            # File doesn't exist yet, return empty dict
-            return {}
-        except json.JSONDecodeError as e:
+            return self._users.load()
+        except FastJson.JSONDecodeError as e:
             # File is corrupted, log error and return empty dict
             print(f"Warning: users.json is corrupted: {e}")
             return {}
     
+    def _users_view(self) -> Dict:
+        """Read-only users.json, re-parsed only when some process has changed it."""
+        try:
+            return self._users.get()
+        except FastJson.JSONDecodeError as e:
+            print(f"Warning: users.json is corrupted: {e}")
+            return {}
+    
     def _save_users(self, users: Dict):
         """Save users to JSON file."""
-        with open(self.users_file, "w", encoding="utf-8") as f:
-            json.dump(users, f, indent=4, ensure_ascii=False)
+        self._users.store(users)
 
     def create_user(self, email: str, password: str, ip_address: str, device_info: str) -> bool:
-        """Create a new user account."""
-        users = self._load_users()
-        
-        if email in users:
+        """Create a new user account. Raises CpuBusyError if the hashing pool is saturated."""
+        if email in self._users_view():
             return False
+        # Hash before taking the lock; it's slow on purpose
+        password_hash = self.cpu.run(hash_password, password)
         
-        users[email] = {
-            "email": email,
-            "password_hash": generate_password_hash(password),
-            "created_at": datetime.now().isoformat(),
-            "ip_address": ip_address,
-            "device_info": device_info,
-            "sessions": []
-        }
-        
-        self._save_users(users)
+        with file_lock(self._users_lock):
+            users = self._load_users()
+            
+            if email in users:
+                return False
+            
+            users[email] = {
+                "email": email,
+                "password_hash": password_hash,
+                "created_at": datetime.now().isoformat(),
+                "ip_address": ip_address,
+                "device_info": device_info,
+                "sessions": []
+            }
+            
+            self._save_users(users)
         return True
     
     def authenticate_user(self, email: str, password: str) -> bool:
-        """Authenticate a user with email and password."""
-        users = self._load_users()
+        """Authenticate a user with email and password. Raises CpuBusyError if the hashing pool is saturated."""
+        users = self._users_view()
         
         if email not in users:
             return False
         
-        return check_password_hash(users[email]["password_hash"], password)
+        return self.cpu.run(verify_password, users[email]["password_hash"], password)
     
     def _is_valid_session_id(self, session_id: str) -> bool:
         """Validate that session_id is safe to use in file paths."""
         # Only allow alphanumeric, dash, and underscore characters
         return bool(re.match(r'^[a-zA-Z0-9_-]+$', session_id)) and len(session_id) <= 64
     
+    def _session_path(self, session_id: str) -> str:
+        """Hot file for a session, sharded by hash so no directory gets huge."""
+        shard = hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:2]
+        return os.path.join(self.sessions_dir, shard, f"{session_id}.json")
+
+    def _legacy_session_path(self, session_id: str) -> str:
+        """Where sessions lived before sharding (data/sessions/<id>.json)."""
+        return os.path.join(self.sessions_dir, f"{session_id}.json")
+
+    def _session_lock(self, session_id: str):
+        """Cross-process lock for a session's shard (256 lock files rather than one per session)."""
+        shard = hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:2]
+        return file_lock(os.path.join(self.locks_dir, f"{shard}.lock"))
+
+    def _write_session_file(self, session_id: str, session_data: Dict):
+        atomic_write_json(self._session_path(session_id), session_data)
+    
     def get_user_sessions(self, email: str) -> List[str]:
         """Get all session IDs for a user."""
-        users = self._load_users()
+        users = self._users_view()
         
         if email not in users:
             return []
         
-        return users[email].get("sessions", [])
+        return list(users[email].get("sessions", []))
     
     def create_session(self, user_email: Optional[str] = None) -> str:
         """Create a new chat session with a unique ID."""
@@ -95,41 +171,56 @@ class SessionManager:
             "session_id": session_id,
             "user_email": user_email,
             "created_at": datetime.now().isoformat(),
+            "version": 0,
             "messages": []
         }
         
-        session_file = os.path.join(self.sessions_dir, f"{session_id}.json")
-        with open(session_file, "w", encoding="utf-8") as f:
-            json.dump(session_data, f, indent=4, ensure_ascii=False)
+        self._write_session_file(session_id, session_data)
+        self._start_maintenance()
         
         # Add session to user's session list if user is logged in
         if user_email:
-            users = self._load_users()
-            if user_email in users:
-                if "sessions" not in users[user_email]:
-                    users[user_email]["sessions"] = []
-                users[user_email]["sessions"].append(session_id)
-                self._save_users(users)
+            with file_lock(self._users_lock):
+                users = self._load_users()
+                if user_email in users:
+                    if "sessions" not in users[user_email]:
+                        users[user_email]["sessions"] = []
+                    users[user_email]["sessions"].append(session_id)
+                    self._save_users(users)
         
         return session_id
     
-    def get_session(self, session_id: str) -> Optional[Dict]:
-        """Load a session from file."""
+    def get_session(self, session_id: str, promote: bool = True) -> Optional[Dict]:
+        """
+        Load a session from its hot file, or from the pack archive.
+        Archived sessions are moved back to a hot file unless promote=False
+        (listings shouldn't un-archive everything they show).
+        """
         if not self._is_valid_session_id(session_id):
             print(f"Warning: invalid session_id format: {session_id}")
             return None
         
-        session_file = os.path.join(self.sessions_dir, f"{session_id}.json")
-        
+        session_file = self._session_path(session_id)
         if not os.path.exists(session_file):
-            return None
+            with self._session_lock(session_id):
+                legacy_file = self._legacy_session_path(session_id)
+                if not os.path.exists(session_file) and os.path.exists(legacy_file):
+                    # Not migrated yet; move it into its shard on first touch
+                    os.makedirs(os.path.dirname(session_file), exist_ok=True)
+                    os.replace(legacy_file, session_file)
+                
+                if not os.path.exists(session_file):
+                    session_data = self.archive.read(session_id)
+                    if session_data is not None and promote:
+                        self._write_session_file(session_id, session_data)
+                        self.archive.discard(session_id)
+                    return session_data
         
         try:
-            with open(session_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return FastJson.load_file(session_file)
         except FileNotFoundError:
             return None
-        except json.JSONDecodeError as e:
+        except FastJson.JSONDecodeError as e:
             print(f"Warning: session {session_id} is corrupted: {e}")
             return None
     
@@ -138,31 +229,48 @@ class SessionManager:
         if not self._is_valid_session_id(session_id):
             raise ValueError(f"Invalid session_id format: {session_id}")
         
-        session_file = os.path.join(self.sessions_dir, f"{session_id}.json")
-        with open(session_file, "w", encoding="utf-8") as f:
-            json.dump(session_data, f, indent=4, ensure_ascii=False)
+        with self._session_lock(session_id):
+            session_data["version"] = session_data.get("version", 0) + 1
+            self._write_session_file(session_id, session_data)
+            # A stale archived copy would come back if this file were archived again
+            if session_id in self.archive:
+                self.archive.discard(session_id)
     
-    def add_message(self, session_id: str, role: str, content: str):
-        """Add a message to a session."""
-        session_data = self.get_session(session_id)
-        
-        if session_data is None:
-            # Create new session if it doesn't exist
-            session_data = {
-                "session_id": session_id,
-                "user_email": None,
-                "created_at": datetime.now().isoformat(),
-                "messages": []
-            }
-        
+    def add_message(self, session_id: str, role: str, content: str, cancelled: bool = False, user_email: Optional[str] = None):
+        """
+        Add a message to a session. Partial answers cut off by a disconnect are flagged as cancelled.
+        If the session was swept away while empty, it's recreated for `user_email`.
+        """
         message = {
             "role": role,
             "content": content,
             "timestamp": datetime.now().isoformat()
         }
+        if cancelled:
+            message["cancelled"] = True
         
-        session_data["messages"].append(message)
-        self.save_session(session_id, session_data)
+        # Held across read + write so concurrent appends (other threads or workers) aren't lost
+        with self._session_lock(session_id):
+            session_data = self.get_session(session_id)
+            
+            if session_data is None:
+                # Create new session if it doesn't exist
+                session_data = {
+                    "session_id": session_id,
+                    "user_email": user_email,
+                    "created_at": datetime.now().isoformat(),
+                    "version": 0,
+                    "messages": []
+                }
+                if user_email:
+                    with file_lock(self._users_lock):
+                        users = self._load_users()
+                        if user_email in users and session_id not in users[user_email].setdefault("sessions", []):
+                            users[user_email]["sessions"].append(session_id)
+                            self._save_users(users)
+            
+            session_data["messages"].append(message)
+            self.save_session(session_id, session_data)
     
     def get_conversation_history(self, session_id: str) -> List[Dict]:
         """Get conversation history for a session."""
@@ -172,6 +280,101 @@ class SessionManager:
             return []
         
         return session_data.get("messages", [])[:10]
+
+    @staticmethod
+    def session_etag(session_data: Dict) -> str:
+        """
+        Changes whenever the session does. created_at is in there so a session
+        recreated under the same id never matches an old ETag.
+        """
+        created = hashlib.sha1(str(session_data.get("created_at")).encode("utf-8")).hexdigest()[:8]
+        return f"{created}.{session_data.get('version', 0)}.{len(session_data.get('messages', []))}"
+
+    def _session_meta(self, session_id: str, session_data: Dict) -> Dict:
+        return {
+            "etag": self.session_etag(session_data),
+            "version": session_data.get("version", 0),
+            "total": len(session_data.get("messages", [])),
+            "user_email": session_data.get("user_email"),
+        }
+
+    def get_session_meta(self, session_id: str) -> Optional[Dict]:
+        """
+        {"etag", "version", "total", "user_email"} for a session, or None if it doesn't exist.
+        Only stats the hot file when nothing changed since the last call.
+        """
+        if not self._is_valid_session_id(session_id):
+            return None
+        signature = file_signature(self._session_path(session_id))
+        if signature is not None:
+            with self._meta_lock:
+                cached = self._meta_cache.get(session_id)
+                if cached and cached[0] == signature:
+                    self._meta_cache.move_to_end(session_id)
+                    return cached[1]
+        session_data = self.get_session(session_id)
+        if session_data is None:
+            return None
+        meta = self._session_meta(session_id, session_data)
+        # Only trust it if the file didn't change while we were reading it
+        # (also skips sessions that were just promoted from the archive)
+        if signature is not None and file_signature(self._session_path(session_id)) == signature:
+            self._remember_meta(session_id, signature, meta)
+        return meta
+
+    def _remember_meta(self, session_id: str, signature, meta: Dict):
+        with self._meta_lock:
+            self._meta_cache[session_id] = (signature, meta)
+            self._meta_cache.move_to_end(session_id)
+            while len(self._meta_cache) > SESSION_META_CACHE_SIZE:
+                self._meta_cache.popitem(last=False)
+
+    def get_history(
+        self,
+        session_id: str,
+        since: Optional[int] = None,
+        limit: Optional[int] = None,
+        before: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        Messages of a session, or a slice of them. Messages are append-only, so
+        an index is a stable cursor:
+          since=N    only messages after the first N (what the client already has)
+          before=N   only messages before index N (paging back through a long chat)
+          limit=K    at most the last K of those
+        Returns {"messages", "start", "cursor", "total", "version", "etag"}; "start"
+        is the index of the first returned message, "cursor" what to pass as `since`
+        next time. A `since` past the end (the session was recreated) returns
+        everything with "reset": True.
+        """
+        session_data = self.get_session(session_id)
+        if session_data is None:
+            return None
+        messages = session_data.get("messages", [])
+        total = len(messages)
+
+        result = {}
+        start, end = 0, total
+        if since is not None:
+            if since > total:
+                result["reset"] = True
+            else:
+                start = since
+        if before is not None:
+            end = max(start, min(before, total))
+        if limit is not None and end - start > limit:
+            start = end - limit
+
+        meta = self._session_meta(session_id, session_data)
+        result.update(
+            messages=messages[start:end],
+            start=start,
+            cursor=total,
+            total=total,
+            version=meta["version"],
+            etag=meta["etag"],
+        )
+        return result
     
     def delete_session(self, session_id: str, user_email: Optional[str] = None) -> bool:
         """Delete a chat session."""
@@ -179,23 +382,33 @@ class SessionManager:
             print(f"Warning: invalid session_id format: {session_id}")
             return False
         
-        session_file = os.path.join(self.sessions_dir, f"{session_id}.json")
-        
-        if not os.path.exists(session_file):
-            return False
-        
-        # Remove from user's session list if applicable 
-        #At the time i wrote this i wasnt sure if i would be allowing guest sessions or not
-        #For the sake of time (and my sanity) i am keeping this in
-        if user_email:
-            users = self._load_users()
-            if user_email in users and "sessions" in users[user_email]:
-                if session_id in users[user_email]["sessions"]:
-                    users[user_email]["sessions"].remove(session_id)
-                    self._save_users(users)
-        
-        # Delete the session file
-        os.remove(session_file)
+        with self._session_lock(session_id):
+            session_file = self._session_path(session_id)
+            legacy_file = self._legacy_session_path(session_id)
+            if not os.path.exists(session_file) and os.path.exists(legacy_file):
+                session_file = legacy_file
+            
+            hot = os.path.exists(session_file)
+            archived = session_id in self.archive
+            if not hot and not archived:
+                return False
+            
+            # Remove from user's session list if applicable 
+            #At the time i wrote this i wasnt sure if i would be allowing guest sessions or not
+            #For the sake of time (and my sanity) i am keeping this in
+            if user_email:
+                with file_lock(self._users_lock):
+                    users = self._load_users()
+                    if user_email in users and "sessions" in users[user_email]:
+                        if session_id in users[user_email]["sessions"]:
+                            users[user_email]["sessions"].remove(session_id)
+                            self._save_users(users)
+            
+            # Delete the session file (and/or its archived copy)
+            if hot:
+                os.remove(session_file)
+            if archived:
+                self.archive.discard(session_id)
         return True
     
     def get_all_user_sessions_with_preview(self, email: str) -> List[Dict]:
@@ -204,7 +417,7 @@ class SessionManager:
         sessions = []
         
         for session_id in session_ids:
-            session_data = self.get_session(session_id)
+            session_data = self.get_session(session_id, promote=False)
             if session_data:
                 messages = session_data.get("messages", [])
                 preview = ""
@@ -219,7 +432,122 @@ class SessionManager:
                     "session_id": session_id,
                     "created_at": session_data.get("created_at"),
                     "preview": preview,
-                    "message_count": len(messages)
+                    "message_count": len(messages),
+                    "etag": self.session_etag(session_data)
                 })
         
         return sessions
+
+    def iter_hot_session_files(self):
+        """Yield (session_id, path) for every hot session file, sharded or legacy."""
+        with os.scandir(self.sessions_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    yield entry.name[:-5], entry.path
+                elif entry.is_dir() and len(entry.name) == 2:
+                    with os.scandir(entry.path) as shard:
+                        for item in shard:
+                            if item.is_file() and item.name.endswith(".json"):
+                                yield item.name[:-5], item.path
+
+    def archive_idle_sessions(self, idle_days: Optional[float] = None, batch_size: int = 500) -> Dict:
+        """
+        Move sessions not modified for `idle_days` into the pack archive.
+        Idleness comes from the file's mtime, so no session is parsed unless it's moved.
+        """
+        idle_days = self.archive_after_days if idle_days is None else idle_days
+        cutoff = time.time() - idle_days * 86400
+        stats = {"archived": 0, "bytes_before": 0, "bytes_after": 0}
+
+        def flush(batch):
+            stats["bytes_after"] += self.archive.add_many([(sid, data) for sid, data, _, _ in batch])
+            for session_id, _, path, mtime in batch:
+                with self._session_lock(session_id):
+                    try:
+                        if os.stat(path).st_mtime_ns != mtime:
+                            # Written to while we were packing it; the hot copy wins
+                            self.archive.discard(session_id)
+                            continue
+                        os.remove(path)
+                    except FileNotFoundError:
+                        # Deleted meanwhile; don't resurrect it from the archive
+                        self.archive.discard(session_id)
+                        continue
+                stats["archived"] += 1
+
+        batch = []
+        for session_id, path in self.iter_hot_session_files():
+            try:
+                st = os.stat(path)
+                if st.st_mtime > cutoff:
+                    continue
+                data = FastJson.load_file(path)
+            except (OSError, FastJson.JSONDecodeError) as e:
+                print(f"Warning: skipping session {session_id} while archiving: {e}")
+                continue
+            stats["bytes_before"] += st.st_size
+            batch.append((session_id, data, path, st.st_mtime_ns))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        return stats
+
+    def session_size(self, session_id: str) -> int:
+        """Bytes a session takes on disk (hot file or packed), 0 if it doesn't exist."""
+        try:
+            return os.path.getsize(self._session_path(session_id))
+        except OSError:
+            return self.archive.size(session_id)
+
+    def _remove_from_user_index(self, removals: Dict[str, set]):
+        """Drop deleted session IDs from users.json in one write. removals: {email: {session_id, ...}}"""
+        with file_lock(self._users_lock):
+            users = self._load_users()
+            changed = False
+            for email, session_ids in removals.items():
+                if email in users and "sessions" in users[email]:
+                    kept = [sid for sid in users[email]["sessions"] if sid not in session_ids]
+                    if len(kept) != len(users[email]["sessions"]):
+                        users[email]["sessions"] = kept
+                        changed = True
+            if changed:
+                self._save_users(users)
+
+    def _start_maintenance(self):
+        """Start the background sweeper/archiver on first use (once per process)."""
+        if not (self.archive_after_days or self.sweeper.enabled):
+            return
+        if self._maintenance is not None and self._maintenance.is_alive():
+            return
+        self._maintenance = threading.Thread(target=self._maintenance_loop, daemon=True)
+        self._maintenance.start()
+
+    def _maintenance_loop(self):
+        # With several workers only one of them sweeps/archives at a time
+        lease = None
+        last_archive = 0.0
+        while True:
+            if lease is None:
+                lease = try_exclusive_lock(os.path.join(self.locks_dir, "maintenance.lock"))
+                if lease is None:
+                    time.sleep(60)
+                    continue
+            try:
+                if self.sweeper.enabled and self.sweeper.sweep_step():
+                    report = self.sweeper.report()
+                    print(
+                        f"Session sweep pass {report['passes']}: {report['deleted_empty']} empty, "
+                        f"{report['deleted_guest']} guest, {report['deleted_over_cap']} over cap removed so far "
+                        f"({report['bytes_reclaimed']} bytes)"
+                    )
+                if self.archive_after_days and time.monotonic() - last_archive >= self.archive_interval_seconds:
+                    last_archive = time.monotonic()
+                    stats = self.archive_idle_sessions()
+                    if stats["archived"]:
+                        print(f"Archived {stats['archived']} idle sessions ({stats['bytes_before']} -> {stats['bytes_after']} bytes)")
+                    self.archive.repack()
+            except Exception as e:
+                print(f"Warning: session maintenance failed: {e}")
+            time.sleep(self.sweep_interval_seconds)
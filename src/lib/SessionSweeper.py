@@ -0,0 +1,242 @@
+"""
+Background cleanup of abandoned ArchieAI sessions.
+Every login and "new chat" creates a session, and most of them never get a
+message. The sweeper walks the session shards a little at a time and removes
+empty, expired guest and over-cap sessions, keeping users.json in step.
+"""
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Optional, Dict, List, Set, Tuple
+
+from lib.Metrics import metrics
+from lib import FastJson
+
+
+class SessionSweeper:
+    """
+    Incremental, rate-limited session cleanup.
+
+    Policies (0 turns a policy off):
+      empty_ttl_minutes      delete sessions with no messages not touched for this long
+      guest_ttl_hours        delete sessions with no user (guests) not touched for this long
+      max_sessions_per_user  keep only a user's N most recently used sessions
+      cap_grace_hours        the cap never deletes a session used within this many hours
+
+    One call to sweep_step() scans a single shard directory, at most
+    `files_per_second` files per second, so a full pass is spread out over time
+    instead of hitting the disk all at once.
+    """
+
+    def __init__(
+        self,
+        manager,
+        empty_ttl_minutes: float = 120,
+        guest_ttl_hours: float = 72,
+        max_sessions_per_user: int = 0,
+        cap_grace_hours: float = 24,
+        files_per_second: float = 200,
+    ):
+        self.manager = manager
+        self.empty_ttl_minutes = empty_ttl_minutes
+        self.guest_ttl_hours = guest_ttl_hours
+        self.max_sessions_per_user = max_sessions_per_user
+        self.cap_grace_hours = cap_grace_hours
+        self.files_per_second = files_per_second
+        self._shards: List[str] = []
+        self._lock = threading.Lock()
+        self.stats = {
+            "passes": 0,
+            "scanned": 0,
+            "deleted_empty": 0,
+            "deleted_guest": 0,
+            "deleted_over_cap": 0,
+            "bytes_reclaimed": 0,
+            "last_pass_at": None,
+        }
+
+    @classmethod
+    def from_env(cls, manager) -> "SessionSweeper":
+        """Policies from the SESSION_* environment variables."""
+        return cls(
+            manager,
+            empty_ttl_minutes=float(os.getenv("SESSION_EMPTY_TTL_MINUTES", "120")),
+            guest_ttl_hours=float(os.getenv("SESSION_GUEST_TTL_HOURS", "72")),
+            max_sessions_per_user=int(os.getenv("SESSION_MAX_PER_USER", "0")),
+            cap_grace_hours=float(os.getenv("SESSION_CAP_GRACE_HOURS", "24")),
+            files_per_second=float(os.getenv("SESSION_SWEEP_FILES_PER_SECOND", "200")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.empty_ttl_minutes or self.guest_ttl_hours or self.max_sessions_per_user)
+
+    def _next_shard(self) -> Optional[str]:
+        """Next directory to scan; None once the current pass is finished."""
+        if not self._shards:
+            return None
+        return self._shards.pop(0)
+
+    def _start_pass(self):
+        sessions_dir = self.manager.sessions_dir
+        # "" is the top-level dir, where unmigrated flat files still live
+        self._shards = [""] + sorted(
+            entry.name for entry in os.scandir(sessions_dir) if entry.is_dir() and len(entry.name) == 2
+        )
+
+    def sweep_step(self) -> bool:
+        """
+        Scan one shard and delete whatever the policies say should go.
+        Returns True when this step finished a full pass.
+        """
+        with self._lock:
+            shard = self._next_shard()
+            if shard is None:
+                self._start_pass()
+                shard = self._next_shard()
+            self._sweep_dir(os.path.join(self.manager.sessions_dir, shard))
+            if self._shards:
+                return False
+            if self.max_sessions_per_user:
+                self._enforce_user_cap()
+            self.stats["passes"] += 1
+            self.stats["last_pass_at"] = time.time()
+            return True
+
+    def sweep_all(self) -> Dict:
+        """Run one full pass now (still rate limited). Returns the running stats."""
+        with self._lock:
+            self._start_pass()
+        while not self.sweep_step():
+            pass
+        return self.report()
+
+    def _throttle(self, scanned: int):
+        if self.files_per_second and scanned % 50 == 0:
+            time.sleep(50 / self.files_per_second)
+
+    def _sweep_dir(self, path: str):
+        now = time.time()
+        empty_cutoff = now - self.empty_ttl_minutes * 60 if self.empty_ttl_minutes else None
+        guest_cutoff = now - self.guest_ttl_hours * 3600 if self.guest_ttl_hours else None
+        # Nothing touched after this can be expired by any policy, so it isn't even opened
+        newest = max(c for c in (empty_cutoff, guest_cutoff, 0) if c is not None)
+        if not newest:
+            return
+
+        removals: Dict[str, Set[str]] = {}
+        scanned = 0
+        try:
+            entries = list(os.scandir(path))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if not entry.name.endswith(".json") or not entry.is_file():
+                continue
+            scanned += 1
+            self._throttle(scanned)
+            try:
+                st = entry.stat()
+                if st.st_mtime > newest:
+                    continue
+                data = FastJson.load_file(entry.path)
+            except (OSError, FastJson.JSONDecodeError):
+                continue
+
+            reason = None
+            if empty_cutoff and st.st_mtime <= empty_cutoff and not data.get("messages"):
+                reason = "deleted_empty"
+            elif guest_cutoff and st.st_mtime <= guest_cutoff and not data.get("user_email"):
+                reason = "deleted_guest"
+            if reason is None:
+                continue
+
+            with self.manager._session_lock(entry.name[:-5]):
+                try:
+                    # Someone wrote to it while we were deciding; leave it for the next pass
+                    if os.stat(entry.path).st_mtime_ns != st.st_mtime_ns:
+                        continue
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+            self._count(reason, st.st_size)
+            if data.get("user_email"):
+                removals.setdefault(data["user_email"], set()).add(entry.name[:-5])
+
+        self.stats["scanned"] += scanned
+        if removals:
+            self.manager._remove_from_user_index(removals)
+
+    def _last_activity(self, session_id: str) -> Optional[Tuple[float, Optional[int]]]:
+        """
+        (last activity as epoch seconds, hot file mtime_ns) for a session, or
+        None if it no longer exists. Packed sessions have no mtime_ns and are
+        dated by their newest message.
+        """
+        for path in (self.manager._session_path(session_id), self.manager._legacy_session_path(session_id)):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            return st.st_mtime, st.st_mtime_ns
+        data = self.manager.archive.read(session_id)
+        if data is None:
+            return None
+        stamps = [m.get("timestamp") for m in data.get("messages", [])] + [data.get("created_at")]
+        last = 0.0
+        for stamp in stamps:
+            try:
+                last = max(last, datetime.fromisoformat(stamp).timestamp())
+            except (TypeError, ValueError):
+                continue
+        return last, None
+
+    def _enforce_user_cap(self):
+        """Drop each user's least recently used sessions beyond max_sessions_per_user."""
+        grace_cutoff = time.time() - self.cap_grace_hours * 3600
+        users = self.manager._load_users()
+        for email, user in users.items():
+            sessions = user.get("sessions", [])
+            if len(sessions) <= self.max_sessions_per_user:
+                continue
+            activity = {}
+            for session_id in sessions:
+                seen = self._last_activity(session_id)
+                if seen is None:
+                    self._drop_over_cap(session_id, email, None)
+                else:
+                    activity[session_id] = seen
+            # Most recently used first; on a tie the later-created session wins
+            order = {session_id: i for i, session_id in enumerate(sessions)}
+            ranked = sorted(activity, key=lambda sid: (activity[sid][0], order[sid]), reverse=True)
+            for session_id in ranked[self.max_sessions_per_user:]:
+                last_active, mtime_ns = activity[session_id]
+                if last_active > grace_cutoff:
+                    continue
+                self._drop_over_cap(session_id, email, mtime_ns)
+
+    def _drop_over_cap(self, session_id: str, email: str, mtime_ns: Optional[int]):
+        """Delete a ranked session unless it was written since it was ranked."""
+        with self.manager._session_lock(session_id):
+            seen = self._last_activity(session_id)
+            if seen is None:
+                if session_id not in self.manager.archive:
+                    # File is already gone; just fix the index
+                    self.manager._remove_from_user_index({email: {session_id}})
+                return
+            if seen[1] != mtime_ns:
+                # Someone wrote to (or reopened) it while we were ranking; it isn't idle
+                return
+            size = self.manager.session_size(session_id)
+            if self.manager.delete_session(session_id, email):
+                self._count("deleted_over_cap", size)
+
+    def _count(self, reason: str, size: int):
+        self.stats[reason] += 1
+        self.stats["bytes_reclaimed"] += size
+        metrics.incr(f"sessions_{reason}")
+
+    def report(self) -> Dict:
+        """Copy of what the sweeper has reclaimed so far."""
+        return dict(self.stats)
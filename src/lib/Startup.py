@@ -0,0 +1,75 @@
+"""
+Startup pipeline for ArchieAI.
+Runs the warm-up steps (university context, model preload) in the background
+as soon as the server starts and tracks how long each one took, so /readyz
+can report "not ready" until the first answer would actually be fast.
+"""
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class StartupPipeline:
+    """
+    Ordered warm-up steps run once on a background thread.
+    A failed step is retried every `retry_seconds` until it succeeds; the app
+    is ready only when every step has succeeded.
+
+    Usage:
+      startup = StartupPipeline([("context", build_context), ("models", warm_models)], boot_time=BOOT_TIME)
+      startup.start()        # idempotent, cheap to call on every request
+      startup.status()       # {"ready": ..., "steps": {...}, ...}
+    """
+
+    def __init__(self, steps: List[Tuple[str, Callable]], boot_time: Optional[float] = None, retry_seconds: float = 15.0):
+        self.steps = steps
+        self.boot_time = boot_time or time.time()
+        self.retry_seconds = retry_seconds
+        self._state: Dict[str, Dict] = {name: {"state": "pending", "seconds": None, "error": None} for name, _ in steps}
+        self._thread = None
+        self._lock = threading.Lock()
+        self.ready_at = None
+
+    def start(self):
+        """Kick off the warm-up thread (only the first call does anything)."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        for name, step in self.steps:
+            while True:
+                with self._lock:
+                    self._state[name]["state"] = "running"
+                start = time.perf_counter()
+                try:
+                    result = step()
+                except Exception as e:
+                    with self._lock:
+                        self._state[name].update(state="failed", error=f"{type(e).__name__}: {e}")
+                    print(f"Startup step '{name}' failed ({e}); retrying in {self.retry_seconds:.0f}s")
+                    time.sleep(self.retry_seconds)
+                    continue
+                with self._lock:
+                    self._state[name].update(state="done", seconds=round(time.perf_counter() - start, 3), error=None, result=result)
+                break
+        self.ready_at = time.time()
+        print(f"ArchieAI ready {self.ready_at - self.boot_time:.1f}s after process start")
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def status(self) -> Dict:
+        with self._lock:
+            steps = {name: dict(state) for name, state in self._state.items()}
+        return {
+            "ready": self.ready,
+            "uptime_seconds": round(time.time() - self.boot_time, 3),
+            "seconds_to_ready": round(self.ready_at - self.boot_time, 3) if self.ready else None,
+            "steps": steps,
+        }
@@ -0,0 +1,105 @@
+"""
+Server-Sent Events framing for ArchieAI streaming responses.
+Coalesces model tokens into fewer, larger SSE frames.
+"""
+import os
+import time
+from typing import Optional, Dict, Any, List
+
+from lib import FastJson
+
+# Fixed parts of every frame, encoded once
+_DATA = b"data: "
+_TOKEN_OPEN = b'data: {"token":'
+_TOKEN_CLOSE = b"}\n\n"
+_END = b"\n\n"
+KEEPALIVE = b": keepalive\n\n"
+
+
+class SSEFramer:
+    """
+    Batches streamed tokens into SSE frame payloads.
+
+    A token payload is flushed when the oldest buffered token has waited
+    `flush_interval` seconds or the buffer reaches `max_bytes`, whichever
+    comes first. Control events (tool calls, done, errors) flush whatever is
+    buffered and go out immediately so ordering is preserved.
+
+    Usage:
+      framer = SSEFramer.from_env()
+      payload = framer.push_token("Hel")      # None until a flush is due
+      payload = framer.flush()                # force out buffered tokens
+      payloads = framer.event({'done': True}) # [pending tokens..., event]
+      frame = SSEFramer.encode(payload, event_id=3)   # bytes, ready to write
+    """
+
+    def __init__(self, flush_interval: float = 0.04, max_bytes: int = 2048):
+        # flush_interval <= 0 turns coalescing off (one frame per token, the old behaviour)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._first_token_at = None
+
+    @classmethod
+    def from_env(cls) -> "SSEFramer":
+        """Build a framer from SSE_FLUSH_INTERVAL_MS / SSE_FLUSH_MAX_BYTES."""
+        interval_ms = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "40"))
+        max_bytes = int(os.getenv("SSE_FLUSH_MAX_BYTES", "2048"))
+        return cls(flush_interval=interval_ms / 1000.0, max_bytes=max_bytes)
+
+    @staticmethod
+    def encode(payload: Dict[str, Any], event_id: Optional[int] = None) -> bytes:
+        """Encode a single SSE data frame, optionally numbered for Last-Event-ID."""
+        if len(payload) == 1 and "token" in payload:
+            # Most frames: only the token text needs encoding, the rest is constant
+            frame = _TOKEN_OPEN + FastJson.dumpb(payload["token"]) + _TOKEN_CLOSE
+        else:
+            frame = _DATA + FastJson.dumpb(payload) + _END
+        if event_id is None:
+            return frame
+        return b"id: %d\n" % event_id + frame
+
+    @staticmethod
+    def format(payload: Dict[str, Any], event_id: Optional[int] = None) -> str:
+        """encode() as a str."""
+        return SSEFramer.encode(payload, event_id).decode("utf-8")
+
+    def has_pending(self) -> bool:
+        return bool(self._buffer)
+
+    def time_until_flush(self) -> Optional[float]:
+        """Seconds until buffered tokens are due, or None if nothing is buffered."""
+        if not self._buffer:
+            return None
+        elapsed = time.monotonic() - self._first_token_at
+        return max(0.0, self.flush_interval - elapsed)
+
+    def push_token(self, token: str) -> Optional[Dict[str, Any]]:
+        """Buffer a token. Returns a payload if the flush policy says it is time."""
+        if self.flush_interval <= 0:
+            return {'token': token}
+
+        if not self._buffer:
+            self._first_token_at = time.monotonic()
+        self._buffer.append(token)
+        self._buffer_bytes += len(token.encode("utf-8"))
+
+        if self._buffer_bytes >= self.max_bytes or self.time_until_flush() == 0.0:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Emit buffered tokens as one payload (None if the buffer is empty)."""
+        if not self._buffer:
+            return None
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._first_token_at = None
+        return {'token': text}
+
+    def event(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Flush pending tokens and append an immediate control event."""
+        pending = self.flush()
+        return [pending, payload] if pending else [payload]
@@ -1,4 +1,5 @@
-from typing import Optional
+import io
+from typing import List, Optional
 import qrcode
 from qrcode.constants import ERROR_CORRECT_M
 from PIL import Image
@@ -8,6 +9,8 @@ import sys
 qrCodeGen.py
 
 Simple helper to generate and display a QR code from a string.
+render_qr_bytes() turns one into PNG or SVG bytes (used by lib/QrService.py,
+which caches the results).
 
 Dependencies:
     pip install qrcode[pil]
@@ -23,6 +26,7 @@ def make_qr(
         back_color: str = "white",
         save_path: Optional[str] = None,
         show: bool = True,
+        mode: Optional[str] = "RGB",
 ) -> Image.Image:
         """
         Create a QR code image from `text`.
@@ -35,6 +39,8 @@ def make_qr(
             back_color: background color (default "white").
             save_path: optional path to save the generated image (PNG will be used).
             show: if True, open the image with the default image viewer.
+            mode: PIL mode to convert to (default "RGB"). None keeps the native
+                image, which is 1-bit for black on white and much cheaper to encode.
 
         Returns:
             PIL Image object containing the generated QR code.
@@ -42,6 +48,21 @@ def make_qr(
         if not isinstance(text, str) or text == "":
                 raise ValueError("text must be a non-empty string")
 
+        qr = _build(text, box_size, border)
+        img = qr.make_image(fill_color=fill_color, back_color=back_color).get_image()
+        if mode and img.mode != mode:
+                img = img.convert(mode)
+
+        if save_path:
+                img.save(save_path)
+
+        if show:
+                img.show()
+
+        return img
+
+
+def _build(text: str, box_size: int = 10, border: int = 4) -> qrcode.QRCode:
         qr = qrcode.QRCode(
                 version=None,
                 error_correction=ERROR_CORRECT_M,
@@ -50,16 +71,71 @@ def make_qr(
         )
         qr.add_data(text)
         qr.make(fit=True)
+        return qr
 
-        img = qr.make_image(fill_color=fill_color, back_color=back_color).convert("RGB")
 
-        if save_path:
-                img.save(save_path)
+def qr_matrix(text: str, border: int = 4) -> List[List[bool]]:
+        """The QR modules (True = dark), border included."""
+        if not isinstance(text, str) or text == "":
+                raise ValueError("text must be a non-empty string")
+        return _build(text, border=border).get_matrix()
 
-        if show:
-                img.show()
 
-        return img
+def qr_svg(
+        text: str,
+        box_size: int = 10,
+        border: int = 4,
+        fill_color: str = "black",
+        back_color: str = "white",
+) -> str:
+        """
+        SVG for `text`, drawn straight from the matrix (no PIL image involved).
+        Each run of dark modules in a row becomes one rectangle in a single path.
+        """
+        matrix = qr_matrix(text, border=border)
+        size = len(matrix)
+        path = []
+        for y, row in enumerate(matrix):
+                x = 0
+                while x < size:
+                        if row[x]:
+                                start = x
+                                while x < size and row[x]:
+                                        x += 1
+                                path.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+                        else:
+                                x += 1
+        pixels = size * box_size
+        return (
+                f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+                f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+                f'<rect width="{size}" height="{size}" fill="{back_color}"/>'
+                f'<path fill="{fill_color}" d="{"".join(path)}"/></svg>'
+        )
+
+
+def render_qr_bytes(
+        text: str,
+        fmt: str = "png",
+        box_size: int = 10,
+        border: int = 4,
+        fill_color: str = "black",
+        back_color: str = "white",
+        mode: Optional[str] = None,
+) -> bytes:
+        """
+        Encoded QR code for `text` as "png" or "svg".
+        PNGs keep the native (1-bit for black on white) image unless `mode` asks for e.g. "RGB".
+        Top-level so it can run in a process pool.
+        """
+        if fmt == "svg":
+                return qr_svg(text, box_size, border, fill_color, back_color).encode("utf-8")
+        if fmt != "png":
+                raise ValueError(f"unsupported QR format: {fmt}")
+        img = make_qr(text, box_size, border, fill_color, back_color, show=False, mode=mode)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,559 @@
+// DOM elements
+const homeView = document.getElementById('home-view');
+const chatView = document.getElementById('chat-view');
+const backToHomeBtn = document.getElementById('back-to-home-btn');
+
+const suggestionsList = document.getElementById('suggestions-list');
+const homePromptForm = document.getElementById('home-prompt-form');
+const homePromptInput = document.getElementById('home-prompt-input');
+const homeThemeToggle = document.getElementById('home-theme-toggle-btn');
+const homeDeleteChats = document.getElementById('home-delete-chats-btn');
+
+const chatPromptForm = document.getElementById('chat-prompt-form');
+const chatPromptInput = document.getElementById('chat-prompt-input');
+const chatsContainer = document.getElementById('chats-container');
+const chatThemeToggle = document.getElementById('chat-theme-toggle-btn');
+const chatDeleteChats = document.getElementById('chat-delete-chats-btn');
+const chatHistoryBtn = document.getElementById('chat-history-btn');
+
+const sidebar = document.getElementById('history-sidebar');
+const overlay = document.getElementById('sidebar-overlay');
+const closeSidebarBtn = document.getElementById('close-sidebar-btn');
+const newChatBtn = document.getElementById('new-chat-btn');
+const sessionList = document.getElementById('session-list');
+
+// Utility to switch views
+function showChat(prefillText = '', autoSend = false) {
+  homeView.classList.add('hidden');
+  chatView.classList.remove('hidden');
+  chatView.setAttribute('aria-hidden', 'false');
+
+  // Move focus to input
+  chatPromptInput.focus();
+
+  if (prefillText) {
+    chatPromptInput.value = prefillText;
+    if (autoSend) {
+      // Slight delay to allow UI to update
+      setTimeout(() => {
+        submitChatMessage(prefillText);
+        chatPromptInput.value = '';
+      }, 50);
+    }
+  }
+}
+
+function showHome() {
+  chatView.classList.add('hidden');
+  homeView.classList.remove('hidden');
+  chatView.setAttribute('aria-hidden', 'true');
+  homePromptInput.focus();
+}
+
+// Toggle theme (adds/removes 'dark' class on body)
+function toggleTheme(button) {
+  document.body.classList.toggle('dark');
+  const isDark = document.body.classList.contains('dark');
+  // Update icon text - keep simple swap between 'light_mode' and 'dark_mode'
+  if (isDark) {
+    button.textContent = 'dark_mode';
+  } else {
+    button.textContent = 'light_mode';
+  }
+}
+
+// Add message nodes to the chat
+function appendUserMessage(text) {
+  const msg = document.createElement('div');
+  msg.className = 'message user-message';
+  const p = document.createElement('p');
+  p.className = 'message-text';
+  p.textContent = text;
+  msg.appendChild(p);
+  chatsContainer.appendChild(msg);
+  chatsContainer.scrollTop = chatsContainer.scrollHeight;
+}
+
+function appendBotMessage(text) {
+  const msg = document.createElement('div');
+  msg.className = 'message BOT-message';
+  const img = document.createElement('img');
+  img.src = window.ARCHIE_ASSETS.avatar;
+  img.className = 'avi';
+  const p = document.createElement('p');
+  p.className = 'message-text';
+  p.textContent = text;
+  msg.appendChild(img);
+  msg.appendChild(p);
+  chatsContainer.appendChild(msg);
+  chatsContainer.scrollTop = chatsContainer.scrollHeight;
+  return msg; // Return the message element for updating
+}
+
+function updateBotMessage(msg, text) {
+  const p = msg.querySelector('.message-text');
+  if (p) {
+    p.textContent = text;
+    chatsContainer.scrollTop = chatsContainer.scrollHeight;
+  }
+}
+
+// Read an SSE response body, calling onEvent(id, data) for each data frame.
+// Returns true if the server sent its done signal.
+async function readEventStream(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let eventId = null;
+  let finished = false;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop(); // Keep the last incomplete line in the buffer
+
+    for (const line of lines) {
+      if (line.startsWith('id: ')) {
+        eventId = parseInt(line.slice(4), 10);
+      } else if (line.startsWith('data: ')) {
+        const data = JSON.parse(line.slice(6));
+        onEvent(eventId, data);
+        eventId = null;
+        if (data.done || data.error) finished = true;
+      }
+    }
+  }
+  return finished;
+}
+
+// Generation currently streaming into the page, so we can cancel it if the page goes away
+let activeGenerationId = null;
+
+window.addEventListener('pagehide', () => {
+  if (activeGenerationId) {
+    // Tell the server nobody will read this answer so it stops the model right away
+    navigator.sendBeacon(`/api/archie/stream/${activeGenerationId}/cancel`);
+  }
+});
+
+// Placeholder for sending a message with streaming support
+function submitChatMessage(text) {
+  if (!text || !text.trim()) return;
+  appendUserMessage(text.trim());
+
+  // Show thinking indicator
+  const thinkingMsg = appendBotMessage('💭 Thinking...');
+
+  // Use streaming endpoint for real-time responses
+  (async () => {
+    let responseMsg = null;
+    let fullResponse = '';
+    let generationId = null;
+    let lastEventId = 0;
+
+    const onEvent = (id, data) => {
+      if (id !== null) lastEventId = id;
+      if (data.generation_id) {
+        generationId = data.generation_id;
+        activeGenerationId = generationId;
+      } else if (data.snapshot !== undefined) {
+        // We fell too far behind to replay; the server sent the whole answer so far
+        fullResponse = data.snapshot;
+        updateBotMessage(responseMsg, fullResponse);
+      } else if (data.token) {
+        fullResponse += data.token;
+        updateBotMessage(responseMsg, fullResponse);
+      } else if (data.error) {
+        updateBotMessage(responseMsg, 'Error: ' + data.error);
+      } else if (data.done) {
+        // Streaming complete
+        console.log('Streaming complete');
+      }
+    };
+
+    try {
+      const res = await fetch('/api/archie/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ question: text })
+      });
+
+      if (res.status === 429) {
+        const wait = res.headers.get('Retry-After') || 'a few';
+        updateBotMessage(thinkingMsg, `You're sending questions faster than Archie can keep up. Please try again in ${wait} seconds.`);
+        return;
+      }
+      if (!res.ok) {
+        updateBotMessage(thinkingMsg, `Error: ${res.status} ${res.statusText}`);
+        return;
+      }
+      generationId = res.headers.get('X-Generation-ID');
+      activeGenerationId = generationId;
+
+      // Remove thinking message and create a new one for the actual response
+      thinkingMsg.remove();
+      responseMsg = appendBotMessage('');
+
+      let finished = false;
+      try {
+        finished = await readEventStream(res, onEvent);
+      } catch (err) {
+        console.log('Stream interrupted, will try to resume:', err.message);
+      }
+
+      // Connection dropped mid-answer: reconnect to the same generation and
+      // replay what we missed instead of asking the question again.
+      for (let attempt = 0; !finished && generationId && attempt < 5; attempt++) {
+        await new Promise(r => setTimeout(r, 500 * 2 ** attempt));
+        try {
+          const resumeRes = await fetch(`/api/archie/stream/${generationId}`, {
+            headers: { 'Last-Event-ID': String(lastEventId) }
+          });
+          if (resumeRes.status === 404) break;
+          if (!resumeRes.ok) continue;
+          finished = await readEventStream(resumeRes, onEvent);
+        } catch (err) {
+          console.log('Resume attempt failed:', err.message);
+        }
+      }
+
+      if (activeGenerationId === generationId) activeGenerationId = null;
+
+      // Ensure we have at least something displayed
+      if (!fullResponse) {
+        updateBotMessage(responseMsg, 'No response received');
+      }
+    } catch (err) {
+      // If there's an error, remove thinking message and show error
+      thinkingMsg.remove();
+      appendBotMessage('Network error: ' + err.message);
+    }
+  })();
+}
+
+// suggestion click -> open chat with suggestion prefilled
+suggestionsList.addEventListener('click', (ev) => {
+  let li = ev.target;
+  // walk up to li with class suggestion-item
+  while (li && !li.classList.contains('suggestion-item')) {
+    li = li.parentElement;
+  }
+  if (!li) return;
+  const text = li.getAttribute('data-text') || li.textContent.trim();
+  // Open chat and prefill; do not auto-send by default
+  showChat(text, false);
+});
+
+// Home prompt submit: navigate to chat and send message
+homePromptForm.addEventListener('submit', (ev) => {
+  ev.preventDefault();
+  const text = homePromptInput.value.trim();
+  if (!text) return;
+  showChat('', true); // open chat and auto-send
+  // send message after opening
+  setTimeout(() => {
+    submitChatMessage(text);
+  }, 60);
+  homePromptInput.value = '';
+});
+
+// Chat prompt submit: send message
+chatPromptForm.addEventListener('submit', (ev) => {
+  ev.preventDefault();
+  const text = chatPromptInput.value.trim();
+  if (!text) return;
+  submitChatMessage(text);
+  chatPromptInput.value = '';
+});
+
+// Back to home
+backToHomeBtn.addEventListener('click', (ev) => {
+  ev.preventDefault();
+  showHome();
+});
+
+// Theme toggles on both views
+homeThemeToggle.addEventListener('click', () => toggleTheme(homeThemeToggle));
+chatThemeToggle.addEventListener('click', () => toggleTheme(chatThemeToggle));
+
+// Delete chats - clears chats container
+function clearChats() {
+  chatsContainer.innerHTML = '';
+}
+homeDeleteChats.addEventListener('click', clearChats);
+chatDeleteChats.addEventListener('click', clearChats);
+
+// Ensure keyboard friendly: pressing Escape in chat returns home
+document.addEventListener('keydown', (ev) => {
+  if (ev.key === 'Escape' && !chatView.classList.contains('hidden')) {
+    showHome();
+  }
+});
+
+// Sidebar functions
+function openSidebar() {
+  sidebar.classList.add('open');
+  overlay.classList.add('show');
+  loadSessionList();
+}
+
+function closeSidebar() {
+  sidebar.classList.remove('open');
+  overlay.classList.remove('show');
+}
+
+async function loadSessionList() {
+  try {
+    const res = await fetch('/api/sessions/list');
+    if (!res.ok) {
+      console.log('Not logged in or error loading sessions');
+      return;
+    }
+
+    const data = await res.json();
+    const sessions = data.sessions || [];
+
+    sessionList.innerHTML = '';
+
+    if (sessions.length === 0) {
+      sessionList.innerHTML = '<li style="padding: 12px; color: #666;">No previous chats</li>';
+      return;
+    }
+
+    sessions.forEach(session => {
+      const li = document.createElement('li');
+      li.className = 'session-item';
+
+      const dateDiv = document.createElement('div');
+      dateDiv.textContent = new Date(session.created_at).toLocaleDateString();
+
+      const preview = document.createElement('p');
+      preview.className = 'session-preview';
+      preview.textContent = session.preview || 'New chat';
+
+      const actions = document.createElement('div');
+      actions.className = 'session-actions';
+
+      const loadBtn = document.createElement('button');
+      loadBtn.textContent = 'Load';
+      loadBtn.addEventListener('click', () => loadSession(session.session_id));
+
+      const deleteBtn = document.createElement('button');
+      deleteBtn.textContent = 'Delete';
+      deleteBtn.addEventListener('click', () => deleteSession(session.session_id));
+
+      actions.appendChild(loadBtn);
+      actions.appendChild(deleteBtn);
+
+      li.appendChild(dateDiv);
+      li.appendChild(preview);
+      li.appendChild(actions);
+
+      sessionList.appendChild(li);
+    });
+  } catch (err) {
+    console.error('Error loading sessions:', err);
+  }
+}
+
+// Chat history cache. Each session keeps {etag, start, cursor, messages} so reopening
+// a chat sends If-None-Match + ?since and gets a 304 or only the new messages back.
+const HISTORY_PAGE_SIZE = 50;
+const HISTORY_CACHE_PREFIX = 'archie-history:';
+const historyCache = new Map();
+
+function readHistoryCache(sessionId) {
+  if (!sessionId) return null;
+  if (historyCache.has(sessionId)) return historyCache.get(sessionId);
+  try {
+    const stored = JSON.parse(localStorage.getItem(HISTORY_CACHE_PREFIX + sessionId));
+    if (stored) historyCache.set(sessionId, stored);
+    return stored;
+  } catch (err) {
+    return null;
+  }
+}
+
+function writeHistoryCache(sessionId, entry) {
+  historyCache.set(sessionId, entry);
+  localStorage.setItem('archie-current-session', sessionId);
+  try {
+    localStorage.setItem(HISTORY_CACHE_PREFIX + sessionId, JSON.stringify(entry));
+  } catch (err) {
+    // Storage full; the in-memory copy still saves requests for this page load
+  }
+}
+
+function dropHistoryCache(sessionId) {
+  historyCache.delete(sessionId);
+  localStorage.removeItem(HISTORY_CACHE_PREFIX + sessionId);
+}
+
+async function requestHistory(params, etag) {
+  const headers = etag ? { 'If-None-Match': `"${etag}"` } : {};
+  const res = await fetch('/api/sessions/history?' + new URLSearchParams(params), { headers });
+  if (res.status === 304) return { notModified: true };
+  if (!res.ok) return null;
+  const data = await res.json();
+  data.etag = (res.headers.get('ETag') || '').replace(/^W\//, '').replace(/"/g, '');
+  return data;
+}
+
+// History of the current session (the cookie decides which one), using the cache when possible
+async function fetchHistory(sessionId) {
+  const cached = readHistoryCache(sessionId || localStorage.getItem('archie-current-session'));
+  if (cached) {
+    const data = await requestHistory({ since: cached.cursor }, cached.etag);
+    if (data && data.notModified) return cached;
+    if (data && data.session_id === cached.session_id && !data.reset && data.start === cached.cursor) {
+      const entry = {
+        session_id: data.session_id,
+        etag: data.etag,
+        start: cached.start,
+        cursor: data.cursor,
+        messages: cached.messages.concat(data.history || []),
+      };
+      writeHistoryCache(entry.session_id, entry);
+      return entry;
+    }
+  }
+  // Nothing usable cached: load the tail of the chat first
+  const data = await requestHistory({ limit: HISTORY_PAGE_SIZE });
+  if (!data || data.notModified) return null;
+  const entry = {
+    session_id: data.session_id,
+    etag: data.etag,
+    start: data.start || 0,
+    cursor: data.cursor || 0,
+    messages: data.history || [],
+  };
+  if (entry.session_id) writeHistoryCache(entry.session_id, entry);
+  return entry;
+}
+
+// Load an older page of the current chat and put it in front of what's shown
+async function loadEarlierMessages(entry) {
+  const data = await requestHistory({ before: entry.start, limit: HISTORY_PAGE_SIZE });
+  if (!data || data.notModified || data.session_id !== entry.session_id) return;
+  entry.messages = (data.history || []).concat(entry.messages);
+  entry.start = data.start;
+  writeHistoryCache(entry.session_id, entry);
+  renderHistory(entry);
+  chatsContainer.scrollTop = 0;
+}
+
+function renderHistory(entry) {
+  chatsContainer.innerHTML = '';
+  if (entry.start > 0) {
+    const earlier = document.createElement('button');
+    earlier.className = 'load-earlier-btn';
+    earlier.textContent = 'Show earlier messages';
+    earlier.addEventListener('click', () => loadEarlierMessages(entry));
+    chatsContainer.appendChild(earlier);
+  }
+  entry.messages.forEach(msg => {
+    if (msg.role === 'user') {
+      appendUserMessage(msg.content);
+    } else if (msg.role === 'assistant') {
+      appendBotMessage(msg.content);
+    }
+  });
+}
+
+async function loadSession(sessionId) {
+  try {
+    // Switch to this session
+    const res = await fetch(`/api/sessions/switch/${sessionId}`, { method: 'POST' });
+    if (!res.ok) {
+      alert('Failed to switch session');
+      return;
+    }
+
+    // Load session history (a 304 when we already have all of it)
+    const entry = await fetchHistory(sessionId);
+    if (!entry) {
+      alert('Failed to load session history');
+      return;
+    }
+    renderHistory(entry);
+
+    closeSidebar();
+    showChat();
+  } catch (err) {
+    console.error('Error loading session:', err);
+    alert('Failed to load session');
+  }
+}
+
+async function deleteSession(sessionId) {
+  if (!confirm('Are you sure you want to delete this chat?')) {
+    return;
+  }
+
+  try {
+    const res = await fetch(`/api/sessions/${sessionId}`, { method: 'DELETE' });
+    if (!res.ok) {
+      alert('Failed to delete session');
+      return;
+    }
+    dropHistoryCache(sessionId);
+
+    loadSessionList();
+  } catch (err) {
+    console.error('Error deleting session:', err);
+    alert('Failed to delete session');
+  }
+}
+
+async function createNewChat() {
+  try {
+    const res = await fetch('/api/sessions/new', { method: 'POST' });
+    if (!res.ok) {
+      alert('Failed to create new chat');
+      return;
+    }
+    const data = await res.json();
+    localStorage.setItem('archie-current-session', data.session_id);
+
+    // Clear current chat
+    chatsContainer.innerHTML = '';
+    appendBotMessage('Welcome to Archie! How can I help you today?');
+
+    closeSidebar();
+    showChat();
+  } catch (err) {
+    console.error('Error creating new chat:', err);
+    alert('Failed to create new chat');
+  }
+}
+
+// Event listeners for sidebar
+if (chatHistoryBtn) {
+  chatHistoryBtn.addEventListener('click', openSidebar);
+}
+closeSidebarBtn.addEventListener('click', closeSidebar);
+overlay.addEventListener('click', closeSidebar);
+newChatBtn.addEventListener('click', createNewChat);
+
+// Load session history on page load if in chat view
+async function loadCurrentSessionHistory() {
+  try {
+    const entry = await fetchHistory();
+    if (entry && entry.messages.length > 0) {
+      renderHistory(entry);
+    }
+  } catch (err) {
+    console.error('Error loading current session:', err);
+  }
+}
+
+// Initialize
+loadCurrentSessionHistory();
+
+// Keep the welcome message if no history
+if (chatsContainer.children.length === 0) {
+  appendBotMessage('Welcome to Archie! Click a suggestion or type a question to start a chat.');
+}
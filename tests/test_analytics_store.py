@@ -0,0 +1,72 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lib.AnalyticsStore import AnalyticsStore
+
+
+def row(ts, question="when is fall break?"):
+    return {"timestamp": ts, "question": question, "generation_time_seconds": 1.0}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AnalyticsStore(str(tmp_path / "columnar"), use_parquet=False)
+
+
+def test_day_that_reappears_keeps_all_its_rows(store):
+    rows = [
+        row("2025-10-18T23:59:58"),
+        row("2025-10-19T00:00:01"),
+        row("2025-10-18T23:59:59"),  # late writer from the day before
+        row("2025-10-19T00:00:02"),
+    ]
+    assert store.compact(rows) == {"2025-10-18": 2, "2025-10-19": 2}
+    timestamps = store.read_partition("2025-10-18", ["timestamp"])["timestamp"]
+    assert [str(t) for t in timestamps] == ["2025-10-18T23:59:58.000000", "2025-10-18T23:59:59.000000"]
+
+
+def test_finished_days_are_skipped_and_resume_starts_after_them(store):
+    assert store.resume_from() is None
+    store.compact([row("2025-10-18T10:00:00"), row("2025-10-19T10:00:00")])
+    # Both days were compacted after they ended
+    assert store.resume_from() == "2025-10-20"
+    assert store.compact([row("2025-10-18T11:00:00")]) == {}
+    assert store.compact([row("2025-10-18T11:00:00")], force=True) == {"2025-10-18": 1}
+
+
+def test_day_compacted_while_running_is_rewritten(store):
+    store.compact([row("2025-10-18T10:00:00"), row("2025-10-19T10:00:00")])
+    manifest = store._load_manifest()
+    manifest["days"]["2025-10-19"]["compacted_at"] = "2025-10-19T12:00:00"
+    store._save_manifest(manifest)
+    assert store.resume_from() == "2025-10-19"
+    assert store.compact([row("2025-10-19T10:00:00"), row("2025-10-19T13:00:00")]) == {"2025-10-19": 2}
+
+
+def test_each_day_is_written_once_the_stream_moves_past_it(store):
+    def log():
+        yield row("2025-10-17T10:00:00")
+        yield row("2025-10-18T10:00:00")
+        # The 17th is on disk before the rest of the log is read
+        assert store.days() == ["2025-10-17"]
+        yield row("2025-10-18T11:00:00")
+        yield row("2025-10-19T10:00:00")
+
+    assert store.compact(log()) == {"2025-10-17": 1, "2025-10-18": 2, "2025-10-19": 1}
+
+
+def test_late_row_is_merged_into_its_written_day(store):
+    rows = [
+        row("2025-10-17T10:00:00", "where is the library?"),
+        row("2025-10-18T10:00:00"),
+        row("2025-10-19T10:00:00"),
+        row("2025-10-17T09:00:00", "late one"),  # two days behind the stream
+    ]
+    assert store.compact(rows) == {"2025-10-17": 2, "2025-10-18": 1, "2025-10-19": 1}
+    merged = store._read_rows("2025-10-17")
+    assert [(r["timestamp"], r["question"]) for r in merged] == [
+        ("2025-10-17T09:00:00.000000", "late one"),
+        ("2025-10-17T10:00:00.000000", "where is the library?"),
+    ]
+    assert merged[0]["generation_time_seconds"] == 1.0
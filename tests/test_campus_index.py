@@ -0,0 +1,147 @@
+from datetime import date, datetime
+
+import pytest
+
+from lib.CampusIndex import CampusIndex, build_index, parse_calendar, parse_dates, parse_dining
+from lib.ContextSnapshot import SnapshotReader
+from lib.FileStore import atomic_write_json
+
+CALENDAR = [
+    "Academic Calendar 2025-26",
+    "Fall 2025",
+    "Classes Begin September 2",
+    "Fall Break",
+    "October 13-14",
+    "Thanksgiving Recess November 26 - 30",
+    "Winter Break Dec 20 - Jan 5",
+    "Spring 2026",
+    "Spring Break March 9-13",
+]
+DINING = [
+    "Dining Commons",
+    "Monday - Friday",
+    "Breakfast 7 - 10 a.m.",
+    "Late Night 9 p.m. - 1 a.m.",
+    "Saturday & Sunday",
+    "Brunch 10 a.m. - 2 p.m.",
+]
+TODAY = date(2025, 9, 1)
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "campus_index.json")
+    atomic_write_json(path, build_index({"calendar": CALENDAR, "dining": DINING}, now=datetime(2025, 9, 1)))
+    return CampusIndex(path)
+
+
+def by_title(records):
+    return {r["title"]: (r["start"], r["end"], r["term"]) for r in records}
+
+
+def test_year_rolls_over_inside_a_range():
+    [(start, end, _)] = parse_dates("Dec 20 - Jan 5", lambda month: 2025)
+    assert (start, end) == (date(2025, 12, 20), date(2026, 1, 5))
+
+
+def test_calendar_titles_above_inline_and_below():
+    records = by_title(parse_calendar(CALENDAR, TODAY))
+    assert records["Fall Break"] == ("2025-10-13", "2025-10-14", "Fall 2025")
+    assert records["Thanksgiving Recess"] == ("2025-11-26", "2025-11-30", "Fall 2025")
+    assert records["Winter Break"] == ("2025-12-20", "2026-01-05", "Fall 2025")
+    assert records["Spring Break"] == ("2026-03-09", "2026-03-13", "Spring 2026")
+
+
+def test_calendar_table_layouts():
+    title_first = ["Fall 2025", "Fall Break", "Oct 13-14", "Thanksgiving Recess", "Nov 26-30"]
+    assert by_title(parse_calendar(title_first, TODAY)) == {
+        "Fall Break": ("2025-10-13", "2025-10-14", "Fall 2025"),
+        "Thanksgiving Recess": ("2025-11-26", "2025-11-30", "Fall 2025"),
+    }
+    # A section heading above title-after rows isn't anyone's title
+    dates_first = ["Important Dates", "Oct 13-14", "Fall Break", "Nov 26-30", "Thanksgiving Recess"]
+    assert set(by_title(parse_calendar(dates_first, TODAY))) == {"Fall Break", "Thanksgiving Recess"}
+
+
+def test_fall_break_is_not_thanksgiving(index):
+    match = index.match("when is fall break?", now=datetime(2025, 9, 1, 12))
+    assert match.confidence >= 0.8
+    assert match.answer.startswith("Fall Break (Fall 2025): Monday, October 13")
+
+
+def test_break_under_another_name_is_not_answered_directly(tmp_path):
+    path = str(tmp_path / "campus_index.json")
+    calendar = ["Fall 2025", "Thanksgiving Recess November 26 - 30"]
+    atomic_write_json(path, build_index({"calendar": calendar}, now=datetime(2025, 9, 1)))
+    match = CampusIndex(path).match("when is fall break?", now=datetime(2025, 9, 1, 12))
+    assert match is None or match.confidence < 0.8
+
+
+def test_year_rollover_answer(index):
+    match = index.match("when does winter break end?", now=datetime(2025, 9, 1, 12))
+    assert match.confidence >= 0.8
+    assert "Saturday, December 20 – Monday, January 5, 2026" in match.answer
+
+
+def test_dining_rows():
+    rows = parse_dining(DINING)
+    late = next(r for r in rows if r["meal"] == "Late Night")
+    assert (late["days"], late["open"], late["close"]) == ([0, 1, 2, 3, 4], "21:00", "01:00")
+    brunch = next(r for r in rows if r["meal"] == "Brunch")
+    assert (brunch["days"], brunch["open"], brunch["close"]) == ([5, 6], "10:00", "14:00")
+
+
+def test_dining_open_past_midnight(index):
+    # 00:30 Tuesday: Monday's late night runs until 1 a.m.
+    match = index.match("is the dining commons open now?", now=datetime(2025, 10, 21, 0, 30))
+    assert match.answer.startswith("Dining Commons is open now until 1:00 AM.")
+    # 00:30 Saturday: Friday's late night still counts, Saturday's hours don't start until brunch
+    match = index.match("is the dining commons open now?", now=datetime(2025, 10, 25, 0, 30))
+    assert match.answer.startswith("Dining Commons is open now until 1:00 AM.")
+    # 00:30 Monday: nothing on Sunday night
+    match = index.match("is the dining commons open now?", now=datetime(2025, 10, 20, 0, 30))
+    assert match.answer.startswith("Dining Commons is closed right now. It opens today at 7:00 AM.")
+
+
+def test_dining_open_late_the_same_evening(index):
+    match = index.match("is the dining commons open now?", now=datetime(2025, 10, 21, 22, 0))
+    assert match.answer.startswith("Dining Commons is open now until 1:00 AM.")
+    match = index.match("is the dining commons open now?", now=datetime(2025, 10, 21, 1, 30))
+    assert match.answer.startswith("Dining Commons is closed right now. It opens today at 7:00 AM.")
+
+
+@pytest.mark.parametrize("question", [
+    "How much does a meal plan cost?",
+    "Where can I eat gluten-free on campus?",
+    "Who runs the dining hall?",
+    "how do i get to the dining commons",
+    "Is the food at Arcadia any good?",
+])
+def test_dining_questions_that_arent_about_hours_go_to_the_model(index, question):
+    match = index.match(question, now=datetime(2025, 10, 21, 12, 0))
+    assert match is None or match.confidence < 0.8
+
+
+@pytest.mark.parametrize("question", [
+    "what are the dining commons hours on saturday?",
+    "when does the dining commons close?",
+    "what time is brunch on sunday?",
+    "is brunch served saturday?",
+])
+def test_dining_hours_questions_are_answered(index, question):
+    match = index.match(question, now=datetime(2025, 10, 21, 12, 0))
+    assert match.kind == "dining" and match.confidence >= 0.8 and match.answer
+
+
+def test_lookups_read_the_shared_snapshot(tmp_path):
+    campus = str(tmp_path / "campus_index.json")
+    scrape = str(tmp_path / "scrape_results.json")
+    atomic_write_json(campus, build_index({"calendar": CALENDAR, "dining": DINING}, now=datetime(2025, 9, 1)))
+    atomic_write_json(scrape, {"website": "Arcadia"})
+    reader = SnapshotReader(str(tmp_path / "context_snapshot.bin"), scrape, campus, check_interval=0)
+    index = CampusIndex(str(tmp_path / "missing.json"), snapshots=reader)
+    assert index.stats() == {"calendar": 5, "events": 0, "dining_places": 1}
+    match = index.match("when is fall break?", now=datetime(2025, 9, 1, 12))
+    assert match.answer.startswith("Fall Break (Fall 2025): Monday, October 13")
+    # Nothing decoded is kept on the index between lookups
+    assert index._file_sections == {}
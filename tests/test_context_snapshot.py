@@ -0,0 +1,116 @@
+import os
+import time
+import multiprocessing as mp
+
+import pytest
+
+from lib import FastJson
+from lib.ContextSnapshot import Snapshot, SnapshotError, SnapshotReader, build_sections, publish, read_version
+from lib.FileStore import atomic_write_json
+
+
+@pytest.fixture
+def paths(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    return {
+        "snapshot": str(data / "context_snapshot.bin"),
+        "scrape": str(data / "scrape_results.json"),
+        "campus": str(data / "campus_index.json"),
+    }
+
+
+def test_publish_and_read_sections(paths):
+    event = {"title": "Open House", "date": "2025-10-18", "start": "10:00", "end": None}
+    version = publish(paths["snapshot"], build_sections({"website": "Héllo Arcadia"}, {"events": [event]}))
+    assert version == 1
+    snap = Snapshot(paths["snapshot"])
+    assert snap.version == 1
+    assert set(snap.sections()) == {
+        "context", "meta", "campus/summary", "campus/calendar", "campus/dining", "campus/events/2025-10-18",
+    }
+    view = snap.blob("context")
+    # Zero-copy: a read-only view into the mapping, not bytes
+    assert isinstance(view, memoryview) and view.readonly
+    assert snap.text("context") == '{"website":"Héllo Arcadia"}'
+    assert snap.json("campus/events/2025-10-18") == [event]
+    with pytest.raises(SnapshotError):
+        snap.blob("missing")
+    assert snap.get("missing") is None
+
+
+def test_versions_increase_and_old_mappings_stay_readable(paths):
+    publish(paths["snapshot"], {"context": b'"one"'})
+    old = Snapshot(paths["snapshot"])
+    old_view = old.blob("context")
+    publish(paths["snapshot"], {"context": b'"two, longer"'})
+    assert read_version(paths["snapshot"]) == 2
+    # The old file was renamed over, but its mapping lives on until dropped
+    assert bytes(old_view) == b'"one"'
+    assert Snapshot(paths["snapshot"]).text("context") == '"two, longer"'
+
+
+def test_not_a_snapshot(paths):
+    with open(paths["snapshot"], "wb") as f:
+        f.write(b"not a snapshot at all, just bytes")
+    with pytest.raises(SnapshotError):
+        Snapshot(paths["snapshot"])
+    assert read_version(paths["snapshot"]) == 0
+
+
+def test_reader_switches_to_published_versions(paths):
+    publish(paths["snapshot"], {"context": b'"one"'})
+    reader = SnapshotReader(paths["snapshot"], check_interval=0)
+    first = reader.current()
+    assert first.text("context") == '"one"'
+    assert reader.current() is first  # unchanged file, same mapping
+    publish(paths["snapshot"], {"context": b'"two"'})
+    second = reader.current()
+    assert second.version == 2 and second.text("context") == '"two"'
+    assert first.text("context") == '"one"'
+
+
+def test_reader_waits_for_its_check_interval(paths):
+    publish(paths["snapshot"], {"context": b'"one"'})
+    reader = SnapshotReader(paths["snapshot"], check_interval=3600)
+    assert reader.current().version == 1
+    publish(paths["snapshot"], {"context": b'"two"'})
+    assert reader.current().version == 1
+    assert reader.refresh().version == 2
+
+
+def test_reader_rebuilds_from_changed_sources(paths):
+    reader = SnapshotReader(paths["snapshot"], paths["scrape"], paths["campus"], check_interval=0)
+    assert reader.current() is None  # nothing scraped yet
+    atomic_write_json(paths["scrape"], {"website": "v1"})
+    atomic_write_json(paths["campus"], {"events": []})
+    snap = reader.current()
+    assert snap.version == 1 and FastJson.loads(snap.blob("context")) == {"website": "v1"}
+    assert reader.current().version == 1  # sources unchanged, no rebuild
+
+    time.sleep(0.01)
+    atomic_write_json(paths["scrape"], {"website": "v2"})
+    snap = reader.current()
+    assert snap.version == 2 and snap.json("context") == {"website": "v2"}
+    assert snap.json("campus/summary")["events"] == 0
+
+
+def _reader_version(paths, queue):
+    reader = SnapshotReader(paths["snapshot"], paths["scrape"], paths["campus"], check_interval=0)
+    queue.put(reader.current().version)
+
+
+def test_workers_share_one_rebuild(paths):
+    atomic_write_json(paths["scrape"], {"website": "v1"})
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_reader_version, args=(paths, queue)) for _ in range(4)]
+    for proc in procs:
+        proc.start()
+    versions = [queue.get(timeout=60) for _ in procs]
+    for proc in procs:
+        proc.join()
+    # Whoever got the lock first rebuilt it; the rest mapped that same version
+    assert versions == [1, 1, 1, 1]
+    assert read_version(paths["snapshot"]) == 1
+    assert not [name for name in os.listdir(os.path.dirname(paths["snapshot"])) if name.endswith(".tmp")]
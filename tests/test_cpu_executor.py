@@ -0,0 +1,33 @@
+import time
+
+import pytest
+
+from lib.CpuExecutor import CpuBusyError, CpuExecutor, ping, verify_password, hash_password
+
+
+@pytest.fixture
+def executor():
+    executor = CpuExecutor(max_workers=1, max_queue=0, timeout=0.2, queue_wait=0.05)
+    yield executor
+    executor.shutdown()
+
+
+def test_runs_tasks_outside_the_fork_start_method(executor):
+    assert executor.warm()["start_method"] in ("forkserver", "spawn")
+    password_hash = executor.run(hash_password, "hunter2")
+    assert executor.run(verify_password, password_hash, "hunter2")
+
+
+def test_timed_out_task_keeps_its_slot_until_it_finishes(executor):
+    executor.warm()
+    with pytest.raises(CpuBusyError, match="timed out"):
+        executor.run(time.sleep, 1.0)
+    # Still sleeping in the only worker: new work is turned away, not queued behind it
+    with pytest.raises(CpuBusyError, match="full"):
+        executor.run(ping)
+    time.sleep(1.0)
+    assert executor.run(ping) > 0
+
+
+def test_zero_workers_runs_inline():
+    assert CpuExecutor(max_workers=0).run(ping) > 0
@@ -0,0 +1,118 @@
+from lib import GenerationBuffer
+from lib.GenerationBuffer import DETACH_GRACE_SECONDS, Generation, GenerationRegistry
+
+
+def make_generation(**kwargs):
+    return Generation("gen-1", "session-1", "when is fall break?", **kwargs)
+
+
+def test_resume_returns_only_events_after_last_event_id():
+    gen = make_generation()
+    for token in ("Fall ", "break ", "is "):
+        gen.append({"token": token})
+    events, done = gen.read(last_event_id=1, timeout=0)
+    assert events == [(2, {"token": "break "}), (3, {"token": "is "})]
+    assert not done
+
+
+def test_resume_after_finish_includes_done():
+    gen = make_generation()
+    gen.append({"token": "Hi"})
+    gen.append({"done": True})
+    gen.finish()
+    events, done = gen.read(last_event_id=1, timeout=0)
+    assert events == [(2, {"done": True})]
+    assert done
+
+
+def test_reader_that_fell_out_of_the_ring_gets_a_snapshot():
+    gen = make_generation(max_events=3)
+    for i in range(6):
+        gen.append({"token": str(i)})
+    events, done = gen.read(last_event_id=1, timeout=0)
+    # Events 2 and 3 were evicted, so the whole answer so far comes back as one event at the head
+    assert events == [(6, {"snapshot": "012345"})]
+    assert not done
+
+
+def test_snapshot_carries_done_once_finished():
+    gen = make_generation(max_events=2)
+    for i in range(4):
+        gen.append({"token": str(i)})
+    gen.finish()
+    events, done = gen.read(last_event_id=0, timeout=0)
+    assert events == [(4, {"snapshot": "0123", "done": True})]
+    assert done
+
+
+def test_caught_up_reader_waits_then_gets_nothing():
+    gen = make_generation()
+    gen.append({"token": "a"})
+    events, done = gen.read(last_event_id=1, timeout=0.01)
+    assert events == [] and not done
+
+
+def test_registry_finds_running_generation_for_the_same_question():
+    registry = GenerationRegistry()
+    gen = registry.create("session-1", "when is fall break?")
+    assert registry.get(gen.generation_id) is gen
+    assert registry.find_active("session-1", "when is fall break?") is gen
+    assert registry.find_active("session-2", "when is fall break?") is None
+    gen.finish()
+    assert registry.find_active("session-1", "when is fall break?") is None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_resume_within_grace_keeps_the_generation_running(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(GenerationBuffer.time, "monotonic", clock)
+    gen = make_generation()
+    gen.attach()
+    gen.append({"token": "Fall "})
+
+    # Connection drops; the page retries after 0.5s, then 1s
+    gen.detach()
+    clock.now += 0.5
+    assert not gen.should_cancel()
+    clock.now += 1.0
+    assert not gen.should_cancel()
+    gen.attach()
+    events, _ = gen.read(last_event_id=0, timeout=0)
+    assert events == [(1, {"token": "Fall "})]
+
+    # Attached again: however long it runs, nothing cancels it
+    clock.now += 60
+    assert not gen.should_cancel()
+
+
+def test_cancelled_once_grace_passes_with_nobody_attached(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(GenerationBuffer.time, "monotonic", clock)
+    gen = make_generation()
+    gen.attach()
+    gen.detach()
+    clock.now += DETACH_GRACE_SECONDS - 0.5
+    assert not gen.should_cancel()
+    clock.now += 0.5
+    assert gen.should_cancel()
+
+
+def test_default_grace_outlasts_two_client_retries(monkeypatch):
+    monkeypatch.delenv("GENERATION_DETACH_GRACE_SECONDS", raising=False)
+    # static/js/index.js waits 500 * 2 ** attempt ms between resume attempts
+    assert DETACH_GRACE_SECONDS > 0.5 + 1.0
+    assert GenerationRegistry.from_env().detach_grace_seconds == DETACH_GRACE_SECONDS
+
+
+def test_explicit_cancel_is_immediate():
+    gen = make_generation()
+    gen.attach()
+    gen.cancel()
+    assert gen.should_cancel()
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from lib.QueryRouter import QueryRouter
+
+
+@pytest.fixture
+def router():
+    return QueryRouter("big", fast_model="small", threshold=0.5)
+
+
+def route(router, query, **kwargs):
+    return asyncio.run(router.route(query, **kwargs))
+
+
+@pytest.mark.parametrize("query", ["hi", "Thanks Archie!", "good morning", "ok."])
+def test_small_talk_scores_zero(router, query):
+    assert router.score(query) == (0.0, ["small_talk"])
+
+
+def test_scores(router):
+    assert router.score("what's the library's phone number") == (0.1, [])
+    assert router.score("what's the weather today")[1] == ["needs_fresh_info"]
+    score, reasons = router.score("why should i pick biology over chemistry")
+    assert score == pytest.approx(0.5) and reasons == ["reasoning"]
+    score, reasons = router.score("explain the latest news about https://arcadia.edu?")
+    assert score == 1.0 and reasons == ["needs_fresh_info", "reasoning", "url"]
+    # Short follow-ups only count as such with a conversation behind them
+    assert router.score("tell me more about that") == (0.1, [])
+    assert router.score("tell me more about that", [{"role": "user", "content": "hi"}])[1] == ["follow_up"]
+
+
+def test_routes(router):
+    fast = route(router, "hi")
+    assert (fast.route, fast.model, fast.think, fast.use_tools) == ("fast", "small", False, False)
+    full = route(router, "what's the weather today")
+    assert (full.route, full.model, full.think, full.use_tools) == ("full", "big", True, True)
+
+
+def test_disabled_without_a_fast_model():
+    decision = route(QueryRouter("big"), "hi")
+    assert (decision.route, decision.model, decision.reasons) == ("full", "big", ["router_disabled"])
+
+
+def classifier(reply=None, delay=0.0, error=None):
+    calls = []
+
+    async def classify(model, query):
+        calls.append((model, query))
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return reply
+    classify.calls = calls
+    return classify
+
+
+def test_ambiguous_band_asks_the_classifier():
+    router = QueryRouter("big", fast_model="small", threshold=0.5, classifier_model="tiny", ambiguous_band=0.15)
+    query = "why should i pick biology over chemistry"  # 0.5, right on the threshold
+    simple = classifier("SIMPLE.")
+    decision = route(router, query, classify=simple)
+    assert decision.route == "fast" and "classifier_simple" in decision.reasons
+    assert simple.calls == [("tiny", query)]
+    decision = route(router, query, classify=classifier(" complex"))
+    assert decision.route == "full" and "classifier_complex" in decision.reasons
+
+    # Outside the band the classifier isn't asked
+    outside = classifier("SIMPLE")
+    assert route(router, "hi", classify=outside).route == "fast"
+    assert route(router, "explain the latest news about https://arcadia.edu?", classify=outside).route == "full"
+    assert outside.calls == []
+
+
+def test_classifier_timeout_and_errors_keep_the_heuristic_score():
+    router = QueryRouter("big", fast_model="small", threshold=0.5, classifier_model="tiny", classifier_timeout=0.05)
+    query = "why should i pick biology over chemistry"
+    decision = route(router, query, classify=classifier("SIMPLE", delay=1.0))
+    assert decision.route == "full" and decision.reasons[-1] == "classifier_error:TimeoutError"
+    decision = route(router, query, classify=classifier(error=ConnectionError("down")))
+    assert decision.route == "full" and decision.reasons[-1] == "classifier_error:ConnectionError"
@@ -0,0 +1,115 @@
+import ipaddress
+
+import pytest
+
+from lib import RateLimiter as rate_limiter_module
+from lib.RateLimiter import MemoryBuckets, RateLimiter, SharedBuckets, parse_budget
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter_module.time, "monotonic", clock)
+    monkeypatch.setattr(rate_limiter_module.time, "time", clock)
+    return clock
+
+
+def test_parse_budget():
+    assert parse_budget("user=20/60, ip=120/60") == {"user": (20.0, 20 / 60), "ip": (120.0, 2.0)}
+    assert parse_budget("") == {}
+    with pytest.raises(ValueError):
+        parse_budget("user=20")
+    with pytest.raises(ValueError):
+        parse_budget("user=0/60")
+
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: MemoryBuckets(),
+    lambda tmp_path: SharedBuckets(str(tmp_path / "ratelimit.bin"), slots=64),
+], ids=["memory", "shared"])
+def test_bucket_drains_then_refills(tmp_path, clock, make_store):
+    limiter = RateLimiter({"generate": parse_budget("user=3/60")}, make_store(tmp_path))
+    for _ in range(3):
+        assert limiter.check("generate", user="a@arcadia.edu") == 0
+    # Burst used up: one token comes back every 20s
+    assert limiter.check("generate", user="a@arcadia.edu") == pytest.approx(20.0)
+    assert limiter.check("generate", user="b@arcadia.edu") == 0
+    clock.now += 10
+    assert limiter.check("generate", user="a@arcadia.edu") == pytest.approx(10.0)
+    clock.now += 10
+    assert limiter.check("generate", user="a@arcadia.edu") == 0
+    # Refill stops at the burst size
+    clock.now += 3600
+    for _ in range(3):
+        assert limiter.check("generate", user="a@arcadia.edu") == 0
+    assert limiter.check("generate", user="a@arcadia.edu") > 0
+
+
+def test_all_or_nothing_across_keys(clock):
+    limiter = RateLimiter({"generate": parse_budget("user=1/60,ip=5/60")}, MemoryBuckets())
+    assert limiter.check("generate", user="a", ip="10.0.0.1") == 0
+    # The user bucket is empty, so the IP bucket isn't charged either
+    assert limiter.check("generate", user="a", ip="10.0.0.1") > 0
+    for _ in range(4):
+        assert limiter.check("generate", user=None, ip="10.0.0.1") == 0
+    assert limiter.check("generate", ip="10.0.0.1") > 0
+
+
+def test_batch_cost_is_charged_at_once(clock):
+    limiter = RateLimiter({"generate": parse_budget("user=20/60,ip=120/60")}, MemoryBuckets())
+    assert limiter.capacity("generate", user="a", ip="10.0.0.1") == 20
+    assert limiter.capacity("generate", ip="10.0.0.1") == 120
+    assert limiter.capacity("generate", session="s") is None
+    assert limiter.check("generate", cost=15, user="a", ip="10.0.0.1") == 0
+    # 5 left, 10 asked: 5 more tokens at one every 3s
+    assert limiter.check("generate", cost=10, user="a", ip="10.0.0.1") == pytest.approx(15.0)
+    assert limiter.check("generate", cost=5, user="a", ip="10.0.0.1") == 0
+
+
+def test_unknown_budget_and_missing_keys_are_free(clock):
+    limiter = RateLimiter({"login": parse_budget("user=1/300")}, MemoryBuckets())
+    assert limiter.check("nope", user="a") == 0
+    assert limiter.check("login", ip="10.0.0.1") == 0
+    assert limiter.check("login", user="a") == 0
+    assert limiter.check("login", user="a") > 0
+
+
+def test_retry_after_rounds_up():
+    assert RateLimiter.retry_after(0.2) == 1
+    assert RateLimiter.retry_after(20.01) == 21
+
+
+def test_proxy_peers_skip_ip_buckets():
+    limiter = RateLimiter({}, MemoryBuckets(), proxy_networks=[ipaddress.ip_network("10.1.0.0/16")])
+    assert limiter.ip_key("127.0.0.1") is None
+    assert limiter.ip_key("::1") is None
+    assert limiter.ip_key("10.1.2.3") is None
+    assert limiter.ip_key("203.0.113.7") == "203.0.113.7"
+
+
+def test_trusted_proxy_hops_use_the_forwarded_address():
+    limiter = RateLimiter({}, MemoryBuckets(), trusted_proxy_hops=1)
+    # ProxyFix has already put the client's address in remote_addr
+    assert limiter.ip_key("127.0.0.1") == "127.0.0.1"
+
+
+def test_from_env_warns_without_trusted_proxy_hops(monkeypatch, capsys):
+    monkeypatch.delenv("TRUSTED_PROXY_HOPS", raising=False)
+    monkeypatch.delenv("RATE_LIMIT_SHARED_FILE", raising=False)
+    monkeypatch.setenv("PROXY_ADDRESSES", "10.0.0.2")
+    limiter = RateLimiter.from_env()
+    assert "TRUSTED_PROXY_HOPS" in capsys.readouterr().out
+    assert limiter.ip_key("10.0.0.2") is None
+    assert "qr" in limiter.budgets
+
+    monkeypatch.setenv("TRUSTED_PROXY_HOPS", "1")
+    RateLimiter.from_env()
+    assert capsys.readouterr().out == ""
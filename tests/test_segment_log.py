@@ -0,0 +1,90 @@
+import shutil
+import threading
+
+from lib.SegmentLog import SegmentLog
+
+
+def make_log(tmp_path, **kwargs):
+    return SegmentLog(str(tmp_path / "analytics"), **kwargs)
+
+
+def wait_for_compression(log):
+    compressor = log._compressor
+    if compressor is not None:
+        compressor.join()
+
+
+def test_rotates_when_a_new_day_starts(tmp_path):
+    log = make_log(tmp_path)
+    log.append({"timestamp": "2025-10-18T23:59:59", "n": 1})
+    log.append({"timestamp": "2025-10-19T00:00:01", "n": 2})
+    wait_for_compression(log)
+    segments = log.segments()
+    assert [s["day"] for s in segments] == ["2025-10-18", "2025-10-19"]
+    assert [s["state"] for s in segments] == ["compressed", "active"]
+    assert [r["n"] for r in log.iter_records()] == [1, 2]
+
+
+def test_late_record_from_yesterday_does_not_reopen_its_day(tmp_path):
+    log = make_log(tmp_path)
+    log.append({"timestamp": "2025-10-18T23:59:58", "n": 1})
+    log.append({"timestamp": "2025-10-19T00:00:01", "n": 2})
+    # Stamped before midnight, got the lock after
+    log.append({"timestamp": "2025-10-18T23:59:59", "n": 3})
+    log.append({"timestamp": "2025-10-19T00:00:02", "n": 4})
+    wait_for_compression(log)
+    segments = log.segments()
+    assert [s["day"] for s in segments] == ["2025-10-18", "2025-10-19"]
+    assert segments[1]["first_ts"] == "2025-10-18T23:59:59"
+    assert segments[1]["last_ts"] == "2025-10-19T00:00:02"
+    # Range reads still find the late record
+    assert [r["n"] for r in log.iter_records(end="2025-10-18")] == [1, 3]
+
+
+def test_size_rotation_keeps_the_newest_day(tmp_path):
+    log = make_log(tmp_path, max_bytes=120)
+    log.append({"timestamp": "2025-10-19T00:00:01", "pad": "x" * 60})
+    log.append({"timestamp": "2025-10-18T23:59:59", "pad": "x" * 60})
+    wait_for_compression(log)
+    assert [s["day"] for s in log.segments()] == ["2025-10-19", "2025-10-19"]
+
+
+def test_records_without_timestamp_get_one(tmp_path):
+    log = make_log(tmp_path)
+    log.append({"n": 1})
+    segment = log.segments()[0]
+    assert segment["first_ts"] is not None and segment["count"] == 1
+    # The stamp is in the stored record too, not only in the index
+    [record] = log.iter_records()
+    assert record["timestamp"] == segment["first_ts"]
+
+
+def test_index_survives_reopen(tmp_path):
+    log = make_log(tmp_path)
+    for i in range(3):
+        log.append({"timestamp": f"2025-10-19T10:00:0{i}", "n": i})
+    reopened = make_log(tmp_path)
+    active = reopened.segments()[0]
+    assert active["count"] == 3 and active["last_ts"] == "2025-10-19T10:00:02"
+    assert [r["n"] for r in reopened.iter_records(start="2025-10-19T10:00:01")] == [1, 2]
+
+
+def test_segment_closed_during_compression_is_compressed(tmp_path, monkeypatch):
+    log = make_log(tmp_path, retention_days=1, retention_action="archive")
+    copying, release = threading.Event(), threading.Event()
+    copy = shutil.copyfileobj
+
+    def slow_copy(src, dst):
+        copying.set()
+        release.wait(10)
+        copy(src, dst)
+    monkeypatch.setattr(shutil, "copyfileobj", slow_copy)
+    log.append({"timestamp": "2025-10-17T12:00:00", "n": 1})
+    log.append({"timestamp": "2025-10-18T12:00:00", "n": 2})
+    assert copying.wait(10)
+    # Closes 2025-10-18 while the first pass is still gzipping 2025-10-17
+    log.append({"timestamp": "2025-10-19T12:00:00", "n": 3})
+    release.set()
+    wait_for_compression(log)
+    # Both were compressed, then retention (long past here) archived them
+    assert [s["state"] for s in log.segments()] == ["archived", "archived", "active"]
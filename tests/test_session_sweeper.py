@@ -0,0 +1,159 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from lib import FastJson, FileStore
+from lib.SessionManager import SessionManager
+from lib.SessionSweeper import SessionSweeper
+
+pytestmark = pytest.mark.skipif(FileStore.fcntl is None, reason="needs fcntl (POSIX)")
+
+EMAIL = "student@arcadia.edu"
+HOUR = 3600
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    # The built-in sweeper stays off; each test runs its own
+    monkeypatch.setenv("SESSION_EMPTY_TTL_MINUTES", "0")
+    monkeypatch.setenv("SESSION_GUEST_TTL_HOURS", "0")
+    manager = SessionManager(data_dir=str(tmp_path), archive_after_days=0)
+    manager._save_users({EMAIL: {"sessions": []}})
+    return manager
+
+
+def sweeper(manager, **policies):
+    policies = {"empty_ttl_minutes": 0, "guest_ttl_hours": 0, "files_per_second": 0, **policies}
+    return SessionSweeper(manager, **policies)
+
+
+def session(manager, email=EMAIL, messages=0, age_hours=0.0):
+    session_id = manager.create_session(email)
+    for i in range(messages):
+        manager.add_message(session_id, "user", f"question {i}")
+    touch(manager, session_id, age_hours)
+    return session_id
+
+
+def touch(manager, session_id, age_hours):
+    stamp = time.time() - age_hours * HOUR
+    os.utime(manager._session_path(session_id), (stamp, stamp))
+
+
+def exists(manager, session_id):
+    return os.path.exists(manager._session_path(session_id))
+
+
+def indexed(manager):
+    return manager._load_users()[EMAIL]["sessions"]
+
+
+def test_empty_ttl(manager):
+    stale = session(manager, age_hours=3)
+    fresh = session(manager, age_hours=1)
+    used = session(manager, messages=1, age_hours=3)
+    report = sweeper(manager, empty_ttl_minutes=120).sweep_all()
+    assert report["deleted_empty"] == 1 and report["bytes_reclaimed"] > 0
+    assert not exists(manager, stale) and exists(manager, fresh) and exists(manager, used)
+    assert indexed(manager) == [fresh, used]
+
+
+def test_guest_ttl(manager):
+    stale_guest = session(manager, email=None, messages=1, age_hours=80)
+    fresh_guest = session(manager, email=None, messages=1, age_hours=10)
+    owned = session(manager, messages=1, age_hours=80)
+    report = sweeper(manager, guest_ttl_hours=72).sweep_all()
+    assert report["deleted_guest"] == 1
+    assert not exists(manager, stale_guest)
+    assert exists(manager, fresh_guest) and exists(manager, owned)
+    assert indexed(manager) == [owned]
+
+
+def test_user_cap_keeps_the_most_recently_used(manager):
+    # Created oldest first, but the first one is the chat the student reopened
+    reopened = session(manager, messages=1, age_hours=48)
+    idle = session(manager, messages=1, age_hours=200)
+    newer = session(manager, messages=1, age_hours=100)
+    manager.add_message(reopened, "user", "back again")
+    touch(manager, reopened, 30)
+    report = sweeper(manager, max_sessions_per_user=2, cap_grace_hours=24).sweep_all()
+    assert report["deleted_over_cap"] == 1
+    assert not exists(manager, idle)
+    assert indexed(manager) == [reopened, newer]
+
+
+def test_user_cap_never_deletes_a_recently_used_session(manager):
+    sessions = [session(manager, messages=1, age_hours=age) for age in (5, 3, 1)]
+    report = sweeper(manager, max_sessions_per_user=1, cap_grace_hours=24).sweep_all()
+    assert report["deleted_over_cap"] == 0
+    assert indexed(manager) == sessions
+    # Once they have been idle past the grace window the cap applies
+    for session_id, age in zip(sessions, (50, 30, 40)):
+        touch(manager, session_id, age)
+    report = sweeper(manager, max_sessions_per_user=1, cap_grace_hours=24).sweep_all()
+    assert report["deleted_over_cap"] == 2
+    assert indexed(manager) == [sessions[1]]
+
+
+def backdate(manager, session_id, age_hours):
+    stamp = (datetime.now() - timedelta(hours=age_hours)).isoformat()
+    data = manager.get_session(session_id)
+    data["created_at"] = stamp
+    for message in data["messages"]:
+        message["timestamp"] = stamp
+    manager.save_session(session_id, data)
+    touch(manager, session_id, 100)
+
+
+def test_user_cap_dates_packed_sessions_by_their_last_message(manager):
+    old = session(manager, messages=1)
+    packed = session(manager, messages=1)
+    backdate(manager, old, 90)
+    backdate(manager, packed, 50)
+    assert manager.archive_idle_sessions(idle_days=1)["archived"] == 2
+    sweeper(manager, max_sessions_per_user=1, cap_grace_hours=24).sweep_all()
+    assert indexed(manager) == [packed]
+    assert old not in manager.archive and packed in manager.archive
+
+
+def test_user_cap_drops_missing_sessions_from_the_index(manager):
+    gone = session(manager, messages=1, age_hours=100)
+    kept = session(manager, messages=1, age_hours=100)
+    os.remove(manager._session_path(gone))
+    report = sweeper(manager, max_sessions_per_user=1).sweep_all()
+    assert report["deleted_over_cap"] == 0
+    assert indexed(manager) == [kept] and exists(manager, kept)
+
+
+def test_sweep_skips_a_session_written_while_deciding(manager, monkeypatch):
+    session_id = session(manager, age_hours=3)
+    load_file = FastJson.load_file
+
+    def load_then_write(path):
+        # The sweeper has decided; a message lands before it takes the lock
+        monkeypatch.setattr(FastJson, "load_file", load_file)
+        data = load_file(path)
+        manager.add_message(session_id, "user", "just in time")
+        return data
+    monkeypatch.setattr(FastJson, "load_file", load_then_write)
+    report = sweeper(manager, empty_ttl_minutes=120).sweep_all()
+    assert report["deleted_empty"] == 0
+    assert manager.get_session(session_id)["messages"][0]["content"] == "just in time"
+    assert indexed(manager) == [session_id]
+
+
+def test_user_cap_skips_a_session_written_while_ranking(manager, monkeypatch):
+    busy = session(manager, messages=1, age_hours=200)
+    session(manager, messages=1, age_hours=100)
+    cap = sweeper(manager, max_sessions_per_user=1)
+    drop = cap._drop_over_cap
+
+    def write_then_drop(session_id, email, mtime_ns):
+        if session_id == busy:
+            manager.add_message(busy, "user", "still here")
+        drop(session_id, email, mtime_ns)
+    monkeypatch.setattr(cap, "_drop_over_cap", write_then_drop)
+    assert cap.sweep_all()["deleted_over_cap"] == 0
+    assert exists(manager, busy) and busy in indexed(manager)
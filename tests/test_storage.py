@@ -0,0 +1,120 @@
+import os
+import threading
+import multiprocessing as mp
+
+import pytest
+
+from lib import FastJson, FileStore
+from lib.FileStore import atomic_write_json, file_lock, try_exclusive_lock
+
+pytestmark = pytest.mark.skipif(FileStore.fcntl is None, reason="needs fcntl (POSIX)")
+
+
+def _try_lock(lock_path, queue):
+    fd = try_exclusive_lock(lock_path)
+    queue.put(fd is not None)
+    if fd is not None:
+        os.close(fd)
+
+
+def other_process_can_lock(lock_path) -> bool:
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_try_lock, args=(lock_path, queue))
+    proc.start()
+    result = queue.get(timeout=30)
+    proc.join()
+    return result
+
+
+def test_file_lock_is_reentrant_and_held_until_the_outer_exit(tmp_path):
+    lock_path = str(tmp_path / "users.json.lock")
+    with file_lock(lock_path):
+        with file_lock(lock_path):
+            pass
+        # Leaving the inner block must not drop the flock
+        assert not other_process_can_lock(lock_path)
+    assert other_process_can_lock(lock_path)
+
+
+def test_file_lock_excludes_other_threads(tmp_path):
+    lock_path = str(tmp_path / "session.lock")
+    entered = threading.Event()
+
+    def other():
+        with file_lock(lock_path):
+            entered.set()
+
+    with file_lock(lock_path):
+        thread = threading.Thread(target=other)
+        thread.start()
+        assert not entered.wait(0.2)
+    thread.join(5)
+    assert entered.is_set()
+
+
+def test_atomic_write_replaces_the_whole_file(tmp_path):
+    path = str(tmp_path / "users.json")
+    atomic_write_json(path, {"a": 1})
+    atomic_write_json(path, {"b": 2})
+    assert FastJson.load_file(path) == {"b": 2}
+    assert os.listdir(tmp_path) == ["users.json"]
+
+
+def test_crash_before_rename_keeps_the_old_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "users.json")
+    atomic_write_json(path, {"users": ["old"]})
+
+    def crash(fd):
+        raise OSError("disk went away")
+
+    monkeypatch.setattr(FileStore.os, "fsync", crash)
+    with pytest.raises(OSError):
+        atomic_write_json(path, {"users": ["new"] * 1000})
+    assert FastJson.load_file(path) == {"users": ["old"]}
+    # and the half-written temp file is cleaned up
+    assert os.listdir(tmp_path) == ["users.json"]
+
+
+def test_unserializable_data_keeps_the_old_file(tmp_path):
+    path = str(tmp_path / "session.json")
+    atomic_write_json(path, {"messages": []})
+    with pytest.raises(TypeError):
+        atomic_write_json(path, {"messages": [object()]})
+    assert FastJson.load_file(path) == {"messages": []}
+
+
+def test_concurrent_workers_lose_nothing(tmp_path, monkeypatch):
+    # The stress helper's worker: sessions, messages to a shared session, and logged interactions
+    from helpers.stress_storage import SHARED_SESSION, worker
+    from lib.SessionManager import SessionManager
+    from lib.DataCollector import DataCollector
+
+    workers, iterations = 4, 15
+    data_dir = str(tmp_path / "data")
+    # Small segments so rotation races with the appends too; hash inline in each worker
+    monkeypatch.setenv("ANALYTICS_SEGMENT_MAX_BYTES", "4096")
+    monkeypatch.setenv("CPU_WORKERS", "0")
+
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(data_dir, w, iterations, queue)) for w in range(workers)]
+    for proc in procs:
+        proc.start()
+    results = dict(queue.get(timeout=120) for _ in procs)
+    for proc in procs:
+        proc.join()
+        assert proc.exitcode == 0
+
+    sessions = SessionManager(data_dir=data_dir, archive_after_days=0)
+    sessions._start_maintenance = lambda: None
+    collector = DataCollector(data_dir=data_dir)
+    for email, created in results.items():
+        assert sorted(sessions.get_user_sessions(email)) == sorted(created)
+        for session_id in created:
+            assert len(sessions.get_session(session_id)["messages"]) == 2
+
+    expected = workers * iterations
+    assert len(sessions.get_session(SHARED_SESSION)["messages"]) == expected
+    assert sum(1 for _ in collector.iter_interactions()) == expected
+    assert sum(row["count"] for row in collector.get_rollups("day", model="stress")) == expected
@@ -0,0 +1,76 @@
+import pytest
+
+from lib import StreamFramer
+from lib.StreamFramer import SSEFramer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(StreamFramer.time, "monotonic", clock)
+    return clock
+
+
+def test_tokens_are_held_until_the_interval_passes(clock):
+    framer = SSEFramer(flush_interval=0.5, max_bytes=1024)
+    assert framer.push_token("Hel") is None
+    clock.now += 0.25
+    assert framer.push_token("lo") is None
+    assert framer.time_until_flush() == 0.25
+    clock.now += 0.25
+    assert framer.push_token(" world") == {"token": "Hello world"}
+    assert not framer.has_pending()
+    assert framer.time_until_flush() is None
+
+
+def test_interval_counts_from_the_oldest_buffered_token(clock):
+    framer = SSEFramer(flush_interval=0.5, max_bytes=1024)
+    framer.push_token("a")
+    clock.now += 0.375
+    framer.push_token("b")
+    clock.now += 0.125
+    # 0.5s since "a", even though "b" just arrived
+    assert framer.time_until_flush() == 0.0
+
+
+def test_byte_limit_flushes_early(clock):
+    framer = SSEFramer(flush_interval=10, max_bytes=8)
+    assert framer.push_token("abcd") is None
+    # Counted in UTF-8 bytes, not characters: "éé" is 4 bytes
+    assert framer.push_token("éé") == {"token": "abcdéé"}
+
+
+def test_zero_interval_sends_every_token(clock):
+    framer = SSEFramer(flush_interval=0, max_bytes=1024)
+    assert framer.push_token("a") == {"token": "a"}
+    assert not framer.has_pending()
+
+
+def test_control_events_flush_pending_tokens_first(clock):
+    framer = SSEFramer(flush_interval=10, max_bytes=1024)
+    framer.push_token("partial")
+    assert framer.event({"done": True}) == [{"token": "partial"}, {"done": True}]
+    assert framer.event({"done": True}) == [{"done": True}]
+    assert framer.flush() is None
+
+
+def test_encode_frames():
+    assert SSEFramer.encode({"token": 'say "hi"'}) == b'data: {"token":"say \\"hi\\""}\n\n'
+    assert SSEFramer.encode({"done": True}, event_id=7) == b'id: 7\ndata: {"done":true}\n\n'
+    assert SSEFramer.format({"token": "x"}, event_id=1) == 'id: 1\ndata: {"token":"x"}\n\n'
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("SSE_FLUSH_INTERVAL_MS", "25")
+    monkeypatch.setenv("SSE_FLUSH_MAX_BYTES", "512")
+    framer = SSEFramer.from_env()
+    assert framer.flush_interval == 0.025
+    assert framer.max_bytes == 512